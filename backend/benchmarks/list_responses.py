@@ -0,0 +1,87 @@
+"""
+Benchmark da serialização das listagens de disciplinas.
+
+Compara, para uma listagem de 5.000 disciplinas servida por um app FastAPI local (sem Firestore):
+- validated: o caminho anterior, com um DisciplineResponse pydantic por disciplina, revalidados pelo
+  FastAPI contra o response_model e serializados com json;
+- adapter: o caminho atual das rotas (discipline_response + validated_response), com os dicionários de
+  to_dict() validados e serializados de uma vez por um TypeAdapter.
+
+Uso (a partir de backend/): python benchmarks/list_responses.py [--disciplines 5000] [--requests 50]
+Requer httpx (usado pelo TestClient do FastAPI).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mesmas raízes de código do projeto
+sys.path[:0] = [BACKEND] + [os.path.join(BACKEND, *path) for path in
+                            (('src',), ('src', 'models'), ('src', 'controllers'), ('src', 'routes'))]
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from admin_routes import DisciplineResponse
+from models import Discipline
+from user_routes import DISCIPLINE_RESPONSES, discipline_response, validated_response
+
+
+def make_app(disciplines, counts):
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[DisciplineResponse], response_class=JSONResponse)
+    async def validated():
+        return [DisciplineResponse(
+            id=d.id,
+            name=d.name,
+            code=d.code,
+            semester=d.semester,
+            helpers_count=counts.get(d.id, {}).get('helpers', 0),
+            seekers_count=counts.get(d.id, {}).get('seekers', 0)
+        ) for d in disciplines]
+
+    @app.get("/adapter", response_model=List[DisciplineResponse])
+    async def fast():
+        return validated_response(DISCIPLINE_RESPONSES, [discipline_response(d, counts) for d in disciplines])
+
+    return app
+
+
+def run(client, path, requests):
+    client.get(path)  # aquecimento
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path)
+        response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed / requests, len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--disciplines', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    disciplines = [Discipline(f"d{i:05d}", f"Disciplina {i}", f"DSC{i:05d}", i % 10 + 1)
+                   for i in range(args.disciplines)]
+    counts = {d.id: {'helpers': i % 7, 'seekers': i % 5} for i, d in enumerate(disciplines)}
+
+    with TestClient(make_app(disciplines, counts)) as client:
+        # Os dois caminhos devem produzir o mesmo conteúdo
+        assert json.loads(client.get("/validated").content) == json.loads(client.get("/adapter").content)
+        results = {path: run(client, f"/{path}", args.requests) for path in ("validated", "adapter")}
+
+    print(f"{args.disciplines} disciplinas, {args.requests} requisições por caminho")
+    for path, (seconds, size) in results.items():
+        print(f"{path:>10}: {seconds * 1000:8.2f} ms/requisição  {1 / seconds:8.1f} req/s  {size} bytes")
+    print(f"{'speedup':>10}: {results['validated'][0] / results['adapter'][0]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Teste de carga HTTP do app (main:app).
+
+Sobe o app com uvicorn em um processo separado, com o engine de armazenamento em memória (ou SQLite) populado com
+um catálogo sintético: N cursos, M disciplinas por curso e K usuários com disciplinas de helper e seeker.
+A verificação de tokens é substituída por uma que aceita "loadtest:{uid}"; o restante da autenticação
+(cache de tokens, leitura do usuário) roda normalmente. Requisições concorrentes misturam
+GET /courses, GET /courses/{id}/disciplines, GET /disciplines/saved/* e POST /disciplines/assign,
+e o relatório traz req/s e latências p50/p95/p99 por rota.
+
+Cliente e servidor dividem a mesma máquina: os números servem para comparar execuções nela
+(por exemplo, antes e depois de uma alteração), não como capacidade absoluta de produção.
+
+Uso (a partir de backend/):
+    python benchmarks/load_test.py --courses 20 --disciplines 50 --users 2000 --concurrency 32 --duration 30
+    python benchmarks/load_test.py --save baseline.json
+    python benchmarks/load_test.py --baseline baseline.json --max-regression 0.2
+
+Com --baseline, termina com código 1 se o req/s total cair, ou o p95/p99 de alguma rota subir,
+mais do que --max-regression em relação à execução salva.
+Requer httpx (pip install -r requirements-dev.txt).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mesmas raízes de código do projeto
+sys.path[:0] = [BACKEND] + [os.path.join(BACKEND, *path) for path in
+                            (('src',), ('src', 'models'), ('src', 'controllers'), ('src', 'routes'))]
+
+# Curso em que as rotas /disciplines/saved/* procuram as disciplinas salvas (fixo em user_routes)
+SAVED_DISCIPLINES_COURSE_ID = "yvm1KcPdwS1i64VPsj9Y"
+TOKEN_PREFIX = "loadtest:"
+DEFAULT_MIX = "courses=30,disciplines=40,saved_seekers=10,saved_helpers=10,assign=10"
+PERCENTILES = (50, 95, 99)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=('memory', 'sqlite'), default='memory',
+                        help="Engine de armazenamento (o sqlite usa um banco em memória)")
+    parser.add_argument('--courses', type=int, default=20)
+    parser.add_argument('--disciplines', type=int, default=50, help="Disciplinas por curso")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--assignments', type=int, default=5, help="Disciplinas de helper e de seeker por usuário")
+    parser.add_argument('--concurrency', type=int, default=32, help="Requisições simultâneas")
+    parser.add_argument('--duration', type=float, default=20.0, help="Duração da medição, em segundos")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Aquecimento não medido, em segundos")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Pesos das rotas (padrão: {DEFAULT_MIX})")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help="Salva o resultado em JSON")
+    parser.add_argument('--baseline', help="Resultado JSON de referência para detectar regressões")
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    return parser.parse_args()
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        if name not in REQUESTS:
+            raise SystemExit(f"Rota desconhecida em --mix: {name} (opções: {', '.join(REQUESTS)})")
+        weights[name] = float(weight)
+    return weights
+
+
+class Dataset:
+    """IDs do catálogo e dos usuários sintéticos, usados para montar as requisições."""
+
+    def __init__(self, course_ids, disciplines, user_ids):
+        self.course_ids = course_ids
+        self.disciplines = disciplines  # course_id -> [discipline_id]
+        self.user_ids = user_ids
+
+
+def seed_dataset(args, rng):
+    from data.database import Db, Write
+    from models import Course, Discipline
+    from repositories.repository import DisciplineRepository
+
+    # O primeiro curso é o consultado pelas rotas de disciplinas salvas; os usuários se inscrevem nele
+    course_ids = [SAVED_DISCIPLINES_COURSE_ID] + [Db.new_document_id('courses') for _ in range(args.courses - 1)]
+    disciplines = {}
+    writes = []
+    for index, course_id in enumerate(course_ids):
+        writes.append(Write('set', 'courses', course_id,
+                            Course(id=course_id, name=f"Curso {index}", code=f"C{index:03d}").to_dict()))
+        path = f'courses/{course_id}/disciplines'
+        disciplines[course_id] = []
+        for number in range(args.disciplines):
+            discipline_id = Db.new_document_id(path)
+            discipline = Discipline(discipline_id, f"Disciplina {index}.{number}", f"D{index:03d}{number:03d}",
+                                    number % 10 + 1)
+            writes.append(Write('set', path, discipline_id, discipline.to_dict()))
+            disciplines[course_id].append(discipline_id)
+
+    user_ids = [f"user{number:06d}" for number in range(args.users)]
+    catalog = disciplines[SAVED_DISCIPLINES_COURSE_ID]
+    size = min(args.assignments, len(catalog))
+    for user_id in user_ids:
+        helper_ids, seeker_ids = rng.sample(catalog, size), rng.sample(catalog, size)
+        writes.append(Write('set', 'users', user_id, {
+            'id': user_id, 'name': user_id, 'email': f"{user_id}@loadtest.local", 'role': 'student',
+            'helpers_disciplines': helper_ids, 'seekers_disciplines': seeker_ids,
+        }))
+        writes += DisciplineRepository.membership_writes(user_id, SAVED_DISCIPLINES_COURSE_ID, helper_ids, [], 'offer_help')
+        writes += DisciplineRepository.membership_writes(user_id, SAVED_DISCIPLINES_COURSE_ID, seeker_ids, [], 'seek_help')
+    # Os membros já são criados no formato novo: não há arrays antigos a migrar
+    writes.append(DisciplineRepository.membership_migration_write())
+    Db.batch_write(writes)
+    return Dataset(course_ids, disciplines, user_ids)
+
+
+def stub_token_verification():
+    from src.controllers.auth_control import AuthControl
+
+    def verify_token(token, check_revoked=False):
+        if not token.startswith(TOKEN_PREFIX):
+            raise ValueError("Token de teste de carga inválido")
+        return {'uid': token[len(TOKEN_PREFIX):], 'exp': time.time() + 3600}
+
+    AuthControl.verify_token = staticmethod(verify_token)
+
+
+# Cada requisição: função (rng, dataset, user_id) -> (método, caminho, corpo JSON ou None)
+REQUESTS = {
+    'courses': lambda rng, data, user_id: ('GET', '/courses', None),
+    'disciplines': lambda rng, data, user_id: ('GET', f"/courses/{rng.choice(data.course_ids)}/disciplines", None),
+    'saved_seekers': lambda rng, data, user_id: ('GET', f"/disciplines/saved/seekers?user_id={user_id}", None),
+    'saved_helpers': lambda rng, data, user_id: ('GET', f"/disciplines/saved/helpers?user_id={user_id}", None),
+    'assign': lambda rng, data, user_id: ('POST', '/disciplines/assign', {
+        'user_id': user_id,
+        'course_id': SAVED_DISCIPLINES_COURSE_ID,
+        'discipline_ids': rng.sample(data.disciplines[SAVED_DISCIPLINES_COURSE_ID], rng.randint(1, 3)),
+        'type_help': rng.choice(('offer_help', 'seek_help')),
+    }),
+}
+
+
+def configure_app(args):
+    """Prepara o ambiente do app: engine local, Firebase sem credenciais. Retorna o módulo main."""
+    # As configurações são lidas na importação dos módulos do app: definidas antes de importá-los
+    os.environ['STORAGE_ENGINE'] = args.engine
+    os.environ['SQLITE_PATH'] = ':memory:'
+    os.environ['CATALOG_MIRROR_ENABLED'] = 'false'
+    os.environ['AUTH_VERIFY_MODE'] = 'firebase'
+    import firebase_admin
+    # App do Firebase sem credenciais: nenhuma chamada ao Firebase é feita (ver stub_token_verification)
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(options={'projectId': 'loadtest'})
+    import main as app_module
+    return app_module
+
+
+def serve(args, port, connection):
+    """Processo do servidor: popula o banco, envia o dataset ao processo de carga e executa o uvicorn."""
+    import uvicorn
+    app_module = configure_app(args)
+    random.seed(args.seed)  # IDs de documentos reproduzíveis
+    started = time.perf_counter()
+    dataset = seed_dataset(args, random.Random(args.seed))
+    stub_token_verification()
+    connection.send((dataset.__dict__, time.perf_counter() - started))
+    connection.close()
+    uvicorn.run(app_module.app, host='127.0.0.1', port=port, log_level='warning', access_log=False)
+
+
+class Server:
+    """
+    Executa o app em um processo separado, para que o servidor não divida o GIL com o gerador de carga.
+    """
+
+    def __init__(self, args):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        context = multiprocessing.get_context('spawn')
+        self._connection, child_connection = context.Pipe(duplex=False)
+        self._process = context.Process(target=serve, args=(args, self.port, child_connection), daemon=True)
+
+    def __enter__(self):
+        self._process.start()
+        data, seconds = self._connection.recv()
+        print(f"Dataset criado em {seconds:.1f}s")
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                break
+            except OSError:
+                if not self._process.is_alive():
+                    raise SystemExit("O servidor não iniciou")
+                time.sleep(0.05)
+        return f"http://127.0.0.1:{self.port}", Dataset(**data)
+
+    def __exit__(self, *exc):
+        # SIGTERM: o uvicorn encerra as conexões e executa o shutdown do lifespan
+        self._process.terminate()
+        self._process.join(10)
+
+
+async def drive(base_url, dataset, weights, args):
+    import httpx
+
+    names, cumulative = list(weights), list(weights.values())
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def worker(number, client):
+        rng = random.Random(args.seed + number)
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = rng.choices(names, cumulative)[0]
+            user_id = rng.choice(dataset.user_ids)
+            method, path, body = REQUESTS[name](rng, dataset, user_id)
+            began = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body,
+                                                headers={'Authorization': f"Bearer {TOKEN_PREFIX}{user_id}"})
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - began
+            if began >= measure_from:
+                if failed:
+                    errors[name] += 1
+                else:
+                    samples[name].append(elapsed)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await asyncio.gather(*(worker(number, client) for number in range(args.concurrency)))
+    return samples, errors
+
+
+def percentile(sorted_values, p):
+    # Percentil pelo método do posto mais próximo
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, errors, duration):
+    def row(latencies, error_count):
+        latencies = sorted(latencies)
+        summary = {
+            'requests': len(latencies),
+            'errors': error_count,
+            'rps': len(latencies) / duration,
+            'max_ms': latencies[-1] * 1000 if latencies else None,
+        }
+        for p in PERCENTILES:
+            value = percentile(latencies, p)
+            summary[f'p{p}_ms'] = value * 1000 if value is not None else None
+        return summary
+
+    routes = {name: row(samples[name], errors[name]) for name in samples}
+    total = row([value for values in samples.values() for value in values], sum(errors.values()))
+    return {'routes': routes, 'total': total}
+
+
+def print_report(results, args):
+    print(f"engine={args.engine} cursos={args.courses} disciplinas/curso={args.disciplines} usuários={args.users} "
+          f"concorrência={args.concurrency} duração={args.duration}s")
+    header = f"{'rota':<14}{'reqs':>8}{'erros':>7}{'req/s':>9}" + ''.join(f"{f'p{p} ms':>9}" for p in PERCENTILES)
+    print(header + f"{'max ms':>9}")
+
+    def fmt(value):
+        return f"{value:9.2f}" if value is not None else f"{'-':>9}"
+
+    for name, summary in [*results['routes'].items(), ('total', results['total'])]:
+        print(f"{name:<14}{summary['requests']:>8}{summary['errors']:>7}{summary['rps']:>9.1f}"
+              + ''.join(fmt(summary[f'p{p}_ms']) for p in PERCENTILES) + fmt(summary['max_ms']))
+
+
+def regressions(results, baseline, tolerance):
+    """Lista as métricas que pioraram mais do que `tolerance` (fração) em relação ao baseline."""
+    found = []
+    base_rps, rps = baseline['total']['rps'], results['total']['rps']
+    if base_rps and rps < base_rps * (1 - tolerance):
+        found.append(f"req/s total: {rps:.1f} < {base_rps:.1f}")
+    for name, summary in results['routes'].items():
+        base = baseline['routes'].get(name)
+        if not base:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if base[metric] and summary[metric] and summary[metric] > base[metric] * (1 + tolerance):
+                found.append(f"{name} {metric}: {summary[metric]:.2f} > {base[metric]:.2f}")
+    return found
+
+
+def main():
+    args = parse_args()
+    weights = parse_mix(args.mix)
+
+    with Server(args) as (base_url, dataset):
+        samples, errors = asyncio.run(drive(base_url, dataset, weights, args))
+    results = summarize(samples, errors, args.duration)
+    print_report(results, args)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'config': vars(args), **results}, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        found = regressions(results, baseline, args.max_regression)
+        if found:
+            print("Regressões acima de {:.0%}:".format(args.max_regression))
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Sem regressões em relação ao baseline")
+
+
+if __name__ == '__main__':
+    main()
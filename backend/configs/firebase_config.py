@@ -1,9 +1,11 @@
 import firebase_admin
 from firebase_admin import credentials
 
+from configs import settings
+
 
 def initialize_firebase():
     if not firebase_admin._apps:
-    # Substitua pelo caminho para o seu arquivo de chave JSON do Firebase
-        cred = credentials.Certificate("/Users/danielm/Documents/ifocus/ifocus_app/backend/serviceAccountKey.json")
+        # Caminho do arquivo de chave JSON do Firebase, configurável pela variável FIREBASE_CREDENTIALS
+        cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS)
         firebase_admin.initialize_app(cred)
@@ -0,0 +1,81 @@
+import os
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_str(name, default=None):
+    return os.getenv(name) or default
+
+
+# Armazenamento
+# Engine usado por Db/AsyncDb: 'firestore', 'memory' (em memória, por processo; para desenvolvimento,
+# benchmarks e testes de carga) ou 'sqlite' (banco local, para implantações auto-hospedadas).
+STORAGE_ENGINE = _env_str("STORAGE_ENGINE", "firestore")
+# Arquivo do banco do engine 'sqlite'. ':memory:' mantém o banco apenas em memória.
+SQLITE_PATH = _env_str("SQLITE_PATH", "ifocus.db")
+# Arquivo JSON com a chave da conta de serviço do Firebase (ver configs/firebase_config.py).
+FIREBASE_CREDENTIALS = _env_str("FIREBASE_CREDENTIALS",
+                                "/Users/danielm/Documents/ifocus/ifocus_app/backend/serviceAccountKey.json")
+
+# Firestore
+# Número de clientes (canais gRPC) mantidos por processo. O total de conexões
+# abertas é FIRESTORE_POOL_SIZE * número de workers do uvicorn.
+FIRESTORE_POOL_SIZE = _env_int("FIRESTORE_POOL_SIZE", 1)
+# Intervalo entre pings de keep-alive do canal gRPC e tempo máximo de espera pela resposta.
+FIRESTORE_KEEPALIVE_TIME_MS = _env_int("FIRESTORE_KEEPALIVE_TIME_MS", 30000)
+FIRESTORE_KEEPALIVE_TIMEOUT_MS = _env_int("FIRESTORE_KEEPALIVE_TIMEOUT_MS", 10000)
+# Número máximo de listagens de subcoleções em paralelo nas exclusões recursivas.
+FIRESTORE_DELETE_CONCURRENCY = _env_int("FIRESTORE_DELETE_CONCURRENCY", 8)
+
+# Autenticação
+# Cache de tokens verificados: número máximo de entradas e tempo de vida (segundos).
+# Uma entrada nunca sobrevive ao 'exp' do próprio token.
+AUTH_TOKEN_CACHE_SIZE = _env_int("AUTH_TOKEN_CACHE_SIZE", 10000)
+AUTH_TOKEN_CACHE_TTL = _env_int("AUTH_TOKEN_CACHE_TTL", 300)
+
+# Modo de verificação dos ID tokens: 'firebase' (firebase_admin.auth) ou 'local'
+# (assinatura verificada localmente com chaves públicas em cache).
+AUTH_VERIFY_MODE = _env_str("AUTH_VERIFY_MODE", "firebase")
+# Arquivo JWKS local com as chaves de assinatura. Se definido, as chaves não são buscadas na rede.
+AUTH_JWKS_FILE = _env_str("AUTH_JWKS_FILE")
+# ID do projeto Firebase usado como audience/issuer. Por padrão, o projeto do app Firebase.
+AUTH_PROJECT_ID = _env_str("AUTH_PROJECT_ID")
+
+# Catálogo (cursos e disciplinas)
+# Cache de leitura em memória: número máximo de listagens mantidas e tempo de vida (segundos).
+CATALOG_CACHE_SIZE = _env_int("CATALOG_CACHE_SIZE", 256)
+CATALOG_CACHE_TTL = _env_int("CATALOG_CACHE_TTL", 300)
+# Espelho do catálogo mantido por listeners on_snapshot do Firestore. Quando ativo,
+# as listagens de cursos e disciplinas são servidas da memória sem consultar o banco.
+CATALOG_MIRROR_ENABLED = _env_str("CATALOG_MIRROR_ENABLED", "false").lower() == "true"
+# Número de shards dos contadores de helpers/seekers de cada disciplina. Cada shard aguenta
+# cerca de uma escrita por segundo; disciplinas mais disputadas precisam de mais shards.
+DISCIPLINE_COUNTER_SHARDS = _env_int("DISCIPLINE_COUNTER_SHARDS", 10)
+
+# Monitoramento
+# Expõe GET /metrics (formato do Prometheus) e mede as requisições HTTP. Desativado por padrão.
+# As operações de Db/AsyncDb e a verificação de tokens são sempre medidas (ver monitoring/metrics.py).
+METRICS_ENABLED = _env_str("METRICS_ENABLED", "false").lower() == "true"
+# Caminho do endpoint de métricas.
+METRICS_PATH = _env_str("METRICS_PATH", "/metrics")
+# Token exigido no cabeçalho 'Authorization: Bearer <token>' de GET /metrics (no Prometheus,
+# 'authorization.credentials' do scrape). Sem token, o endpoint fica aberto: restrinja o acesso na rede.
+METRICS_TOKEN = _env_str("METRICS_TOKEN")
+# Rastro das operações de banco de cada requisição: contagens de leituras/escritas, avisos de N+1
+# e estatísticas dos documentos mais acessados (GET /admin/db/hot-documents). Desativado por padrão:
+# cada operação de banco passa a registrar os caminhos dos documentos, o que custa memória e CPU.
+DB_TRACE_ENABLED = _env_str("DB_TRACE_ENABLED", "false").lower() == "true"
+# Envia o resumo do rastro no cabeçalho X-Db-Trace de cada resposta (para depuração).
+DB_TRACE_HEADER = _env_str("DB_TRACE_HEADER", "false").lower() == "true"
+# Leituras de um único documento na mesma coleção, em uma requisição, a partir das quais ela é marcada como N+1.
+DB_TRACE_N_PLUS_ONE_THRESHOLD = _env_int("DB_TRACE_N_PLUS_ONE_THRESHOLD", 5)
+# Número máximo de caminhos de documentos mantidos em cada contador de documentos mais acessados.
+DB_TRACE_HOT_DOCUMENTS_SIZE = _env_int("DB_TRACE_HOT_DOCUMENTS_SIZE", 10000)
+
+# Matchmaking
+# Intervalo (segundos) para reconstruir o índice de helpers/seekers a partir do banco. Entre
+# reconstruções, o índice só reflete as alterações feitas no próprio processo.
+MATCHING_INDEX_TTL = _env_int("MATCHING_INDEX_TTL", 300)
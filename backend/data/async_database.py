@@ -0,0 +1,187 @@
+from configs import settings
+from data.database import Db
+from data.firestore_engine import AsyncFirestoreEngine
+from data.storage import AsyncEngineAdapter
+from monitoring.metrics import instrument_db
+
+
+def create_async_engine():
+    """
+    Cria o engine de armazenamento assíncrono de settings.STORAGE_ENGINE. Os engines locais ('memory' e
+    'sqlite') são o próprio engine de Db, adaptado, para que Db e AsyncDb enxerguem os mesmos dados.
+    """
+    if settings.STORAGE_ENGINE == 'firestore':
+        return AsyncFirestoreEngine.from_settings()
+    return AsyncEngineAdapter(Db.get_engine())
+
+
+class AsyncDb:
+    """
+    Versão assíncrona de Db, construída sobre um AsyncStorageEngine (no Firestore, o AsyncClient).
+    Mantém a mesma interface e a mesma semântica; cada método deve ser aguardado com await.
+    """
+
+    # Engine de armazenamento assíncrono (ver AsyncStorageEngine), configurado no lifespan do FastAPI (ver main.py)
+    _engine = None
+
+    @staticmethod
+    def use_engine(engine):
+        """Define o engine usado por todas as operações. Passe None para desassociar."""
+        AsyncDb._engine = engine
+
+    @staticmethod
+    def get_engine():
+        # Fora do ciclo de vida da aplicação cria o engine configurado (o do Firestore fica preso ao event loop atual)
+        if AsyncDb._engine is None:
+            AsyncDb._engine = create_async_engine()
+        return AsyncDb._engine
+
+    @staticmethod
+    async def close_engine():
+        """Fecha o engine, se tiver sido criado. Os engines locais são fechados por Db.close_engine."""
+        engine, AsyncDb._engine = AsyncDb._engine, None
+        if engine is not None:
+            await engine.aclose()
+
+    @staticmethod
+    @instrument_db('async')
+    async def create_document(collection_name, document_data, document_id=None):
+        """
+        Cria um documento com uma única escrita. O ID é gerado no cliente (ou usado o informado)
+        antes da gravação, para que o campo 'id' já seja gravado junto com os dados.
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param document_data: Dados do documento; o campo 'id' é preenchido com o ID do documento.
+        :param document_id: ID do documento (opcional). Um documento existente com esse ID é sobrescrito.
+        :return: ID do documento criado.
+        """
+        return await AsyncDb.get_engine().create_document(collection_name, document_data, document_id)
+
+    @staticmethod
+    @instrument_db('async')
+    async def get_document(collection_name, document_id, fields=None):
+        """Obtém os dados de um documento, ou {} se ele não existir. Mesmos parâmetros de Db.get_document."""
+        return await AsyncDb.get_engine().get_document(collection_name, document_id, fields)
+
+    @staticmethod
+    @instrument_db('async')
+    async def get_documents(collection_name, document_ids, fields=None):
+        """
+        Obtém vários documentos de uma coleção com get_all, em blocos de até GET_ALL_CHUNK IDs.
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param document_ids: Lista de IDs dos documentos.
+        :param fields: Campos a ler (opcional, ver Db.get_all_documents).
+        :return: Lista de dicionários com o 'id' e os dados de cada documento, na ordem dos IDs
+                 fornecidos. Documentos inexistentes são omitidos.
+        """
+        return await AsyncDb.get_engine().get_documents(collection_name, document_ids, fields)
+
+    @staticmethod
+    @instrument_db('async')
+    async def update_document(collection_name, document_id, updates):
+        await AsyncDb.get_engine().update_document(collection_name, document_id, updates)
+
+    @staticmethod
+    @instrument_db('async')
+    async def batch_update(updates):
+        """
+        Aplica várias atualizações de documentos em commits de WriteBatch.
+        As operações são agrupadas em lotes de até BATCH_LIMIT; cada lote é atômico.
+
+        :param updates: Iterável de tuplas (collection_name, document_id, updates).
+        """
+        await AsyncDb.get_engine().batch_update(updates)
+
+    @staticmethod
+    @instrument_db('async')
+    async def batch_write(writes):
+        """
+        Aplica escritas de tipos variados (ver Write) em commits de WriteBatch de até BATCH_LIMIT operações.
+        Cada lote é atômico; a lista inteira só é atômica se couber em um lote.
+
+        :param writes: Iterável de escritas Write.
+        """
+        await AsyncDb.get_engine().batch_write(writes)
+
+    @staticmethod
+    def new_document_id(collection_name):
+        """Gera no cliente, sem acessar o banco, um ID aleatório para um novo documento da coleção."""
+        return AsyncDb.get_engine().new_document_id(collection_name)
+
+    @staticmethod
+    @instrument_db('async')
+    async def batch_set(writes):
+        """
+        Grava vários documentos (set) em commits de WriteBatch de até BATCH_LIMIT operações.
+        Cada lote é atômico; diferente de batch_update, a falha de um lote não interrompe os seguintes.
+
+        :param writes: Lista de tuplas (collection_name, document_id, document_data).
+        :return: Lista alinhada com `writes`: None para cada documento gravado, ou a exceção do lote que falhou.
+        """
+        return await AsyncDb.get_engine().batch_set(writes)
+
+    @staticmethod
+    @instrument_db('async')
+    async def update_in_transaction(collection_name, document_id, build_updates):
+        """
+        Lê um documento e aplica, na mesma transação, as atualizações calculadas a partir dele.
+        Em caso de conflito com uma escrita concorrente, o Firestore repete a transação; nos engines
+        locais (memória e SQLite), as transações são serializadas.
+
+        :param collection_name: Coleção do documento lido.
+        :param document_id: ID do documento lido.
+        :param build_updates: Função (síncrona) que recebe os dados atuais do documento ({} se não existir)
+                              e retorna um iterável de tuplas (collection_name, document_id, updates)
+                              ou de escritas Write.
+        """
+        await AsyncDb.get_engine().update_in_transaction(collection_name, document_id, build_updates)
+
+    @staticmethod
+    @instrument_db('async')
+    async def delete_document(collection_name, document_id):
+        await AsyncDb.get_engine().delete_document(collection_name, document_id)
+
+    @staticmethod
+    @instrument_db('async')
+    async def delete_recursive(collection_name, document_ids=None, dry_run=False, on_progress=None):
+        """
+        Exclui documentos e todas as suas subcoleções em lotes de até BATCH_LIMIT exclusões
+        (no Firestore, ver AsyncRecursiveDelete).
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param document_ids: IDs dos documentos a excluir. Se None, exclui a coleção inteira.
+        :param dry_run: Se True, apenas conta os documentos que seriam excluídos.
+        :param on_progress: Função chamada com o progresso ({'deleted', 'batches', 'dry_run'}) após cada lote.
+        :return: Dicionário com o total de documentos excluídos e de lotes gravados.
+        """
+        return await AsyncDb.get_engine().delete_recursive(collection_name, document_ids, dry_run, on_progress)
+
+    @staticmethod
+    async def delete_all_courses(dry_run=False, on_progress=None):
+        """Exclui todos os cursos, incluindo as disciplinas de cada um. Ver delete_recursive."""
+        return await AsyncDb.delete_recursive('courses', dry_run=dry_run, on_progress=on_progress)
+
+    @staticmethod
+    @instrument_db('async')
+    async def get_all_documents(collection_name, fields=None):
+        """Obtém todos os documentos de uma coleção, ordenados pelo ID. Mesmos parâmetros de Db.get_all_documents."""
+        return await AsyncDb.get_engine().get_all_documents(collection_name, fields)
+
+    @staticmethod
+    @instrument_db('async')
+    async def get_collection_group_documents(collection_id, field=None, value=None, fields=None):
+        """
+        Obtém todos os documentos de todas as coleções com o nome informado, em qualquer nível.
+        Mesmos parâmetros de Db.get_collection_group_documents.
+        """
+        return await AsyncDb.get_engine().get_collection_group_documents(collection_id, field, value, fields)
+
+    @staticmethod
+    @instrument_db('async')
+    async def get_documents_page(collection_name, limit, start_after=None, order_by=None, fields=None):
+        """
+        Obtém uma página de documentos de uma coleção, ordenada por `order_by` e pelo ID do documento.
+        Mesmos parâmetros e cursores de Db.get_documents_page.
+        """
+        return await AsyncDb.get_engine().get_documents_page(collection_name, limit, start_after, order_by, fields)
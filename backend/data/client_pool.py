@@ -0,0 +1,123 @@
+import itertools
+import threading
+
+import firebase_admin
+from firebase_admin import firestore
+from google.cloud.firestore_v1.services.firestore import async_client as firestore_async_client
+from google.cloud.firestore_v1.services.firestore import client as firestore_client
+from google.cloud.firestore_v1.services.firestore.transports import grpc as firestore_grpc_transport
+from google.cloud.firestore_v1.services.firestore.transports import grpc_asyncio as firestore_grpc_asyncio_transport
+
+from configs import settings
+
+
+class FirestoreClientPool:
+    """
+    Pool de clientes Firestore com escopo de aplicação.
+    Cada cliente possui o seu próprio canal gRPC; as requisições são distribuídas entre eles em round-robin.
+    """
+
+    def __init__(self, size=1, keepalive_time_ms=30000, keepalive_timeout_ms=10000, app=None):
+        """
+        :param size: Número de clientes (canais gRPC) no pool.
+        :param keepalive_time_ms: Intervalo entre pings de keep-alive do canal.
+        :param keepalive_timeout_ms: Tempo máximo de espera pela resposta de um ping.
+        :param app: App do Firebase Admin (opcional). Se não fornecido, usa o app padrão.
+        """
+        if size < 1:
+            raise ValueError("O tamanho do pool deve ser um número positivo")
+        self.size = size
+        self.keepalive_time_ms = keepalive_time_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        self.app = app
+        self._clients = []
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, app=None):
+        """Cria um pool com os valores definidos em configs/settings.py."""
+        return cls(
+            size=settings.FIRESTORE_POOL_SIZE,
+            keepalive_time_ms=settings.FIRESTORE_KEEPALIVE_TIME_MS,
+            keepalive_timeout_ms=settings.FIRESTORE_KEEPALIVE_TIMEOUT_MS,
+            app=app,
+        )
+
+    def _channel_options(self):
+        return [
+            ("grpc.keepalive_time_ms", self.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", -1),
+            # Cada cliente abre a sua própria conexão em vez de compartilhar o subchannel global
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+
+    # Classes do cliente, do transporte gRPC e do cliente GAPIC usadas na criação de cada cliente
+    client_class = firestore.Client
+    transport_class = firestore_grpc_transport.FirestoreGrpcTransport
+    api_class = firestore_client.FirestoreClient
+
+    def _create_client(self):
+        app = self.app or firebase_admin.get_app()
+        client = self.client_class(credentials=app.credential.get_credential(), project=app.project_id)
+        if client._emulator_host is None:
+            # O cliente do Firestore cria o canal de forma preguiçosa com opções fixas e não aceita um
+            # transporte nem opções de canal no construtor; pré-configuramos o transporte para aplicar
+            # as opções de keep-alive do pool. Os atributos privados usados aqui e em close() são os da
+            # versão fixada em requirements.txt, verificados por tests/test_client_pool.py.
+            channel = self.transport_class.create_channel(
+                client._target,
+                credentials=client._credentials,
+                options=self._channel_options(),
+            )
+            client._transport = self.transport_class(host=client._target, channel=channel)
+            client._firestore_api_internal = self.api_class(
+                transport=client._transport, client_options=client._client_options
+            )
+        return client
+
+    def open(self):
+        """Cria os clientes do pool. Chamado uma única vez na inicialização da aplicação."""
+        with self._lock:
+            if not self._clients:
+                self._clients = [self._create_client() for _ in range(self.size)]
+                self._cycle = itertools.cycle(self._clients)
+        return self
+
+    def get(self):
+        """Retorna o próximo cliente do pool."""
+        if not self._clients:
+            self.open()
+        with self._lock:
+            return next(self._cycle)
+
+    def close(self):
+        """Fecha os canais gRPC de todos os clientes do pool."""
+        with self._lock:
+            clients, self._clients, self._cycle = self._clients, [], None
+        for client in clients:
+            if client._firestore_api_internal is not None:
+                client._firestore_api_internal.transport.close()
+
+
+class AsyncFirestoreClientPool(FirestoreClientPool):
+    """
+    Pool de clientes AsyncClient do Firestore, usados pelas rotas assíncronas via AsyncDb.
+    Os canais gRPC asyncio ficam presos ao event loop em que foram criados, por isso o pool
+    deve ser aberto dentro do loop da aplicação (no lifespan do FastAPI).
+    """
+
+    client_class = firestore.AsyncClient
+    transport_class = firestore_grpc_asyncio_transport.FirestoreGrpcAsyncIOTransport
+    api_class = firestore_async_client.FirestoreAsyncClient
+
+    async def aclose(self):
+        """Fecha os canais gRPC de todos os clientes do pool."""
+        with self._lock:
+            clients, self._clients, self._cycle = self._clients, [], None
+        for client in clients:
+            if client._firestore_api_internal is not None:
+                await client._firestore_api_internal.transport.close()
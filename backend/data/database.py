@@ -1,71 +1,217 @@
-from firebase_admin import firestore
+from configs import settings
+from data.firestore_engine import FirestoreEngine
+from data.memory_engine import MemoryEngine
+from data.sqlite_engine import SQLiteEngine
+# Reexportados para os repositórios, que montam as escritas com Write
+from data.storage import BATCH_LIMIT, GET_ALL_CHUNK, Write
+from monitoring.metrics import instrument_db
+
+
+def create_engine(name=None):
+    """
+    Cria o engine de armazenamento síncrono configurado.
+
+    :param name: 'firestore', 'memory' ou 'sqlite'. Por padrão, settings.STORAGE_ENGINE.
+    :raises ValueError: Se o engine não existir.
+    """
+    name = name or settings.STORAGE_ENGINE
+    if name == 'firestore':
+        return FirestoreEngine.from_settings()
+    if name == 'memory':
+        return MemoryEngine()
+    if name == 'sqlite':
+        return SQLiteEngine(settings.SQLITE_PATH)
+    raise ValueError(f"Engine de armazenamento desconhecido: {name}")
+
 
 class Db:
-    def __init__(self):
-        self.db = firestore.client()  # Conexão com Firestore
+    # Engine de armazenamento (ver StorageEngine), configurado no lifespan do FastAPI (ver main.py)
+    _engine = None
+
     @staticmethod
-    def get_client():
-        return firestore.client()
+    def use_engine(engine):
+        """Define o engine usado por todas as operações. Passe None para desassociar."""
+        Db._engine = engine
 
     @staticmethod
+    def get_engine():
+        # Fora do ciclo de vida da aplicação (scripts, jobs) cria o engine configurado na primeira chamada
+        if Db._engine is None:
+            Db._engine = create_engine()
+        return Db._engine
+
+    @staticmethod
+    def close_engine():
+        """Fecha o engine, se tiver sido criado."""
+        engine, Db._engine = Db._engine, None
+        if engine is not None:
+            engine.close()
+
+    @staticmethod
+    @instrument_db('sync')
     def create_document(collection_name, document_data, document_id=None):
-        db = Db.get_client()
-        collection_ref = db.collection(collection_name)
-        if document_id:
-            # Cria o documento com um ID especificado
-            doc_ref = collection_ref.document(document_id)
-            doc_ref.set(document_data)
-        else:
-            # Adiciona um novo documento e obtém a referência
-            doc_ref = collection_ref.add(document_data)[1]
-
-        # Atualiza o documento com o ID gerado, incluindo o 'id' dentro dos dados
-        document_data['id'] = doc_ref.id
-        doc_ref.set(document_data, merge=True)  # Atualiza o documento com o novo campo 'id'
-
-        # Retorna o ID do documento criado
-        return doc_ref.id
-
-    @staticmethod
-    def get_document(collection_name, document_id):
-        db = Db.get_client()
-        doc_ref = db.collection(collection_name).document(document_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            return doc.to_dict()
-        else:
-            return {}
+        """
+        Cria um documento com uma única escrita. O ID é gerado no cliente (ou usado o informado)
+        antes da gravação, para que o campo 'id' já seja gravado junto com os dados.
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param document_data: Dados do documento; o campo 'id' é preenchido com o ID do documento.
+        :param document_id: ID do documento (opcional). Um documento existente com esse ID é sobrescrito.
+        :return: ID do documento criado.
+        """
+        return Db.get_engine().create_document(collection_name, document_data, document_id)
 
     @staticmethod
+    @instrument_db('sync')
+    def get_document(collection_name, document_id, fields=None):
+        """
+        Obtém os dados de um documento, ou {} se ele não existir.
+
+        :param fields: Campos a ler (opcional, ver get_all_documents). Por padrão, o documento inteiro.
+        """
+        return Db.get_engine().get_document(collection_name, document_id, fields)
+
+    @staticmethod
+    @instrument_db('sync')
+    def get_documents(collection_name, document_ids, fields=None):
+        """
+        Obtém vários documentos de uma coleção com get_all, em blocos de até GET_ALL_CHUNK IDs.
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param document_ids: Lista de IDs dos documentos.
+        :param fields: Campos a ler (opcional, ver get_all_documents).
+        :return: Lista de dicionários com o 'id' e os dados de cada documento, na ordem dos IDs
+                 fornecidos. Documentos inexistentes são omitidos.
+        """
+        return Db.get_engine().get_documents(collection_name, document_ids, fields)
+
+    @staticmethod
+    @instrument_db('sync')
     def update_document(collection_name, document_id, updates):
-        db = Db.get_client()
-        doc_ref = db.collection(collection_name).document(document_id)
-        doc_ref.update(updates)
+        Db.get_engine().update_document(collection_name, document_id, updates)
+
+    @staticmethod
+    @instrument_db('sync')
+    def batch_update(updates):
+        """
+        Aplica várias atualizações de documentos em commits de WriteBatch.
+        As operações são agrupadas em lotes de até BATCH_LIMIT; cada lote é atômico.
+
+        :param updates: Iterável de tuplas (collection_name, document_id, updates).
+        """
+        Db.get_engine().batch_update(updates)
 
     @staticmethod
+    @instrument_db('sync')
+    def batch_write(writes):
+        """
+        Aplica escritas de tipos variados (ver Write) em commits de WriteBatch de até BATCH_LIMIT operações.
+        Cada lote é atômico; a lista inteira só é atômica se couber em um lote.
+
+        :param writes: Iterável de escritas Write.
+        """
+        Db.get_engine().batch_write(writes)
+
+    @staticmethod
+    def new_document_id(collection_name):
+        """Gera no cliente, sem acessar o banco, um ID aleatório para um novo documento da coleção."""
+        return Db.get_engine().new_document_id(collection_name)
+
+    @staticmethod
+    @instrument_db('sync')
+    def batch_set(writes):
+        """
+        Grava vários documentos (set) em commits de WriteBatch de até BATCH_LIMIT operações.
+        Cada lote é atômico; diferente de batch_update, a falha de um lote não interrompe os seguintes.
+
+        :param writes: Lista de tuplas (collection_name, document_id, document_data).
+        :return: Lista alinhada com `writes`: None para cada documento gravado, ou a exceção do lote que falhou.
+        """
+        return Db.get_engine().batch_set(writes)
+
+    @staticmethod
+    @instrument_db('sync')
+    def update_in_transaction(collection_name, document_id, build_updates):
+        """
+        Lê um documento e aplica, na mesma transação, as atualizações calculadas a partir dele.
+        Em caso de conflito com uma escrita concorrente, o Firestore repete a transação; nos engines
+        locais (memória e SQLite), as transações são serializadas.
+
+        :param collection_name: Coleção do documento lido.
+        :param document_id: ID do documento lido.
+        :param build_updates: Função que recebe os dados atuais do documento ({} se não existir)
+                              e retorna um iterável de tuplas (collection_name, document_id, updates)
+                              ou de escritas Write.
+        """
+        Db.get_engine().update_in_transaction(collection_name, document_id, build_updates)
+
+    @staticmethod
+    @instrument_db('sync')
     def delete_document(collection_name, document_id):
-        db = Db.get_client()
-        doc_ref = db.collection(collection_name).document(document_id)
-        doc_ref.delete()
+        Db.get_engine().delete_document(collection_name, document_id)
 
     @staticmethod
-    def delete_all_courses():
-        try:
-            db = firestore.client()
-            courses_ref = db.collection('courses')
-            docs = courses_ref.stream()
+    @instrument_db('sync')
+    def delete_recursive(collection_name, document_ids=None, dry_run=False, on_progress=None):
+        """
+        Exclui documentos e todas as suas subcoleções em lotes de até BATCH_LIMIT exclusões
+        (no Firestore, ver RecursiveDelete).
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param document_ids: IDs dos documentos a excluir. Se None, exclui a coleção inteira.
+        :param dry_run: Se True, apenas conta os documentos que seriam excluídos.
+        :param on_progress: Função chamada com o progresso ({'deleted', 'batches', 'dry_run'}) após cada lote.
+        :return: Dicionário com o total de documentos excluídos e de lotes gravados.
+        """
+        return Db.get_engine().delete_recursive(collection_name, document_ids, dry_run, on_progress)
 
-            for doc in docs:
-                doc.reference.delete()
+    @staticmethod
+    def delete_all_courses(dry_run=False, on_progress=None):
+        """Exclui todos os cursos, incluindo as disciplinas de cada um. Ver delete_recursive."""
+        return Db.delete_recursive('courses', dry_run=dry_run, on_progress=on_progress)
+
+    @staticmethod
+    @instrument_db('sync')
+    def get_all_documents(collection_name, fields=None):
+        """
+        Obtém todos os documentos de uma coleção, ordenados pelo ID.
 
-            print("All courses deleted successfully.")
-        except Exception as e:
-            print(f"Error deleting all courses: {e}")
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param fields: Campos a ler (projeção, como select no Firestore), por exemplo ('name', 'code').
+                       Evita transferir e decodificar campos grandes que a leitura não usa.
+                       Por padrão (None), os documentos inteiros; com uma lista vazia, apenas os IDs.
+        :return: Lista de dicionários com 'id' e os dados (ou apenas os campos de `fields` presentes no documento).
+        """
+        return Db.get_engine().get_all_documents(collection_name, fields)
 
     @staticmethod
-    def get_all_documents(collection_name):
-        db = Db.get_client()
-        collection_ref = db.collection(collection_name)
-        docs = collection_ref.stream()
-        # Retorna o UID e os dados do documento como um dicionário
-        return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+    @instrument_db('sync')
+    def get_collection_group_documents(collection_id, field=None, value=None, fields=None):
+        """
+        Obtém todos os documentos de todas as coleções com o nome informado, em qualquer nível
+        (por exemplo, 'disciplines' e 'courses/{id}/disciplines').
+
+        :param collection_id: Nome das coleções.
+        :param field: Campo para filtrar por igualdade (opcional). O filtro exige o índice de
+                      collection group desse campo habilitado no Firestore.
+        :param value: Valor do campo `field`.
+        :param fields: Campos a ler (opcional, ver get_all_documents).
+        :return: Lista de dicionários com 'id', 'parent_id' (ID do documento-pai, ou None) e os dados.
+        """
+        return Db.get_engine().get_collection_group_documents(collection_id, field, value, fields)
+
+    @staticmethod
+    @instrument_db('sync')
+    def get_documents_page(collection_name, limit, start_after=None, order_by=None, fields=None):
+        """
+        Obtém uma página de documentos de uma coleção, ordenada por `order_by` e pelo ID do documento.
+
+        :param collection_name: Nome (ou caminho) da coleção.
+        :param limit: Número máximo de documentos na página.
+        :param start_after: Cursor opaco devolvido pela página anterior (opcional).
+        :param order_by: Campo de ordenação (opcional). Documentos sem o campo não são retornados.
+        :param fields: Campos a ler (opcional, ver get_all_documents); o campo `order_by` é sempre lido.
+        :return: Tupla (lista de dicionários com 'id' e dados, cursor da próxima página ou None).
+        :raises ValueError: Se o cursor for inválido.
+        """
+        return Db.get_engine().get_documents_page(collection_name, limit, start_after, order_by, fields)
@@ -0,0 +1,213 @@
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from configs import settings
+from data.client_pool import AsyncFirestoreClientPool, FirestoreClientPool
+from data.pagination import page_query, split_page
+from data.recursive_delete import AsyncRecursiveDelete, RecursiveDelete
+from data.storage import BATCH_LIMIT, GET_ALL_CHUNK, AsyncStorageEngine, StorageEngine, as_write, page_fields
+
+
+def apply_write(db, target, write):
+    """Aplica uma Write em um WriteBatch ou Transaction (síncronos ou assíncronos)."""
+    doc_ref = db.collection(write.collection_name).document(write.document_id)
+    if write.op == 'set':
+        target.set(doc_ref, write.data)
+    elif write.op == 'merge':
+        target.set(doc_ref, write.data, merge=True)
+    elif write.op == 'update':
+        target.update(doc_ref, write.data)
+    elif write.op == 'delete':
+        target.delete(doc_ref)
+    else:
+        raise ValueError(f"Operação de escrita inválida: {write.op}")
+
+
+def select(query, fields):
+    """Aplica a projeção (select) dos campos à consulta; com fields None, a consulta traz os documentos inteiros."""
+    return query.select(fields) if fields is not None else query
+
+
+class FirestoreEngine(StorageEngine):
+    """Engine de armazenamento sobre o Firestore, com os clientes de um FirestoreClientPool."""
+
+    def __init__(self, pool):
+        """
+        :param pool: Pool de clientes síncronos (ver FirestoreClientPool).
+        """
+        self.pool = pool
+
+    @classmethod
+    def from_settings(cls):
+        """Cria o engine com um pool configurado em configs/settings.py."""
+        return cls(FirestoreClientPool.from_settings().open())
+
+    def client(self):
+        """Retorna o próximo cliente do pool (por exemplo, para os listeners do espelho do catálogo)."""
+        return self.pool.get()
+
+    def close(self):
+        self.pool.close()
+
+    def new_document_id(self, collection_name):
+        return self.client().collection(collection_name).document().id
+
+    def get_document(self, collection_name, document_id, fields=None):
+        doc = self.client().collection(collection_name).document(document_id).get(field_paths=fields)
+        if doc.exists:
+            return doc.to_dict()
+        return {}
+
+    def get_documents(self, collection_name, document_ids, fields=None):
+        db = self.client()
+        collection_ref = db.collection(collection_name)
+        unique_ids = list(dict.fromkeys(document_ids))
+        found = {}
+        for start in range(0, len(unique_ids), GET_ALL_CHUNK):
+            refs = [collection_ref.document(document_id) for document_id in unique_ids[start:start + GET_ALL_CHUNK]]
+            # get_all devolve os documentos na ordem em que chegam, não na ordem pedida
+            for doc in db.get_all(refs, field_paths=fields):
+                if doc.exists:
+                    found[doc.id] = {'id': doc.id, **doc.to_dict()}
+        return [found[document_id] for document_id in unique_ids if document_id in found]
+
+    def commit(self, writes):
+        db = self.client()
+        batch = db.batch()
+        for write in writes:
+            apply_write(db, batch, write)
+        batch.commit()
+
+    def update_in_transaction(self, collection_name, document_id, build_updates):
+        db = self.client()
+        doc_ref = db.collection(collection_name).document(document_id)
+
+        # Em caso de conflito com uma escrita concorrente, o Firestore repete a transação
+        @firestore.transactional
+        def run(transaction):
+            doc = doc_ref.get(transaction=transaction)
+            document_data = doc.to_dict() if doc.exists else {}
+            for write in build_updates(document_data):
+                apply_write(db, transaction, as_write(write))
+
+        run(db.transaction())
+
+    def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        db = self.client()
+        collection_ref = db.collection(collection_name)
+        deleter = RecursiveDelete(db, BATCH_LIMIT, dry_run, on_progress)
+        if document_ids is None:
+            deleter.delete_collection(collection_ref)
+        else:
+            deleter.delete_documents([collection_ref.document(document_id) for document_id in document_ids])
+        return deleter.flush()
+
+    def get_all_documents(self, collection_name, fields=None):
+        docs = select(self.client().collection(collection_name), fields).stream()
+        # Retorna o UID e os dados do documento como um dicionário
+        return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+
+    def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        query = select(self.client().collection_group(collection_id), fields)
+        if field:
+            query = query.where(filter=FieldFilter(field, '==', value))
+        return [{'id': doc.id, 'parent_id': doc.reference.parent.parent.id if doc.reference.parent.parent else None,
+                 **doc.to_dict()} for doc in query.stream()]
+
+    def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        collection_ref = select(self.client().collection(collection_name), page_fields(fields, order_by))
+        query = page_query(collection_ref, limit, start_after, order_by)
+        docs = [{'id': doc.id, **doc.to_dict()} for doc in query.stream()]
+        return split_page(docs, limit, order_by)
+
+
+class AsyncFirestoreEngine(AsyncStorageEngine):
+    """Versão assíncrona de FirestoreEngine, com os clientes AsyncClient de um AsyncFirestoreClientPool."""
+
+    def __init__(self, pool, delete_concurrency=8):
+        """
+        :param pool: Pool de clientes assíncronos (ver AsyncFirestoreClientPool).
+        :param delete_concurrency: Número máximo de listagens de subcoleções em paralelo nas exclusões recursivas.
+        """
+        self.pool = pool
+        self.delete_concurrency = delete_concurrency
+
+    @classmethod
+    def from_settings(cls):
+        """Cria o engine com os valores de configs/settings.py. Deve ser chamado dentro do event loop da aplicação."""
+        return cls(AsyncFirestoreClientPool.from_settings().open(), settings.FIRESTORE_DELETE_CONCURRENCY)
+
+    def client(self):
+        """Retorna o próximo cliente do pool."""
+        return self.pool.get()
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+    def new_document_id(self, collection_name):
+        return self.client().collection(collection_name).document().id
+
+    async def get_document(self, collection_name, document_id, fields=None):
+        doc = await self.client().collection(collection_name).document(document_id).get(field_paths=fields)
+        if doc.exists:
+            return doc.to_dict()
+        return {}
+
+    async def get_documents(self, collection_name, document_ids, fields=None):
+        db = self.client()
+        collection_ref = db.collection(collection_name)
+        unique_ids = list(dict.fromkeys(document_ids))
+        found = {}
+        for start in range(0, len(unique_ids), GET_ALL_CHUNK):
+            refs = [collection_ref.document(document_id) for document_id in unique_ids[start:start + GET_ALL_CHUNK]]
+            async for doc in db.get_all(refs, field_paths=fields):
+                if doc.exists:
+                    found[doc.id] = {'id': doc.id, **doc.to_dict()}
+        return [found[document_id] for document_id in unique_ids if document_id in found]
+
+    async def commit(self, writes):
+        db = self.client()
+        batch = db.batch()
+        for write in writes:
+            apply_write(db, batch, write)
+        await batch.commit()
+
+    async def update_in_transaction(self, collection_name, document_id, build_updates):
+        db = self.client()
+        doc_ref = db.collection(collection_name).document(document_id)
+
+        @firestore.async_transactional
+        async def run(transaction):
+            doc = await doc_ref.get(transaction=transaction)
+            document_data = doc.to_dict() if doc.exists else {}
+            for write in build_updates(document_data):
+                apply_write(db, transaction, as_write(write))
+
+        await run(db.transaction())
+
+    async def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        db = self.client()
+        collection_ref = db.collection(collection_name)
+        deleter = AsyncRecursiveDelete(db, BATCH_LIMIT, dry_run, on_progress, concurrency=self.delete_concurrency)
+        if document_ids is None:
+            await deleter.delete_collection(collection_ref)
+        else:
+            await deleter.delete_documents([collection_ref.document(document_id) for document_id in document_ids])
+        return await deleter.flush()
+
+    async def get_all_documents(self, collection_name, fields=None):
+        query = select(self.client().collection(collection_name), fields)
+        return [{'id': doc.id, **doc.to_dict()} async for doc in query.stream()]
+
+    async def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        query = select(self.client().collection_group(collection_id), fields)
+        if field:
+            query = query.where(filter=FieldFilter(field, '==', value))
+        return [{'id': doc.id, 'parent_id': doc.reference.parent.parent.id if doc.reference.parent.parent else None,
+                 **doc.to_dict()} async for doc in query.stream()]
+
+    async def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        collection_ref = select(self.client().collection(collection_name), page_fields(fields, order_by))
+        query = page_query(collection_ref, limit, start_after, order_by)
+        docs = [{'id': doc.id, **doc.to_dict()} async for doc in query.stream()]
+        return split_page(docs, limit, order_by)
@@ -0,0 +1,106 @@
+import threading
+
+from data.storage import (BATCH_LIMIT, StorageEngine, Write, as_write, get_field, page_documents, page_fields,
+                          parent_document_id, project, random_document_id, stage_writes)
+
+
+class MemoryEngine(StorageEngine):
+    """
+    Engine de armazenamento em memória, por processo: {caminho da coleção: {ID: dados}}.
+    Indicado para desenvolvimento, benchmarks e testes de carga; os dados são perdidos ao encerrar o processo.
+    As escritas e transações são serializadas por um lock, e as leituras devolvem cópias dos documentos.
+    """
+
+    # Sem I/O: AsyncEngineAdapter executa as operações diretamente no event loop
+    blocking = False
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def new_document_id(self, collection_name):
+        return random_document_id()
+
+    def get_document(self, collection_name, document_id, fields=None):
+        with self._lock:
+            data = self._collections.get(collection_name, {}).get(document_id)
+            return project(data, fields) if data is not None else {}
+
+    def get_documents(self, collection_name, document_ids, fields=None):
+        with self._lock:
+            documents = self._collections.get(collection_name, {})
+            return [{'id': document_id, **project(documents[document_id], fields)}
+                    for document_id in dict.fromkeys(document_ids) if document_id in documents]
+
+    def commit(self, writes):
+        with self._lock:
+            staged = stage_writes(writes, self._read)
+            for (collection_name, document_id), data in staged.items():
+                if data is None:
+                    documents = self._collections.get(collection_name)
+                    if documents is not None:
+                        documents.pop(document_id, None)
+                        if not documents:
+                            del self._collections[collection_name]
+                else:
+                    self._collections.setdefault(collection_name, {})[document_id] = data
+
+    def update_in_transaction(self, collection_name, document_id, build_updates):
+        with self._lock:
+            writes = build_updates(self.get_document(collection_name, document_id))
+            self.commit([as_write(write) for write in writes])
+
+    def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        with self._lock:
+            if document_ids is None:
+                prefixes = [collection_name + '/']
+                targets = [(collection_name, document_id) for document_id in self._collections.get(collection_name, {})]
+            else:
+                prefixes = [f'{collection_name}/{document_id}/' for document_id in document_ids]
+                documents = self._collections.get(collection_name, {})
+                targets = [(collection_name, document_id) for document_id in document_ids if document_id in documents]
+            # Subcoleções antes dos documentos-pai, como em RecursiveDelete
+            descendants = [(path, document_id) for path, documents in self._collections.items()
+                           if path.startswith(tuple(prefixes)) for document_id in documents]
+            targets = descendants + targets
+            stats = {'deleted': 0, 'batches': 0, 'dry_run': dry_run}
+            for start in range(0, len(targets), BATCH_LIMIT):
+                chunk = targets[start:start + BATCH_LIMIT]
+                if not dry_run:
+                    self.commit([Write('delete', path, document_id) for path, document_id in chunk])
+                stats['deleted'] += len(chunk)
+                stats['batches'] += 1
+                if on_progress:
+                    on_progress(dict(stats))
+            return stats
+
+    def get_all_documents(self, collection_name, fields=None):
+        with self._lock:
+            documents = self._collections.get(collection_name, {})
+            return [{'id': document_id, **project(documents[document_id], fields)}
+                    for document_id in sorted(documents)]
+
+    def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        with self._lock:
+            results = []
+            for path in sorted(self._collections):
+                if path.rsplit('/', 1)[-1] != collection_id:
+                    continue
+                documents = self._collections[path]
+                for document_id in sorted(documents):
+                    data = documents[document_id]
+                    if field and get_field(data, field) != (True, value):
+                        continue
+                    results.append({'id': document_id, 'parent_id': parent_document_id(path), **project(data, fields)})
+            return results
+
+    def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        with self._lock:
+            documents = self._collections.get(collection_name, {})
+            docs = [{'id': document_id, **data} for document_id, data in documents.items()]
+            page, next_cursor = page_documents(docs, limit, start_after, order_by)
+            fields = page_fields(fields, order_by)
+            return [{'id': doc['id'], **project(documents[doc['id']], fields)} for doc in page], next_cursor
+
+    def _read(self, collection_name, document_id):
+        return self._collections.get(collection_name, {}).get(document_id)
@@ -0,0 +1,104 @@
+import base64
+import json
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+# Tamanho máximo de página aceito pelas rotas de listagem
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(document_id, order_value=None):
+    """
+    Gera um cursor opaco a partir do último documento de uma página.
+
+    :param document_id: ID do último documento retornado.
+    :param order_value: Valor do campo de ordenação nesse documento (se houver ordenação por campo).
+    :return: Cursor em base64 url-safe.
+    """
+    payload = json.dumps([order_value, document_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica um cursor gerado por encode_cursor.
+
+    :return: Tupla (order_value, document_id).
+    :raises ValueError: Se o cursor for inválido.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        order_value, document_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Cursor de paginação inválido")
+    if not isinstance(document_id, str):
+        raise ValueError("Cursor de paginação inválido")
+    return order_value, document_id
+
+
+def page_query(collection_ref, limit, start_after=None, order_by=None):
+    """
+    Monta a consulta de uma página: ordenada por `order_by` (se houver) e pelo ID do documento,
+    a partir do cursor informado. Funciona com coleções síncronas e assíncronas.
+
+    :raises ValueError: Se o cursor for inválido.
+    """
+    query = collection_ref
+    if order_by:
+        query = query.order_by(order_by)
+    query = query.order_by(FieldPath.document_id())
+    if start_after:
+        order_value, document_id = decode_cursor(start_after)
+        cursor = {'__name__': document_id}
+        if order_by:
+            cursor[order_by] = order_value
+        query = query.start_after(cursor)
+    # Um documento a mais indica se existe uma próxima página
+    return query.limit(limit + 1)
+
+
+def split_page(docs, limit, order_by=None):
+    """
+    Separa o resultado de page_query na página pedida e no cursor da próxima página.
+
+    :param docs: Dicionários com 'id' e dados, na ordem da consulta.
+    :return: Tupla (documentos da página, cursor da próxima página ou None).
+    """
+    page = docs[:limit]
+    next_cursor = None
+    if len(docs) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last['id'], last.get(order_by) if order_by else None)
+    return page, next_cursor
+
+
+def paginate(items, limit, start_after=None, order_by=None):
+    """
+    Pagina em memória uma lista de objetos (por exemplo, do espelho do catálogo), com a mesma
+    ordenação e os mesmos cursores de Db.get_documents_page: pelo campo `order_by` e, em seguida, pelo ID.
+
+    :param items: Lista de objetos com atributo 'id' (e o atributo de ordenação, se informado).
+    :param limit: Número máximo de itens na página.
+    :param start_after: Cursor da página anterior (opcional).
+    :param order_by: Campo de ordenação (opcional).
+    :return: Tupla (itens da página, cursor da próxima página ou None).
+    """
+    if order_by:
+        # Assim como no Firestore, itens sem o campo de ordenação não aparecem na listagem
+        items = [item for item in items if getattr(item, order_by, None) is not None]
+        key = lambda item: (getattr(item, order_by), item.id)
+    else:
+        key = lambda item: item.id
+    items = sorted(items, key=key)
+
+    if start_after:
+        order_value, document_id = decode_cursor(start_after)
+        last = (order_value, document_id) if order_by else document_id
+        items = [item for item in items if key(item) > last]
+
+    page = items[:limit]
+    next_cursor = None
+    if len(items) > limit:
+        last_item = page[-1]
+        next_cursor = encode_cursor(last_item.id, getattr(last_item, order_by) if order_by else None)
+    return page, next_cursor
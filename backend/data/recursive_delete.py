@@ -0,0 +1,132 @@
+import asyncio
+
+
+class RecursiveDelete:
+    """
+    Exclui documentos e, recursivamente, todas as suas subcoleções, em commits de WriteBatch de até
+    `batch_size` exclusões. As subcoleções de um documento são excluídas antes dele: se a operação for
+    interrompida, o documento-pai continua existindo e uma nova execução encontra o que restou.
+
+    As referências são listadas com list_documents, que também retorna documentos inexistentes que
+    ainda têm subcoleções (por exemplo, disciplinas de um curso excluído sem elas).
+    """
+
+    def __init__(self, client, batch_size, dry_run=False, on_progress=None):
+        """
+        :param client: Cliente Firestore síncrono (ver FirestoreEngine.client).
+        :param batch_size: Número de exclusões por commit e de documentos por página listada (ver BATCH_LIMIT).
+        :param dry_run: Se True, apenas conta os documentos que seriam excluídos.
+        :param on_progress: Função chamada com stats() após cada lote.
+        """
+        self._client = client
+        self._batch_size = batch_size
+        self._dry_run = dry_run
+        self._on_progress = on_progress
+        self._pending = []
+        self.deleted = 0
+        self.batches = 0
+
+    def delete_collection(self, collection_ref):
+        """Exclui todos os documentos de uma coleção (e suas subcoleções), página a página."""
+        chunk = []
+        for doc_ref in collection_ref.list_documents(page_size=self._batch_size):
+            chunk.append(doc_ref)
+            if len(chunk) == self._batch_size:
+                self.delete_documents(chunk)
+                chunk = []
+        if chunk:
+            self.delete_documents(chunk)
+
+    def delete_documents(self, doc_refs):
+        """Exclui os documentos informados e suas subcoleções."""
+        for doc_ref in doc_refs:
+            for collection_ref in doc_ref.collections():
+                self.delete_collection(collection_ref)
+            self._queue(doc_ref)
+
+    def flush(self):
+        """Grava o último lote pendente e retorna stats()."""
+        self._commit()
+        return self.stats()
+
+    def stats(self):
+        return {'deleted': self.deleted, 'batches': self.batches, 'dry_run': self._dry_run}
+
+    def _queue(self, doc_ref):
+        self._pending.append(doc_ref)
+        if len(self._pending) == self._batch_size:
+            self._commit()
+
+    def _commit(self):
+        doc_refs, self._pending = self._pending, []
+        if not doc_refs:
+            return
+        if not self._dry_run:
+            batch = self._client.batch()
+            for doc_ref in doc_refs:
+                batch.delete(doc_ref)
+            batch.commit()
+        self.deleted += len(doc_refs)
+        self.batches += 1
+        if self._on_progress:
+            self._on_progress(self.stats())
+
+
+class AsyncRecursiveDelete(RecursiveDelete):
+    """
+    Versão assíncrona de RecursiveDelete, para o AsyncClient. As subcoleções de cada página de documentos
+    são listadas e excluídas em paralelo, com no máximo `concurrency` listagens simultâneas.
+    """
+
+    def __init__(self, client, batch_size, dry_run=False, on_progress=None, concurrency=8):
+        """
+        :param client: Cliente Firestore assíncrono (ver AsyncFirestoreEngine.client).
+        :param concurrency: Número máximo de listagens de subcoleções em andamento.
+        """
+        super().__init__(client, batch_size, dry_run, on_progress)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def delete_collection(self, collection_ref):
+        chunk = []
+        async for doc_ref in collection_ref.list_documents(page_size=self._batch_size):
+            chunk.append(doc_ref)
+            if len(chunk) == self._batch_size:
+                await self.delete_documents(chunk)
+                chunk = []
+        if chunk:
+            await self.delete_documents(chunk)
+
+    async def delete_documents(self, doc_refs):
+        await asyncio.gather(*(self._delete_subcollections(doc_ref) for doc_ref in doc_refs))
+        for doc_ref in doc_refs:
+            await self._queue(doc_ref)
+
+    async def flush(self):
+        await self._commit()
+        return self.stats()
+
+    async def _delete_subcollections(self, doc_ref):
+        async with self._semaphore:
+            collection_refs = [collection_ref async for collection_ref in doc_ref.collections()]
+        for collection_ref in collection_refs:
+            await self.delete_collection(collection_ref)
+
+    async def _queue(self, doc_ref):
+        self._pending.append(doc_ref)
+        if len(self._pending) == self._batch_size:
+            await self._commit()
+
+    async def _commit(self):
+        # O lote é retirado da fila antes do commit, já que outras tarefas continuam enfileirando exclusões
+        doc_refs, self._pending = self._pending, []
+        if not doc_refs:
+            return
+        if not self._dry_run:
+            batch = self._client.batch()
+            for doc_ref in doc_refs:
+                batch.delete(doc_ref)
+            await batch.commit()
+        self.deleted += len(doc_refs)
+        self.batches += 1
+        if self._on_progress:
+            self._on_progress(self.stats())
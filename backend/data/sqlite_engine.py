@@ -0,0 +1,282 @@
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from data.pagination import decode_cursor, split_page
+from data.storage import (BATCH_LIMIT, StorageEngine, as_write, get_field, page_fields, parent_document_id, project,
+                          random_document_id, stage_writes)
+
+# Cada documento é uma linha: caminho da coleção, ID, nome da coleção (último segmento do caminho,
+# para as consultas de collection group), ID do documento-pai e os dados em JSON.
+# A chave primária (collection, id) atende às leituras por ID, às listagens ordenadas por ID e,
+# por intervalo de prefixo, às subcoleções de um documento.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    collection_id TEXT NOT NULL,
+    parent_id TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_collection_group ON documents (collection_id, collection, id);
+"""
+
+# Campos usados em índices por expressão precisam ser identificadores simples (são interpolados no SQL)
+_FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Tipo não suportado pelo engine SQLite: {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def _dumps(data):
+    return json.dumps(data, default=_encode, ensure_ascii=False, separators=(',', ':'))
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_decode)
+
+
+def _projection(fields):
+    """
+    Coluna de dados de uma leitura com projeção: (expressão SQL, campos a projetar após a leitura).
+    Campos de primeiro nível são selecionados no próprio SQL, sem transferir nem decodificar o restante
+    do documento; caminhos com ponto são projetados depois da leitura.
+    """
+    if fields is None:
+        return 'data', None
+    if not all(_FIELD_NAME.match(field) for field in fields):
+        return 'data', fields
+    keys = ','.join(f"'{field}'" for field in fields)
+    # json_each devolve booleanos como 0/1: o CASE preserva true/false
+    return ("(SELECT json_group_object(key, CASE type WHEN 'true' THEN json('true') WHEN 'false' THEN json('false') "
+            f"ELSE value END) FROM json_each(data) WHERE key IN ({keys}))"), None
+
+
+def _load(text, fields):
+    data = _loads(text)
+    return project(data, fields) if fields is not None else data
+
+
+def _prefix_range(prefix):
+    # Intervalo [prefix, fim) que cobre todos os caminhos começando com `prefix` (terminado em '/')
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SQLiteEngine(StorageEngine):
+    """
+    Engine de armazenamento em um banco SQLite local, para implantações auto-hospedadas ou de baixa latência.
+    Usa uma única conexão, protegida por um lock; as escritas e transações rodam em BEGIN IMMEDIATE.
+    Os campos usados em ordenações de páginas e em filtros de collection group ganham índices por
+    expressão (json_extract) na primeira consulta.
+    """
+
+    def __init__(self, path=':memory:'):
+        """
+        :param path: Arquivo do banco. ':memory:' mantém o banco apenas em memória.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._indexed_fields = set()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def new_document_id(self, collection_name):
+        return random_document_id()
+
+    def get_document(self, collection_name, document_id, fields=None):
+        with self._lock:
+            data = self._read(collection_name, document_id, fields)
+        return data if data is not None else {}
+
+    def get_documents(self, collection_name, document_ids, fields=None):
+        unique_ids = list(dict.fromkeys(document_ids))
+        column, fields = _projection(fields)
+        found = {}
+        with self._lock:
+            # Blocos pequenos o suficiente para o limite de parâmetros do SQLite
+            for start in range(0, len(unique_ids), BATCH_LIMIT):
+                chunk = unique_ids[start:start + BATCH_LIMIT]
+                rows = self._connection.execute(
+                    f"SELECT id, {column} FROM documents WHERE collection = ? AND id IN ({','.join('?' * len(chunk))})",
+                    [collection_name, *chunk])
+                for document_id, data in rows:
+                    found[document_id] = {'id': document_id, **_load(data, fields)}
+        return [found[document_id] for document_id in unique_ids if document_id in found]
+
+    def commit(self, writes):
+        with self._lock, self._transaction():
+            self._apply(writes)
+
+    def update_in_transaction(self, collection_name, document_id, build_updates):
+        with self._lock, self._transaction():
+            writes = build_updates(self._read(collection_name, document_id) or {})
+            self._apply(as_write(write) for write in writes)
+
+    def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        with self._lock:
+            if document_ids is None:
+                roots = self._connection.execute(
+                    "SELECT collection, id FROM documents WHERE collection = ?", (collection_name,)).fetchall()
+                prefixes = [collection_name + '/']
+            else:
+                roots = [(collection_name, document_id) for document_id in dict.fromkeys(document_ids)
+                         if self._read(collection_name, document_id) is not None]
+                prefixes = [f'{collection_name}/{document_id}/' for document_id in document_ids]
+            descendants = []
+            for prefix in prefixes:
+                descendants.extend(self._connection.execute(
+                    "SELECT collection, id FROM documents WHERE collection >= ? AND collection < ?",
+                    _prefix_range(prefix)))
+            # Subcoleções antes dos documentos-pai, como em RecursiveDelete
+            targets = descendants + roots
+            stats = {'deleted': 0, 'batches': 0, 'dry_run': dry_run}
+            for start in range(0, len(targets), BATCH_LIMIT):
+                chunk = targets[start:start + BATCH_LIMIT]
+                if not dry_run:
+                    with self._transaction():
+                        self._connection.executemany("DELETE FROM documents WHERE collection = ? AND id = ?", chunk)
+                stats['deleted'] += len(chunk)
+                stats['batches'] += 1
+                if on_progress:
+                    on_progress(dict(stats))
+            return stats
+
+    def get_all_documents(self, collection_name, fields=None):
+        column, fields = _projection(fields)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT id, {column} FROM documents WHERE collection = ? ORDER BY id", (collection_name,)).fetchall()
+        return [{'id': document_id, **_load(data, fields)} for document_id, data in rows]
+
+    def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        # Com filtro, o documento inteiro é lido para refazer a comparação exata do campo
+        column, projected_fields = _projection(None if field else fields)
+        sql = f"SELECT id, parent_id, {column} FROM documents WHERE collection_id = ?"
+        params = [collection_id]
+        if field and _is_scalar(value):
+            self._ensure_index(field, 'collection_id')
+            # O filtro no SQL usa o índice; a comparação exata (tipos e campos ausentes) é refeita abaixo
+            sql += f" AND json_extract(data, '$.{field}') IS ?"
+            params.append(_sql_value(value))
+        with self._lock:
+            rows = self._connection.execute(sql + " ORDER BY collection, id", params).fetchall()
+        results = []
+        for document_id, parent_id, data in rows:
+            data = _load(data, projected_fields)
+            if field:
+                if get_field(data, field) != (True, value):
+                    continue
+                if fields is not None:
+                    data = project(data, fields)
+            results.append({'id': document_id, 'parent_id': parent_id, **data})
+        return results
+
+    def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        """
+        Mesma ordenação e cursores de Db.get_documents_page. Com `order_by`, a página é lida pelo índice
+        do campo; a ordem entre valores de tipos diferentes no mesmo campo segue a do SQLite
+        (null < número < texto), e não a do Firestore.
+        """
+        column, fields = _projection(page_fields(fields, order_by))
+        sql = f"SELECT id, {column} FROM documents WHERE collection = ?"
+        params = [collection_name]
+        if order_by:
+            self._ensure_index(order_by, 'collection')
+            value = f"json_extract(data, '$.{order_by}')"
+            # Documentos sem o campo não aparecem; um campo com null aparece (json_type retorna 'null')
+            sql += f" AND json_type(data, '$.{order_by}') IS NOT NULL"
+            if start_after:
+                order_value, document_id = decode_cursor(start_after)
+                if order_value is None:
+                    sql += f" AND ({value} IS NOT NULL OR id > ?)"
+                    params.append(document_id)
+                else:
+                    sql += f" AND ({value}, id) > (?, ?)"
+                    params += [_sql_value(order_value), document_id]
+            sql += f" ORDER BY {value}, id LIMIT ?"
+        else:
+            if start_after:
+                sql += " AND id > ?"
+                params.append(decode_cursor(start_after)[1])
+            sql += " ORDER BY id LIMIT ?"
+        # Um documento a mais indica se existe uma próxima página
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return split_page([{'id': document_id, **_load(data, fields)} for document_id, data in rows], limit, order_by)
+
+    def _read(self, collection_name, document_id, fields=None):
+        column, fields = _projection(fields)
+        row = self._connection.execute(
+            f"SELECT {column} FROM documents WHERE collection = ? AND id = ?", (collection_name, document_id)).fetchone()
+        return _load(row[0], fields) if row else None
+
+    def _apply(self, writes):
+        staged = stage_writes(writes, self._read)
+        deleted = [key for key, data in staged.items() if data is None]
+        written = [(collection_name, document_id, collection_name.rsplit('/', 1)[-1],
+                    parent_document_id(collection_name), _dumps(data))
+                   for (collection_name, document_id), data in staged.items() if data is not None]
+        if deleted:
+            self._connection.executemany("DELETE FROM documents WHERE collection = ? AND id = ?", deleted)
+        if written:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO documents (collection, id, collection_id, parent_id, data) VALUES (?, ?, ?, ?, ?)",
+                written)
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+    def _ensure_index(self, field, leading_column):
+        if not _FIELD_NAME.match(field):
+            raise ValueError(f"Campo inválido: {field}")
+        if (field, leading_column) in self._indexed_fields:
+            return
+        with self._lock:
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS documents_{leading_column}_{field} "
+                f"ON documents ({leading_column}, json_extract(data, '$.{field}'), id)")
+            self._indexed_fields.add((field, leading_column))
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE/COMMIT, com ROLLBACK em caso de erro; aninhamentos usam a transação externa
+    def __init__(self, connection):
+        self._connection = connection
+        self._owner = False
+
+    def __enter__(self):
+        if not self._connection.in_transaction:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._owner = True
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._owner:
+            self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _is_scalar(value):
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _sql_value(value):
+    # json_extract devolve booleanos como 0/1
+    return int(value) if isinstance(value, bool) else value
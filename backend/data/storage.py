@@ -0,0 +1,436 @@
+import random
+import string
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import transforms
+from starlette.concurrency import run_in_threadpool
+
+from data.pagination import decode_cursor, split_page
+
+# Número máximo de operações em um único commit de WriteBatch no Firestore
+BATCH_LIMIT = 500
+# Número de documentos pedidos por chamada de get_all (BatchGetDocuments)
+GET_ALL_CHUNK = 100
+
+# Escrita a ser aplicada em um lote ou transação. `op` é 'set', 'merge' (set com merge=True),
+# 'update' ou 'delete' (sem `data`).
+Write = namedtuple('Write', ['op', 'collection_name', 'document_id', 'data'], defaults=[None])
+
+# Mesmo alfabeto e tamanho dos IDs gerados pelos clientes do Firestore
+_ID_ALPHABET = string.ascii_letters + string.digits
+_ID_LENGTH = 20
+
+
+class StorageEngine(ABC):
+    """
+    Engine de armazenamento usado por Db. Todos os engines seguem o modelo de dados do Firestore:
+    coleções identificadas por caminhos ('courses', 'courses/{id}/disciplines'), documentos como
+    dicionários, subcoleções independentes do documento-pai e os mesmos transforms
+    (firestore.Increment, firestore.DELETE_FIELD, ArrayUnion, ArrayRemove e SERVER_TIMESTAMP).
+
+    Os engines implementam as operações primitivas; as demais operações de Db são montadas sobre elas.
+    """
+
+    # True se as operações fazem I/O bloqueante (rede ou disco): AsyncEngineAdapter as executa fora do event loop
+    blocking = True
+
+    @abstractmethod
+    def new_document_id(self, collection_name):
+        """Gera, sem acessar o banco, um ID aleatório para um novo documento da coleção."""
+
+    @abstractmethod
+    def get_document(self, collection_name, document_id, fields=None):
+        """
+        Retorna os dados do documento, ou {} se ele não existir.
+        Nas leituras, `fields` (opcional) restringe os campos devolvidos; ver project.
+        """
+
+    @abstractmethod
+    def get_documents(self, collection_name, document_ids, fields=None):
+        """Retorna os documentos existentes, com 'id', na ordem dos IDs (sem repetições). Ver Db.get_documents."""
+
+    @abstractmethod
+    def commit(self, writes):
+        """
+        Aplica uma lista de escritas Write de forma atômica.
+
+        :raises NotFound: Se um 'update' se referir a um documento inexistente (nada é gravado).
+        """
+
+    @abstractmethod
+    def update_in_transaction(self, collection_name, document_id, build_updates):
+        """Lê um documento e aplica, de forma atômica, as escritas calculadas a partir dele. Ver Db.update_in_transaction."""
+
+    @abstractmethod
+    def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        """Exclui documentos e todas as suas subcoleções. Ver Db.delete_recursive."""
+
+    @abstractmethod
+    def get_all_documents(self, collection_name, fields=None):
+        """Retorna todos os documentos da coleção, com 'id', ordenados pelo ID."""
+
+    @abstractmethod
+    def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        """Retorna os documentos de todas as coleções com o nome informado. Ver Db.get_collection_group_documents."""
+
+    @abstractmethod
+    def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        """Retorna uma página de documentos e o cursor da próxima. Ver Db.get_documents_page."""
+
+    def close(self):
+        """Libera as conexões do engine."""
+
+    def create_document(self, collection_name, document_data, document_id=None):
+        document_id = document_id or self.new_document_id(collection_name)
+        document_data['id'] = document_id
+        self.commit([Write('set', collection_name, document_id, document_data)])
+        return document_id
+
+    def update_document(self, collection_name, document_id, updates):
+        self.commit([Write('update', collection_name, document_id, updates)])
+
+    def delete_document(self, collection_name, document_id):
+        self.commit([Write('delete', collection_name, document_id)])
+
+    def batch_write(self, writes):
+        chunk = []
+        for write in writes:
+            chunk.append(write)
+            if len(chunk) == BATCH_LIMIT:
+                self.commit(chunk)
+                chunk = []
+        if chunk:
+            self.commit(chunk)
+
+    def batch_update(self, updates):
+        self.batch_write(Write('update', *update) for update in updates)
+
+    def batch_set(self, writes):
+        results = []
+        for start in range(0, len(writes), BATCH_LIMIT):
+            chunk = writes[start:start + BATCH_LIMIT]
+            try:
+                self.commit([Write('set', *write) for write in chunk])
+                results.extend([None] * len(chunk))
+            except Exception as e:
+                results.extend([e] * len(chunk))
+        return results
+
+
+class AsyncStorageEngine(ABC):
+    """Versão assíncrona de StorageEngine, usada por AsyncDb. Mesmas operações e semântica."""
+
+    @abstractmethod
+    def new_document_id(self, collection_name):
+        """Gera, sem acessar o banco, um ID aleatório para um novo documento da coleção."""
+
+    @abstractmethod
+    async def get_document(self, collection_name, document_id, fields=None):
+        pass
+
+    @abstractmethod
+    async def get_documents(self, collection_name, document_ids, fields=None):
+        pass
+
+    @abstractmethod
+    async def commit(self, writes):
+        pass
+
+    @abstractmethod
+    async def update_in_transaction(self, collection_name, document_id, build_updates):
+        pass
+
+    @abstractmethod
+    async def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        pass
+
+    @abstractmethod
+    async def get_all_documents(self, collection_name, fields=None):
+        pass
+
+    @abstractmethod
+    async def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        pass
+
+    @abstractmethod
+    async def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        pass
+
+    async def aclose(self):
+        """Libera as conexões do engine."""
+
+    async def create_document(self, collection_name, document_data, document_id=None):
+        document_id = document_id or self.new_document_id(collection_name)
+        document_data['id'] = document_id
+        await self.commit([Write('set', collection_name, document_id, document_data)])
+        return document_id
+
+    async def update_document(self, collection_name, document_id, updates):
+        await self.commit([Write('update', collection_name, document_id, updates)])
+
+    async def delete_document(self, collection_name, document_id):
+        await self.commit([Write('delete', collection_name, document_id)])
+
+    async def batch_write(self, writes):
+        chunk = []
+        for write in writes:
+            chunk.append(write)
+            if len(chunk) == BATCH_LIMIT:
+                await self.commit(chunk)
+                chunk = []
+        if chunk:
+            await self.commit(chunk)
+
+    async def batch_update(self, updates):
+        await self.batch_write(Write('update', *update) for update in updates)
+
+    async def batch_set(self, writes):
+        results = []
+        for start in range(0, len(writes), BATCH_LIMIT):
+            chunk = writes[start:start + BATCH_LIMIT]
+            try:
+                await self.commit([Write('set', *write) for write in chunk])
+                results.extend([None] * len(chunk))
+            except Exception as e:
+                results.extend([e] * len(chunk))
+        return results
+
+
+class AsyncEngineAdapter(AsyncStorageEngine):
+    """
+    Expõe um engine síncrono local (memória ou SQLite) para AsyncDb. O engine é compartilhado com Db,
+    de modo que os dois enxergam os mesmos dados. As operações de engines bloqueantes (SQLite: disco e
+    um lock compartilhado com as chamadas de Db em threads) rodam no threadpool; as do engine em memória,
+    que não faz I/O, rodam diretamente no event loop.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def _run(self, method, *args):
+        if self.engine.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    def new_document_id(self, collection_name):
+        return self.engine.new_document_id(collection_name)
+
+    async def get_document(self, collection_name, document_id, fields=None):
+        return await self._run(self.engine.get_document, collection_name, document_id, fields)
+
+    async def get_documents(self, collection_name, document_ids, fields=None):
+        return await self._run(self.engine.get_documents, collection_name, document_ids, fields)
+
+    async def commit(self, writes):
+        await self._run(self.engine.commit, writes)
+
+    async def update_in_transaction(self, collection_name, document_id, build_updates):
+        await self._run(self.engine.update_in_transaction, collection_name, document_id, build_updates)
+
+    async def delete_recursive(self, collection_name, document_ids=None, dry_run=False, on_progress=None):
+        return await self._run(self.engine.delete_recursive, collection_name, document_ids, dry_run, on_progress)
+
+    async def get_all_documents(self, collection_name, fields=None):
+        return await self._run(self.engine.get_all_documents, collection_name, fields)
+
+    async def get_collection_group_documents(self, collection_id, field=None, value=None, fields=None):
+        return await self._run(self.engine.get_collection_group_documents, collection_id, field, value, fields)
+
+    async def get_documents_page(self, collection_name, limit, start_after=None, order_by=None, fields=None):
+        return await self._run(self.engine.get_documents_page, collection_name, limit, start_after, order_by, fields)
+
+
+# Funções compartilhadas pelos engines locais (memória e SQLite), que reproduzem a semântica do Firestore
+
+
+def random_document_id():
+    return ''.join(random.choices(_ID_ALPHABET, k=_ID_LENGTH))
+
+
+def parent_document_id(collection_name):
+    """ID do documento-pai de uma coleção ('courses/{id}/disciplines' -> id), ou None se for uma coleção raiz."""
+    segments = collection_name.split('/')
+    return segments[-2] if len(segments) > 1 else None
+
+
+def clone(value):
+    """Cópia profunda de dicionários e listas; os demais valores do Firestore são imutáveis."""
+    if isinstance(value, dict):
+        return {key: clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [clone(item) for item in value]
+    return value
+
+
+def get_field(data, field_path):
+    """Retorna (existe, valor) do campo, aceitando caminhos com ponto ('a.b')."""
+    value = data
+    for name in field_path.split('.'):
+        if not isinstance(value, dict) or name not in value:
+            return False, None
+        value = value[name]
+    return True, value
+
+
+def project(data, fields):
+    """
+    Cópia do documento apenas com os campos informados, como na projeção (select) do Firestore.
+    Campos ausentes no documento não aparecem no resultado.
+
+    :param data: Dados do documento.
+    :param fields: Caminhos de campo (aceita 'a.b'), ou None para manter todos os campos.
+    """
+    if fields is None:
+        return clone(data)
+    result = {}
+    for field_path in fields:
+        exists, value = get_field(data, field_path)
+        if exists:
+            *parents, name = field_path.split('.')
+            target = result
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = clone(value)
+    return result
+
+
+def page_fields(fields, order_by):
+    """Campos lidos em uma página: a projeção precisa incluir o campo de ordenação, usado no cursor."""
+    if fields is None or not order_by or order_by in fields:
+        return fields
+    return [*fields, order_by]
+
+
+def sort_key(value):
+    """Chave de ordenação entre tipos diferentes, na mesma ordem do Firestore (null < bool < número < data < texto)."""
+    if value is None:
+        return 0, 0
+    if isinstance(value, bool):
+        return 1, value
+    if isinstance(value, (int, float)):
+        return 2, value
+    if isinstance(value, datetime):
+        return 3, value.timestamp()
+    if isinstance(value, str):
+        return 4, value
+    if isinstance(value, bytes):
+        return 5, value
+    return 6, repr(value)
+
+
+# Marca de campo inexistente, distinta de um campo com valor None
+_MISSING = object()
+
+
+def _transform(value, current):
+    # Resolve um transform do Firestore a partir do valor atual do campo (MISSING se não existir)
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, transforms.Increment):
+        return current + value.value if isinstance(current, (int, float)) and not isinstance(current, bool) else value.value
+    if isinstance(value, transforms.ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        return result + [item for item in value.values if item not in result]
+    if isinstance(value, transforms.ArrayRemove):
+        return [item for item in current if item not in value.values] if isinstance(current, list) else []
+    if isinstance(value, dict):
+        return {key: _transform(item, _MISSING) for key, item in value.items() if item is not transforms.DELETE_FIELD}
+    return clone(value)
+
+
+def _set_path(data, path, value):
+    *parents, name = path
+    for parent in parents:
+        child = data.get(parent)
+        if not isinstance(child, dict):
+            child = data[parent] = {}
+        data = child
+    if value is transforms.DELETE_FIELD:
+        data.pop(name, None)
+    else:
+        data[name] = _transform(value, data.get(name, _MISSING))
+
+
+def _merge(data, updates):
+    # set(merge=True): mapas aninhados são mesclados campo a campo
+    for name, value in updates.items():
+        if isinstance(value, dict) and isinstance(data.get(name), dict):
+            _merge(data[name], value)
+        else:
+            _set_path(data, [name], value)
+
+
+def as_write(write):
+    """Converte uma tupla (collection_name, document_id, updates), devolvida por build_updates, em Write('update')."""
+    return write if isinstance(write, Write) else Write('update', *write)
+
+
+def apply_write(current, write):
+    """
+    Calcula o novo conteúdo de um documento após uma escrita.
+
+    :param current: Dados atuais do documento, ou None se ele não existir (não são alterados).
+    :param write: Escrita Write.
+    :return: Novos dados do documento, ou None se ele foi excluído.
+    :raises NotFound: Em um 'update' de documento inexistente, como no Firestore.
+    """
+    if write.op == 'delete':
+        return None
+    if write.op == 'set':
+        data = {}
+        _merge(data, write.data)
+        return data
+    if write.op == 'merge':
+        data = clone(current) if current is not None else {}
+        _merge(data, write.data)
+        return data
+    if write.op == 'update':
+        if current is None:
+            raise NotFound(f"No document to update: {write.collection_name}/{write.document_id}")
+        data = clone(current)
+        # Em update, as chaves são caminhos de campo e um mapa substitui o valor inteiro
+        for field_path, value in write.data.items():
+            _set_path(data, field_path.split('.'), value)
+        return data
+    raise ValueError(f"Operação de escrita inválida: {write.op}")
+
+
+def stage_writes(writes, read):
+    """
+    Aplica as escritas, em ordem, sobre o estado atual dos documentos, sem gravar nada.
+
+    :param writes: Iterável de escritas Write.
+    :param read: Função (collection_name, document_id) -> dados atuais do documento ou None.
+    :return: Dicionário {(collection_name, document_id): novos dados ou None (excluído)}.
+    :raises NotFound: Se alguma escrita for um 'update' de documento inexistente.
+    """
+    staged = {}
+    for write in writes:
+        key = (write.collection_name, write.document_id)
+        current = staged[key] if key in staged else read(*key)
+        staged[key] = apply_write(current, write)
+    return staged
+
+
+def page_documents(docs, limit, start_after=None, order_by=None):
+    """
+    Pagina em memória uma lista de documentos (dicionários com 'id'), com a ordenação e os cursores
+    de Db.get_documents_page: pelo campo `order_by` (documentos sem o campo são omitidos) e pelo ID.
+    """
+    if order_by:
+        keyed = []
+        for doc in docs:
+            exists, value = get_field(doc, order_by)
+            if exists:
+                keyed.append(((sort_key(value), doc['id']), doc))
+    else:
+        keyed = [(doc['id'], doc) for doc in docs]
+    keyed.sort(key=lambda item: item[0])
+    if start_after:
+        order_value, document_id = decode_cursor(start_after)
+        last = (sort_key(order_value), document_id) if order_by else document_id
+        keyed = [item for item in keyed if item[0] > last]
+    return split_page([doc for _, doc in keyed[:limit + 1]], limit, order_by)
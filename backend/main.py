@@ -1,18 +1,47 @@
 # src/main.py
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
+from configs import settings
 from configs.firebase_config import initialize_firebase
+from data.async_database import AsyncDb, create_async_engine
+from data.database import Db
+from monitoring.metrics import metrics_authorized, render_metrics
+from monitoring.middleware import TRACE_HEADER, MetricsMiddleware, TraceMiddleware
 
 # Inicializar Firebase
 initialize_firebase()
 # from routes.user_routes import router as user_router
 from routes.admin_routes import router as admin_router
 from routes.user_routes import router as user_router
+from repositories.catalog_mirror import catalog_mirror
 # Importa as novas rotas
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Um único engine de armazenamento assíncrono por processo (no Firestore, um pool de clientes),
+    # compartilhado por todas as requisições. O engine síncrono de Db é criado sob demanda
+    # (espelho do catálogo, jobs administrativos); os engines locais são compartilhados pelos dois.
+    engine = create_async_engine()
+    app.state.storage_engine = engine
+    AsyncDb.use_engine(engine)
+    # O espelho do catálogo depende dos listeners on_snapshot do Firestore
+    mirror_enabled = settings.CATALOG_MIRROR_ENABLED and settings.STORAGE_ENGINE == 'firestore'
+    if mirror_enabled:
+        catalog_mirror.start(Db.get_engine().client())
+    yield
+    if mirror_enabled:
+        catalog_mirror.stop()
+    await AsyncDb.close_engine()
+    Db.close_engine()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 # Configurar CORS
@@ -22,8 +51,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permite todos os métodos (GET, POST, etc)
     allow_headers=["*"],  # Permite todos os cabeçalhos
+    # Cursor da próxima página nas listagens paginadas e resumo do rastro de banco (se DB_TRACE_HEADER)
+    expose_headers=["X-Next-Cursor", TRACE_HEADER],
 )
 
+# Rastro das operações de banco por requisição (ver monitoring/tracing.py)
+if settings.DB_TRACE_ENABLED:
+    app.add_middleware(TraceMiddleware, n_plus_one_threshold=settings.DB_TRACE_N_PLUS_ONE_THRESHOLD,
+                       header=settings.DB_TRACE_HEADER, excluded_paths=[settings.METRICS_PATH])
+
+# Métricas no formato do Prometheus (ver monitoring/metrics.py)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, excluded_paths=[settings.METRICS_PATH])
+
+    @app.get(settings.METRICS_PATH, include_in_schema=False)
+    def get_metrics(request: Request):
+        if not metrics_authorized(request.headers.get('authorization'), settings.METRICS_TOKEN):
+            return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+        body, content_type = render_metrics()
+        return Response(body, media_type=content_type)
+
 # Incluir rotas
 app.include_router(admin_router, prefix="/admin")
 app.include_router(user_router)
@@ -0,0 +1,178 @@
+import functools
+import hmac
+import inspect
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+from monitoring import tracing
+
+# Limites dos histogramas de latência, em segundos: das leituras em memória (sub-milissegundo)
+# às consultas lentas do Firestore
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites do histograma de documentos lidos/escritos por requisição
+DOCUMENT_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+# Rótulo das requisições que não correspondem a nenhuma rota (404), para não criar uma série por caminho
+UNMATCHED_ROUTE = "unmatched"
+# Rótulo de coleção das operações de Db que envolvem várias coleções (lotes de escritas)
+MULTIPLE_COLLECTIONS = "*"
+
+HTTP_REQUEST_DURATION = Histogram(
+    'ifocus_http_request_duration_seconds', "Latência das requisições HTTP, por rota",
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    'ifocus_http_requests_in_progress', "Requisições HTTP em andamento", multiprocess_mode='livesum')
+
+DB_OPERATION_DURATION = Histogram(
+    'ifocus_db_operation_duration_seconds', "Latência das operações de Db/AsyncDb, por operação e coleção",
+    ['api', 'operation', 'collection'], buckets=LATENCY_BUCKETS)
+DB_OPERATION_ERRORS = Counter(
+    'ifocus_db_operation_errors_total', "Operações de Db/AsyncDb que terminaram com exceção",
+    ['api', 'operation', 'collection'])
+# Preenchidos a partir do rastro de cada requisição (ver monitoring/tracing.py)
+DB_DOCUMENTS_PER_REQUEST = Histogram(
+    'ifocus_db_documents_per_request', "Documentos lidos e escritos por requisição, por rota",
+    ['route', 'kind'], buckets=DOCUMENT_COUNT_BUCKETS)
+DB_N_PLUS_ONE = Counter(
+    'ifocus_db_n_plus_one_total', "Requisições com leituras de um único documento repetidas na mesma coleção (N+1)",
+    ['route', 'collection'])
+
+AUTH_VERIFY_DURATION = Histogram(
+    'ifocus_auth_verify_duration_seconds', "Latência da verificação de ID tokens, por modo e resultado",
+    ['mode', 'result'], buckets=LATENCY_BUCKETS)
+AUTH_TOKEN_CACHE = Counter(
+    'ifocus_auth_token_cache_total', "Consultas ao cache de tokens verificados", ['result'])
+# Verificação local de tokens (AUTH_VERIFY_MODE = 'local', ver src/auth/jwt_verifier.py)
+AUTH_SIGNING_KEY_CACHE = Counter(
+    'ifocus_auth_signing_key_cache_total', "Consultas ao cache de chaves de assinatura dos ID tokens", ['result'])
+AUTH_SIGNING_KEY_REFRESHES = Counter(
+    'ifocus_auth_signing_key_refreshes_total', "Recargas das chaves de assinatura, por resultado", ['result'])
+
+
+def collection_label(collection_name):
+    """
+    Rótulo de uma coleção com os IDs de documentos trocados por '{id}', para limitar o número de séries:
+    'courses/abc/disciplines' -> 'courses/{id}/disciplines'.
+    """
+    segments = collection_name.split('/')
+    segments[1::2] = ['{id}'] * (len(segments) // 2)
+    return '/'.join(segments)
+
+
+def instrument_db(api):
+    """
+    Decorador dos métodos de Db ('sync') e AsyncDb ('async'): registra a latência e as exceções de cada
+    chamada, rotuladas pelo nome do método e pela coleção (primeiro argumento, quando o método recebe uma).
+    Dentro de uma requisição rastreada, a chamada também é registrada no rastro (ver monitoring/tracing.py).
+    """
+    def decorator(func):
+        operation = func.__name__
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        has_collection = bool(parameters) and parameters[0] in ('collection_name', 'collection_id')
+
+        def labels(args, kwargs):
+            if not has_collection:
+                return api, operation, MULTIPLE_COLLECTIONS
+            collection_name = args[0] if args else kwargs[parameters[0]]
+            return api, operation, collection_label(collection_name)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                label_values = labels(args, kwargs)
+                trace = tracing.current_trace.get()
+                if trace is not None:
+                    call, args, kwargs = tracing.start_call(signature, *label_values, args, kwargs)
+                result, failed = None, True
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                    failed = False
+                    return result
+                except Exception:
+                    DB_OPERATION_ERRORS.labels(*label_values).inc()
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    DB_OPERATION_DURATION.labels(*label_values).observe(elapsed)
+                    if trace is not None:
+                        tracing.finish_call(trace, call, result, elapsed, failed)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                label_values = labels(args, kwargs)
+                trace = tracing.current_trace.get()
+                if trace is not None:
+                    call, args, kwargs = tracing.start_call(signature, *label_values, args, kwargs)
+                result, failed = None, True
+                started = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                    failed = False
+                    return result
+                except Exception:
+                    DB_OPERATION_ERRORS.labels(*label_values).inc()
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    DB_OPERATION_DURATION.labels(*label_values).observe(elapsed)
+                    if trace is not None:
+                        tracing.finish_call(trace, call, result, elapsed, failed)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def time_auth_verification(mode):
+    """Mede a verificação de um ID token; o resultado é 'valid' ou 'invalid' (exceção na verificação)."""
+    started = time.perf_counter()
+    result = 'invalid'
+    try:
+        yield
+        result = 'valid'
+    finally:
+        AUTH_VERIFY_DURATION.labels(mode, result).observe(time.perf_counter() - started)
+
+
+def record_token_cache(hit):
+    AUTH_TOKEN_CACHE.labels('hit' if hit else 'miss').inc()
+
+
+def record_signing_key_cache(hit):
+    AUTH_SIGNING_KEY_CACHE.labels('hit' if hit else 'miss').inc()
+
+
+def record_signing_key_refresh(ok):
+    AUTH_SIGNING_KEY_REFRESHES.labels('ok' if ok else 'error').inc()
+
+
+def render_metrics():
+    """
+    Retorna (corpo, content type) das métricas no formato de exposição do Prometheus.
+    Com vários workers do uvicorn, defina PROMETHEUS_MULTIPROC_DIR para agregar as métricas de todos os processos.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def metrics_authorized(authorization, token):
+    """
+    Verifica o cabeçalho Authorization de uma requisição a /metrics. Sem `token` configurado, o acesso é livre.
+
+    :param authorization: Valor do cabeçalho Authorization (ou None).
+    :param token: Token esperado (settings.METRICS_TOKEN).
+    """
+    if not token:
+        return True
+    scheme, _, credentials = (authorization or '').partition(' ')
+    # Comparação em tempo constante, para não revelar o token pelo tempo de resposta
+    return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode())
@@ -0,0 +1,101 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+
+from monitoring.metrics import (DB_DOCUMENTS_PER_REQUEST, DB_N_PLUS_ONE, HTTP_REQUEST_DURATION,
+                                HTTP_REQUESTS_IN_PROGRESS, UNMATCHED_ROUTE)
+from monitoring.tracing import RequestTrace, current_trace, hot_documents, log_n_plus_one
+
+# Cabeçalho de depuração com o resumo das operações de banco da requisição (ver TraceMiddleware)
+TRACE_HEADER = "X-Db-Trace"
+
+
+def route_label(scope):
+    # O roteador do FastAPI registra a rota correspondente no escopo
+    route = scope.get('route')
+    return route.path if route else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP. A latência é rotulada pelo método, pelo modelo
+    de caminho da rota (por exemplo, '/courses/{course_id}/disciplines', e não o caminho com IDs)
+    e pelo status da resposta.
+    """
+
+    def __init__(self, app, excluded_paths=()):
+        """
+        :param app: Aplicação ASGI.
+        :param excluded_paths: Caminhos não medidos (por exemplo, o próprio /metrics).
+        """
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Exceções não tratadas chegam aqui sem resposta enviada
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            HTTP_REQUEST_DURATION.labels(scope['method'], route_label(scope),
+                                         str(status)).observe(time.perf_counter() - started)
+
+
+class TraceMiddleware:
+    """
+    Middleware ASGI que rastreia as operações de Db/AsyncDb de cada requisição (ver monitoring/tracing.py).
+    Ao final da requisição, registra os documentos lidos e escritos nas métricas, avisa no log sobre
+    padrões N+1 e soma o rastro às estatísticas de documentos mais acessados (hot_documents).
+    """
+
+    def __init__(self, app, n_plus_one_threshold, header=False, excluded_paths=()):
+        """
+        :param app: Aplicação ASGI.
+        :param n_plus_one_threshold: Número de leituras de um único documento na mesma coleção a partir
+                                     do qual a requisição é marcada como N+1.
+        :param header: Se True, envia o resumo do rastro no cabeçalho X-Db-Trace de cada resposta.
+        :param excluded_paths: Caminhos não rastreados.
+        """
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.header = header
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+
+        async def send_wrapper(message):
+            if self.header and message['type'] == 'http.response.start':
+                # Operações feitas até o início da resposta (tarefas em segundo plano ficam de fora)
+                MutableHeaders(scope=message).append(TRACE_HEADER, trace.header_value(self.n_plus_one_threshold))
+            await send(message)
+
+        # As chamadas a Db em threads (run_in_threadpool) herdam o contexto e registram no mesmo rastro
+        token = current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            route = route_label(scope)
+            DB_DOCUMENTS_PER_REQUEST.labels(route, 'read').observe(trace.reads)
+            DB_DOCUMENTS_PER_REQUEST.labels(route, 'write').observe(trace.writes)
+            for collection in log_n_plus_one(scope['method'], route, trace, self.n_plus_one_threshold):
+                DB_N_PLUS_ONE.labels(route, collection).inc()
+            hot_documents.add(trace)
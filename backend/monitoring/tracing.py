@@ -0,0 +1,206 @@
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+
+from configs import settings
+from data.storage import as_write
+
+# Rastro da requisição em andamento (ver TraceMiddleware); None fora de requisições
+current_trace = ContextVar('current_trace', default=None)
+
+# Operações de Db que leem documentos por consulta (a quantidade vem do resultado, sem caminhos)
+QUERY_OPERATIONS = frozenset({'get_all_documents', 'get_collection_group_documents', 'get_documents_page'})
+
+
+class DbCall:
+    """Uma operação de Db/AsyncDb dentro de uma requisição: documentos lidos e escritos e duração."""
+
+    __slots__ = ('api', 'operation', 'collection', 'collection_name', 'reads', 'writes', 'queried', 'attempts',
+                 'duration', 'failed')
+
+    def __init__(self, api, operation, collection):
+        self.api = api
+        self.operation = operation
+        self.collection = collection  # Rótulo da coleção (ver metrics.collection_label)
+        self.collection_name = None  # Caminho da coleção, quando a operação recebe um
+        self.reads = []  # Caminhos dos documentos lidos por ID
+        self.writes = []  # Caminhos dos documentos escritos
+        self.queried = 0  # Documentos devolvidos por consultas
+        self.attempts = 0  # Execuções de build_updates em update_in_transaction (> 1: a transação foi repetida)
+        self.duration = 0.0
+        self.failed = False
+
+
+def start_call(signature, api, operation, collection, args, kwargs):
+    """
+    Prepara o registro de uma chamada de Db/AsyncDb no rastro da requisição. Os iteráveis de escritas são
+    materializados (para serem lidos aqui e pelo engine) e build_updates é envolvida para contar as tentativas.
+
+    :param signature: inspect.Signature do método.
+    :return: Tupla (DbCall, args, kwargs) com os argumentos a repassar ao método.
+    """
+    call = DbCall(api, operation, collection)
+    bound = signature.bind(*args, **kwargs)
+    arguments = bound.arguments
+    collection_name = call.collection_name = arguments.get('collection_name')
+
+    if operation == 'get_document':
+        call.reads.append(f"{collection_name}/{arguments['document_id']}")
+    elif operation == 'get_documents':
+        arguments['document_ids'] = list(arguments['document_ids'])
+        call.reads.extend(f"{collection_name}/{document_id}" for document_id in arguments['document_ids'])
+    elif operation in ('update_document', 'delete_document'):
+        call.writes.append(f"{collection_name}/{arguments['document_id']}")
+    elif operation == 'delete_recursive' and arguments.get('document_ids') is not None:
+        arguments['document_ids'] = list(arguments['document_ids'])
+        call.writes.extend(f"{collection_name}/{document_id}" for document_id in arguments['document_ids'])
+    elif operation == 'batch_update':
+        arguments['updates'] = list(arguments['updates'])
+        call.writes.extend(f"{update[0]}/{update[1]}" for update in arguments['updates'])
+    elif operation == 'batch_set':
+        arguments['writes'] = list(arguments['writes'])
+        call.writes.extend(f"{write[0]}/{write[1]}" for write in arguments['writes'])
+    elif operation == 'batch_write':
+        arguments['writes'] = list(arguments['writes'])
+        call.writes.extend(f"{write.collection_name}/{write.document_id}" for write in arguments['writes'])
+    elif operation == 'update_in_transaction':
+        call.reads.append(f"{collection_name}/{arguments['document_id']}")
+        build_updates = arguments['build_updates']
+
+        def traced_build_updates(document_data):
+            call.attempts += 1
+            writes = [as_write(write) for write in build_updates(document_data)]
+            # Uma transação repetida substitui as escritas da tentativa anterior
+            call.writes[:] = [f"{write.collection_name}/{write.document_id}" for write in writes]
+            return writes
+
+        arguments['build_updates'] = traced_build_updates
+    return call, bound.args, bound.kwargs
+
+
+def finish_call(trace, call, result, duration, failed):
+    """Completa o registro com o resultado da chamada e o adiciona ao rastro da requisição."""
+    call.duration = duration
+    call.failed = failed
+    if not failed:
+        if call.operation == 'create_document':
+            call.writes.append(f"{call.collection_name}/{result}")
+        elif call.operation == 'get_documents_page':
+            call.queried = len(result[0])
+        elif call.operation in QUERY_OPERATIONS:
+            call.queried = len(result)
+    trace.calls.append(call)
+
+
+class RequestTrace:
+    """
+    Operações de banco de uma requisição, na ordem em que terminaram. Detecta padrões N+1: leituras
+    de um único documento repetidas na mesma coleção, típicas de leituras feitas em um laço.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    @property
+    def reads(self):
+        return sum(len(call.reads) + call.queried for call in self.calls)
+
+    @property
+    def writes(self):
+        return sum(len(call.writes) for call in self.calls)
+
+    @property
+    def db_time(self):
+        return sum(call.duration for call in self.calls)
+
+    def n_plus_one(self, threshold):
+        """
+        Coleções com pelo menos `threshold` chamadas que leem um único documento por ID.
+
+        :return: Dicionário {rótulo da coleção: número de chamadas}.
+        """
+        # Inclui as transações de update_in_transaction, que também leem um documento cada
+        single_reads = Counter(call.collection for call in self.calls if len(call.reads) == 1)
+        return {collection: count for collection, count in single_reads.items() if count >= threshold}
+
+    def summary(self, threshold):
+        """Resumo da requisição: contagens de chamadas, documentos lidos e escritos, tempo no banco e padrões N+1."""
+        read_paths = Counter(path for call in self.calls for path in call.reads)
+        return {
+            'calls': len(self.calls),
+            'reads': self.reads,
+            'writes': self.writes,
+            'duplicate_reads': sum(count - 1 for count in read_paths.values()),
+            'db_ms': round(self.db_time * 1000, 2),
+            'n_plus_one': self.n_plus_one(threshold),
+            'operations': dict(Counter(f"{call.operation} {call.collection}" for call in self.calls)),
+        }
+
+    def header_value(self, threshold):
+        """Valor do cabeçalho X-Db-Trace: 'calls=3; reads=12; writes=2; db_ms=4.1[; n_plus_one=coleção:n,...]'."""
+        value = f"calls={len(self.calls)}; reads={self.reads}; writes={self.writes}; db_ms={self.db_time * 1000:.2f}"
+        n_plus_one = self.n_plus_one(threshold)
+        if n_plus_one:
+            value += "; n_plus_one=" + ",".join(f"{collection}:{count}" for collection, count in n_plus_one.items())
+        return value
+
+
+class HotDocuments:
+    """
+    Estatísticas agregadas, entre requisições, dos documentos mais acessados: leituras e escritas por
+    caminho e tentativas extras de transações (conflitos com escritas concorrentes no mesmo documento).
+    Cada contador mantém no máximo `maxsize` caminhos; ao estourar, descarta a metade menos acessada.
+    """
+
+    def __init__(self, maxsize):
+        """
+        :param maxsize: Número máximo de caminhos mantidos em cada contador.
+        """
+        self.maxsize = maxsize
+        self._reads = Counter()
+        self._writes = Counter()
+        self._retries = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        """Soma as operações de um rastro de requisição."""
+        with self._lock:
+            for call in trace.calls:
+                self._reads.update(call.reads)
+                self._writes.update(call.writes)
+                if call.attempts > 1:
+                    self._retries[call.reads[0]] += call.attempts - 1
+            for counter in (self._reads, self._writes, self._retries):
+                if len(counter) > self.maxsize:
+                    kept = counter.most_common(self.maxsize // 2)
+                    counter.clear()
+                    counter.update(dict(kept))
+
+    def stats(self, limit=20):
+        """Retorna os `limit` documentos mais lidos, mais escritos e mais disputados (com mais transações repetidas)."""
+        with self._lock:
+            return {
+                'most_read': [{'path': path, 'reads': count} for path, count in self._reads.most_common(limit)],
+                'most_written': [{'path': path, 'writes': count} for path, count in self._writes.most_common(limit)],
+                'most_contended': [{'path': path, 'transaction_retries': count}
+                                   for path, count in self._retries.most_common(limit)],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._reads.clear()
+            self._writes.clear()
+            self._retries.clear()
+
+
+def log_n_plus_one(method, route, trace, threshold):
+    """Registra um aviso, com o resumo do rastro, se a requisição tiver padrões N+1. Retorna {coleção: chamadas}."""
+    n_plus_one = trace.n_plus_one(threshold)
+    if n_plus_one:
+        logging.warning(f"N+1 in {method} {route}: {trace.summary(threshold)}")
+    return n_plus_one
+
+
+# Instância única por processo
+hot_documents = HotDocuments(maxsize=settings.DB_TRACE_HOT_DOCUMENTS_SIZE)
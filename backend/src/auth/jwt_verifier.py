@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+import time
+
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+
+from monitoring import metrics
+
+# Certificados públicos usados pelo Firebase Auth para assinar os ID tokens
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def _parse_keys(data: dict) -> dict:
+    """
+    Converte o conteúdo de um JWKS ({"keys": [...]}) ou do mapa kid -> certificado X.509 do Google
+    em um dicionário kid -> chave pública já carregada.
+    """
+    if 'keys' in data:
+        return {jwk['kid']: jwt.PyJWK(jwk).key for jwk in data['keys']}
+    return {kid: load_pem_x509_certificate(pem.encode()).public_key() for kid, pem in data.items()}
+
+
+class SigningKeyStore:
+    """
+    Cache das chaves públicas de assinatura dos ID tokens.
+    As chaves são carregadas de um arquivo JWKS local ou buscadas no endpoint do Google,
+    respeitando o max-age do cabeçalho Cache-Control.
+    """
+
+    def __init__(self, jwks_file=None, certs_url=GOOGLE_CERTS_URL, default_max_age=3600,
+                 min_refresh_interval=60, timeout=5):
+        """
+        :param jwks_file: Caminho de um arquivo JWKS local (opcional). Se fornecido, a rede não é usada.
+        :param certs_url: URL dos certificados públicos.
+        :param default_max_age: Validade das chaves quando a resposta não informa max-age.
+        :param min_refresh_interval: Intervalo mínimo entre recargas forçadas por um 'kid' desconhecido.
+        :param timeout: Timeout da requisição HTTP, em segundos.
+        """
+        self.jwks_file = jwks_file
+        self.certs_url = certs_url
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        # Contadores desta instância (ver stats); os totais do processo vão para o Prometheus (monitoring/metrics.py)
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _load(self):
+        if self.jwks_file:
+            with open(self.jwks_file) as jwks_file:
+                return _parse_keys(json.load(jwks_file)), float('inf')
+        response = requests.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        match = _MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else self.default_max_age
+        return _parse_keys(response.json()), time.time() + max_age
+
+    def refresh(self):
+        """Recarrega as chaves. Em caso de falha, mantém as chaves atuais."""
+        self._last_refresh = time.time()
+        try:
+            self._keys, self._expires_at = self._load()
+            self.refreshes += 1
+            metrics.record_signing_key_refresh(True)
+        except Exception:
+            self.refresh_errors += 1
+            metrics.record_signing_key_refresh(False)
+            if not self._keys:
+                raise
+
+    def get_key(self, kid):
+        """
+        Retorna a chave pública correspondente ao 'kid' do token.
+
+        :param kid: Identificador da chave, presente no cabeçalho do JWT.
+        :return: Chave pública, ou None se o 'kid' não for conhecido.
+        """
+        key = self._keys.get(kid)
+        if key is not None and time.time() < self._expires_at:
+            self.hits += 1
+            metrics.record_signing_key_cache(True)
+            return key
+
+        with self._lock:
+            self.misses += 1
+            metrics.record_signing_key_cache(False)
+            now = time.time()
+            expired = now >= self._expires_at
+            # Um 'kid' desconhecido força a recarga, mas no máximo uma vez por intervalo
+            if expired or (kid not in self._keys and now - self._last_refresh >= self.min_refresh_interval):
+                self.refresh()
+            return self._keys.get(kid)
+
+    def stats(self):
+        """Retorna as métricas do cache de chaves."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'keys': len(self._keys),
+            'expires_in': max(self._expires_at - time.time(), 0) if self._keys else 0,
+        }
+
+
+class LocalTokenVerifier:
+    """
+    Verifica ID tokens do Firebase localmente, sem chamadas ao Firebase Admin.
+    Aplica as mesmas regras de verify_id_token: algoritmo RS256, audience e issuer do projeto.
+    """
+
+    def __init__(self, key_store: SigningKeyStore, project_id: str, leeway: int = 0):
+        """
+        :param key_store: Cache das chaves de assinatura.
+        :param project_id: ID do projeto Firebase (audience do token).
+        :param leeway: Tolerância, em segundos, na validação de 'exp' e 'iat'.
+        """
+        if not project_id:
+            raise ValueError("O ID do projeto é obrigatório para verificar tokens localmente")
+        self.key_store = key_store
+        self.project_id = project_id
+        self.issuer = f'https://securetoken.google.com/{project_id}'
+        self.leeway = leeway
+
+    def verify(self, token: str) -> dict:
+        """
+        Verifica a assinatura e os claims do token.
+
+        :param token: ID token JWT.
+        :return: Claims decodificados, incluindo 'uid'.
+        :raises jwt.InvalidTokenError: Se o token for inválido ou expirado.
+        """
+        header = jwt.get_unverified_header(token)
+        key = self.key_store.get_key(header.get('kid'))
+        if key is None:
+            raise jwt.InvalidTokenError("Chave de assinatura desconhecida")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=['RS256'],
+            audience=self.project_id,
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={'require': ['exp', 'iat', 'sub']},
+        )
+        if not claims['sub']:
+            raise jwt.InvalidTokenError("O claim 'sub' não pode estar vazio")
+        claims['uid'] = claims['sub']
+        return claims
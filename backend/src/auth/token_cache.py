@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import namedtuple
+
+from cachetools import TLRUCache
+
+from configs import settings
+
+# Claims decodificados do token e o usuário resolvido a partir do documento 'users/{uid}'
+# (None enquanto o documento ainda não foi lido); 'revocation_checked' indica se a verificação
+# também conferiu que o token não foi revogado (ver AuthControl.is_admin)
+CachedToken = namedtuple('CachedToken', ['claims', 'user', 'revocation_checked'], defaults=(False,))
+
+
+class TokenCache:
+    """
+    Cache LRU em memória de tokens já verificados.
+    Cada entrada expira após `ttl` segundos ou no 'exp' do token, o que ocorrer primeiro.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        """
+        :param maxsize: Número máximo de tokens mantidos no cache.
+        :param ttl: Tempo de vida máximo de uma entrada, em segundos.
+        """
+        self.ttl = ttl
+        # O relógio precisa ser o de época para comparar com o claim 'exp'
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._time_to_use, timer=time.time)
+        self._lock = threading.Lock()
+
+    def _time_to_use(self, token, entry, now):
+        return min(now + self.ttl, entry.claims.get('exp', now))
+
+    def get(self, token: str):
+        """Retorna a entrada (claims, user) do token, ou None se ausente ou expirada."""
+        with self._lock:
+            return self._cache.get(token)
+
+    def put(self, token: str, claims: dict, user, revocation_checked: bool = False):
+        """Armazena os claims decodificados e o usuário resolvido para o token."""
+        with self._lock:
+            self._cache[token] = CachedToken(claims, user, revocation_checked)
+
+    def invalidate_user(self, uid: str):
+        """Remove todas as entradas do usuário, por exemplo após uma mudança de papel."""
+        with self._lock:
+            tokens = [token for token, entry in list(self._cache.items()) if entry.claims.get('uid') == uid]
+            for token in tokens:
+                self._cache.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+token_cache = TokenCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
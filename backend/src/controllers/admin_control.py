@@ -1,7 +1,96 @@
+import base64
+import json
+import logging
+
+from starlette.concurrency import run_in_threadpool
+
+from data.async_database import AsyncDb
+from data.database import Write
+from data.pagination import encode_cursor
+from helpers.validators import validate_non_empty_string, validate_positive_integer
 from models import Course, Discipline
-from repositories.repository import CourseRepository, DisciplineRepository
+from repositories.async_repository import AsyncCourseRepository, AsyncDisciplineRepository, AsyncUserRepository
+from repositories.catalog_cache import catalog_cache
+from src.controllers.auth_control import AuthControl
 from user_control import UserControl
 
+ROLES = ('student', 'admin')
+# Coleções exportáveis, na ordem em que são exportadas, com os nomes das coleções em cada nível do caminho:
+# 'disciplines' são as subcoleções 'courses/{id}/disciplines'; 'members', as subcoleções 'helpers' e 'seekers'
+# de cada disciplina; 'counters', os shards dos contadores de membros de cada disciplina.
+EXPORT_PATHS = {
+    'users': (('users',),),
+    'courses': (('courses',),),
+    'disciplines': (('courses',), ('disciplines',)),
+    'members': (('courses',), ('disciplines',), ('helpers', 'seekers')),
+    'counters': (('courses',), ('disciplines',), ('counters',)),
+}
+EXPORT_COLLECTIONS = tuple(EXPORT_PATHS)
+
+# Tipos de linha aceitos na importação em massa
+IMPORT_TYPES = ('course', 'discipline')
+
+
+def encode_export_cursor(collection, path):
+    """Cursor de retomada da exportação: coleção exportável atual e caminho do último documento exportado."""
+    payload = json.dumps({'collection': collection, 'path': path}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def export_path_segments(collection, path):
+    """
+    Divide o caminho de um documento de uma coleção exportável em pares (coleção, ID), um por nível.
+
+    :raises ValueError: Se o caminho não pertencer à coleção.
+    """
+    levels = EXPORT_PATHS[collection]
+    segments = path.split('/')
+    if len(segments) != 2 * len(levels) or not all(segments[1::2]):
+        raise ValueError(f"Caminho fora da coleção {collection}: {path}")
+    pairs = list(zip(segments[0::2], segments[1::2]))
+    if any(name not in names for (name, _), names in zip(pairs, levels)):
+        raise ValueError(f"Caminho fora da coleção {collection}: {path}")
+    return pairs
+
+
+def export_collection_of(path):
+    """Coleção exportável a que pertence o caminho de um documento, ou None."""
+    for collection in EXPORT_COLLECTIONS:
+        try:
+            export_path_segments(collection, path)
+            return collection
+        except ValueError:
+            continue
+    return None
+
+
+def decode_export_cursor(cursor):
+    """
+    Decodifica um cursor gerado por encode_export_cursor.
+
+    :return: Tupla (coleção, pares (coleção, ID) do caminho do último documento exportado).
+    :raises ValueError: Se o cursor for inválido.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()))
+        return state['collection'], export_path_segments(state['collection'], state['path'])
+    except Exception:
+        raise ValueError("Cursor de exportação inválido")
+
+
+def _log_delete_progress(stats):
+    action = "would be deleted" if stats['dry_run'] else "deleted"
+    logging.info(f"Recursive delete: {stats['deleted']} documents {action} in {stats['batches']} batches")
+
+
+def _import_field(row, field):
+    """Valor de uma coluna da importação como texto sem espaços nas bordas, ou None se vazio."""
+    value = row.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
 
 class AdminControl(UserControl):
     # def __init__(self, user):
@@ -12,33 +101,33 @@ class AdminControl(UserControl):
     #     """
     #     super().__init__(user)  # Chama o construtor da classe pai (UserControl)
 
-    def create_course(self, id: None, name, code):
+    async def create_course(self, id: None, name, code):
         """Cria um novo curso com o nome e código fornecidos."""
         course = Course(id=id, name=name, code=code)  # Define uid como None na criação
         # Cria o curso e obtém o ID gerado
-        created_course_id = CourseRepository.create(course)
+        created_course_id = await AsyncCourseRepository.create(course)
         # Retorna o ID do curso criado
         return created_course_id
 
-    def update_course(self, course_id, name=None, code=None):
+    async def update_course(self, course_id, name=None, code=None):
         """Atualiza um curso existente com os novos valores fornecidos."""
         updates = {}
         if name:
             updates['name'] = name
         if code:
             updates['code'] = code
-        CourseRepository.update(course_id, updates)
+        await AsyncCourseRepository.update(course_id, updates)
 
-    def delete_course(self, course_id=None):
-        """Deleta um curso pelo seu ID."""
-        CourseRepository.delete(course_id)
+    async def delete_course(self, course_id=None, dry_run=False):
+        """Deleta um curso pelo seu ID, junto com suas disciplinas. Retorna o total de documentos deletados."""
+        return await AsyncCourseRepository.delete(course_id, dry_run, _log_delete_progress)
 
-    def create_discipline(self, course_id, id: None, name, code, semester):
+    async def create_discipline(self, course_id, id: None, name, code, semester):
         """Cria uma nova disciplina dentro do curso especificado."""
         discipline = Discipline(id=id, name=name, code=code, semester=semester)
-        return DisciplineRepository.create(discipline, course_id=course_id)
+        return await AsyncDisciplineRepository.create(discipline, course_id=course_id)
 
-    def update_discipline(self, course_id, discipline_id, name=None, code=None, semester=None):
+    async def update_discipline(self, course_id, discipline_id, name=None, code=None, semester=None):
         """Atualiza uma disciplina existente com os novos valores fornecidos."""
         updates = {}
         if name:
@@ -47,11 +136,240 @@ class AdminControl(UserControl):
             updates['code'] = code
         if semester:
             updates['semester'] = semester
-        DisciplineRepository.update(course_id, discipline_id, updates)
+        await AsyncDisciplineRepository.update(discipline_id, updates, course_id=course_id)
 
-    def delete_discipline(self, course_id, discipline_id):
+    async def delete_discipline(self, course_id, discipline_id):
         """Deleta uma disciplina pelo seu ID dentro do curso especificado."""
-        DisciplineRepository.delete(course_id, discipline_id)
+        await AsyncDisciplineRepository.delete(discipline_id, course_id=course_id)
+
+    async def delete_all(self, dry_run=False):
+        """Deleta todos os cursos e suas disciplinas. Retorna o total de documentos deletados."""
+        return await AsyncCourseRepository.delete_all(dry_run, _log_delete_progress)
+
+    async def migrate_discipline_membership(self):
+        """Migra os membros das disciplinas do formato antigo (arrays) para subcoleções e contadores."""
+        return await AsyncDisciplineRepository.migrate_legacy_membership()
+
+    async def update_user_role(self, user_id, role):
+        """Altera o papel de um usuário no documento 'users/{uid}' e nos custom claims do token."""
+        if role not in ROLES:
+            raise ValueError(f"Papel inválido: {role}")
+        await AsyncUserRepository.update(user_id, {'role': role})
+        # O SDK do Firebase Auth é bloqueante: executa fora do event loop
+        await run_in_threadpool(AuthControl.sync_role_claim, user_id, role)
+
+    async def sync_role_claims(self):
+        """Sincroniza os custom claims de papel de todos os usuários com os documentos 'users'."""
+        return await run_in_threadpool(AuthControl.sync_all_role_claims)
+
+    async def export_documents(self, collections=EXPORT_COLLECTIONS, cursor=None, page_size=500):
+        """
+        Exporta documentos página a página, sem carregar as coleções inteiras em memória.
+
+        :param collections: Coleções a exportar (subconjunto de EXPORT_COLLECTIONS).
+        :param cursor: Cursor de uma linha já recebida (opcional); a exportação continua a partir dela.
+        :param page_size: Número de documentos lidos por consulta.
+        :return: Gerador assíncrono de dicionários com 'collection' (caminho da coleção), 'id', 'data' e 'cursor'.
+        :raises ValueError: Se uma coleção ou o cursor forem inválidos.
+        """
+        invalid = set(collections) - set(EXPORT_COLLECTIONS)
+        if invalid:
+            raise ValueError(f"Coleções inválidas: {', '.join(sorted(invalid))}")
+        order = [collection for collection in EXPORT_COLLECTIONS if collection in collections]
+        state = decode_export_cursor(cursor) if cursor else None
+        if state and state[0] not in order:
+            raise ValueError("O cursor não pertence às coleções pedidas")
+        # Valida os parâmetros antes de devolver o gerador, para que os erros virem respostas 400
+        return self._export(order, state, page_size)
+
+    async def _export(self, order, state, page_size):
+        start = order.index(state[0]) if state else 0
+        for index, collection in enumerate(order[start:]):
+            resume = state[1] if index == 0 and state else None
+            async for line in self._export_level(collection, EXPORT_PATHS[collection], '', resume, page_size):
+                yield line
+
+    async def _export_level(self, collection, levels, parent_path, resume, page_size):
+        """
+        Exporta as coleções de `levels` abaixo de `parent_path`, em ordem de ID em cada nível.
+
+        :param resume: Pares (coleção, ID) do caminho do último documento exportado, a partir deste nível, ou None.
+        """
+        names, inner_levels = levels[0], levels[1:]
+        resume_name, resume_id = resume[0] if resume else (None, None)
+        for name in names[names.index(resume_name) if resume else 0:]:
+            collection_path = f"{parent_path}{name}"
+            after = None
+            if name == resume_name:
+                after = encode_cursor(resume_id)
+                if inner_levels:
+                    # Termina os documentos abaixo do documento interrompido e segue para os seguintes
+                    async for line in self._export_level(collection, inner_levels, f"{collection_path}/{resume_id}/",
+                                                         resume[1:], page_size):
+                        yield line
+            while True:
+                # Nos níveis intermediários basta o ID de cada documento
+                docs, next_cursor = await AsyncDb.get_documents_page(collection_path, page_size, after,
+                                                                     fields=('id',) if inner_levels else None)
+                for doc in docs:
+                    if inner_levels:
+                        async for line in self._export_level(collection, inner_levels,
+                                                             f"{collection_path}/{doc['id']}/", None, page_size):
+                            yield line
+                    else:
+                        yield {
+                            'collection': collection_path,
+                            'id': doc['id'],
+                            'data': doc,
+                            'cursor': encode_export_cursor(collection, f"{collection_path}/{doc['id']}"),
+                        }
+                if not next_cursor:
+                    break
+                after = next_cursor
+
+    async def restore_documents(self, lines, dry_run=False):
+        """
+        Grava documentos exportados por export_documents (por exemplo, para restaurar um backup), em lotes
+        (ver AsyncDb.batch_write). Cada documento substitui o documento de mesmo caminho.
+
+        :param lines: Dicionários com 'collection' (caminho da coleção), 'id' e 'data', como nas linhas exportadas.
+        :param dry_run: Se True, apenas valida as linhas, sem gravar.
+        :return: Totais de documentos por coleção exportável.
+        :raises ValueError: Se alguma linha for inválida (nada é gravado).
+        """
+        writes = []
+        totals = dict.fromkeys(EXPORT_COLLECTIONS, 0)
+        for number, line in enumerate(lines, start=1):
+            collection_path, document_id, data = line.get('collection'), line.get('id'), line.get('data')
+            if not isinstance(collection_path, str) or not isinstance(document_id, str) or not isinstance(data, dict):
+                raise ValueError(f"Linha {number}: informe 'collection', 'id' e 'data'")
+            collection = export_collection_of(f"{collection_path}/{document_id}")
+            if collection is None:
+                raise ValueError(f"Linha {number}: caminho fora das coleções exportáveis: {collection_path}/{document_id}")
+            totals[collection] += 1
+            # O 'id' das linhas exportadas vem do caminho do documento, não dos seus campos
+            writes.append(Write('set', collection_path, document_id,
+                                {field: value for field, value in data.items() if field != 'id'}))
+        if not dry_run:
+            await AsyncDb.batch_write(writes)
+            catalog_cache.invalidate()
+        return {'dry_run': dry_run, 'total': len(writes), 'collections': totals}
+
+    async def import_catalog(self, rows, dry_run=False):
+        """
+        Importa cursos e disciplinas em massa. Os IDs são gerados no cliente, de modo que cada documento
+        é gravado uma única vez, e as gravações são feitas em lotes (ver AsyncDb.batch_set).
+
+        Cada linha tem 'type' ('course' ou 'discipline'), 'name', 'code' e, opcionalmente, 'id'
+        (um ID existente é sobrescrito). Disciplinas também têm 'semester' e 'course_id' ou 'course_code',
+        este último referente a um curso da mesma importação. Os cursos informados por 'course_id' são
+        verificados antes de qualquer gravação, e os IDs novos são gerados também no dry_run.
+
+        :param rows: Lista de dicionários, um por linha.
+        :param dry_run: Se True, apenas valida as linhas, sem gravar.
+        :return: Relatório com os totais e o resultado de cada linha ('created', 'valid' ou 'error').
+        """
+        report = [{'row': index, 'type': _import_field(row, 'type'), 'status': None, 'id': None}
+                  for index, row in enumerate(rows, start=1)]
+        courses, course_reports = [], []
+        disciplines, discipline_reports = [], []
+        course_ids_by_code = {}
+        seen_ids = set()
+
+        # Primeira passagem: cursos, para que as disciplinas possam referenciá-los pelo código
+        for row, row_report in zip(rows, report):
+            if row_report['type'] != 'course':
+                continue
+            try:
+                name, code = _import_field(row, 'name'), _import_field(row, 'code')
+                validate_non_empty_string(name, 'name')
+                validate_non_empty_string(code, 'code')
+                if code in course_ids_by_code:
+                    raise ValueError(f"Código de curso repetido na importação: {code}")
+                course = Course(id=_import_field(row, 'id') or AsyncCourseRepository.new_id(), name=name, code=code)
+                if ('courses', course.id) in seen_ids:
+                    raise ValueError(f"ID repetido na importação: {course.id}")
+            except ValueError as ve:
+                row_report.update(status='error', error=str(ve))
+                continue
+            seen_ids.add(('courses', course.id))
+            course_ids_by_code[code] = course.id
+            row_report['id'] = course.id
+            courses.append(course)
+            course_reports.append(row_report)
+
+        # Cursos já gravados referenciados por course_id, verificados em uma única leitura
+        imported_course_ids = set(course_ids_by_code.values())
+        referenced_course_ids = {_import_field(row, 'course_id') for row, row_report in zip(rows, report)
+                                 if row_report['type'] == 'discipline'}
+        existing_course_ids = await AsyncCourseRepository.existing_ids(
+            referenced_course_ids - imported_course_ids - {None})
+
+        # Segunda passagem: disciplinas e linhas de tipo desconhecido
+        for row, row_report in zip(rows, report):
+            if row_report['type'] == 'course':
+                continue
+            try:
+                if row_report['type'] not in IMPORT_TYPES:
+                    raise ValueError(f"Tipo inválido: {row_report['type']} (use {' ou '.join(IMPORT_TYPES)})")
+                name, code = _import_field(row, 'name'), _import_field(row, 'code')
+                validate_non_empty_string(name, 'name')
+                validate_non_empty_string(code, 'code')
+                try:
+                    semester = int(_import_field(row, 'semester') or 0)
+                except ValueError:
+                    raise ValueError("semester deve ser um número inteiro")
+                validate_positive_integer(semester, 'semester')
+                course_id = _import_field(row, 'course_id') or course_ids_by_code.get(_import_field(row, 'course_code'))
+                if not course_id:
+                    raise ValueError("Informe course_id ou o course_code de um curso válido desta importação")
+                if course_id not in imported_course_ids and course_id not in existing_course_ids:
+                    raise ValueError(f"Curso não encontrado: {course_id}")
+                discipline = Discipline(id=_import_field(row, 'id') or AsyncDisciplineRepository.new_id(course_id),
+                                        name=name, code=code, semester=semester)
+                if (course_id, discipline.id) in seen_ids:
+                    raise ValueError(f"ID repetido na importação: {discipline.id}")
+            except ValueError as ve:
+                row_report.update(status='error', error=str(ve))
+                continue
+            seen_ids.add((course_id, discipline.id))
+            row_report.update(id=discipline.id, course_id=course_id)
+            disciplines.append((course_id, discipline))
+            discipline_reports.append(row_report)
+
+        if dry_run:
+            for row_report in course_reports + discipline_reports:
+                row_report['status'] = 'valid'
+        else:
+            failed_courses = set()
+            for course, row_report, error in zip(courses, course_reports, await AsyncCourseRepository.create_many(courses)):
+                if error:
+                    failed_courses.add(course.id)
+                    row_report.update(status='error', error=f"Falha ao gravar: {error}")
+                else:
+                    row_report['status'] = 'created'
+
+            # Disciplinas de cursos que não foram gravados não são criadas
+            pending, pending_reports = [], []
+            for item, row_report in zip(disciplines, discipline_reports):
+                if item[0] in failed_courses:
+                    row_report.update(status='error', error="O curso da disciplina não foi gravado")
+                else:
+                    pending.append(item)
+                    pending_reports.append(row_report)
+            results = await AsyncDisciplineRepository.create_many(pending) if pending else []
+            for row_report, error in zip(pending_reports, results):
+                if error:
+                    row_report.update(status='error', error=f"Falha ao gravar: {error}")
+                else:
+                    row_report['status'] = 'created'
 
-    def delete_all(self):
-        return CourseRepository.delete_all()
+        statuses = [row_report['status'] for row_report in report]
+        return {
+            'dry_run': dry_run,
+            'total': len(report),
+            'created': statuses.count('created'),
+            'valid': statuses.count('valid'),
+            'failed': statuses.count('error'),
+            'rows': report,
+        }
@@ -2,9 +2,15 @@ import firebase_admin
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from firebase_admin import auth
+from starlette.concurrency import run_in_threadpool
 
+from configs import settings
+from data.async_database import AsyncDb
 from data.database import Db
 from models import User, Admin
+from monitoring import metrics
+from src.auth.jwt_verifier import LocalTokenVerifier, SigningKeyStore
+from src.auth.token_cache import token_cache
 
 # Inicializar o Firebase Admin
 # Esta verificação garante que o Firebase Admin seja inicializado apenas uma vez.
@@ -16,6 +22,9 @@ if not firebase_admin._apps:
 # Define o esquema de segurança para a API, especificando o URL para obter o token.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Campos do documento do usuário lidos na confirmação do papel de administrador
+ADMIN_FIELDS = ('name', 'email', 'role', 'phone')
+
 
 class AuthControl:
     """
@@ -23,8 +32,79 @@ class AuthControl:
     Gerencia a autenticação de usuários e a autorização de administradores.
     """
 
+    # Verificador local de tokens, criado na primeira verificação quando AUTH_VERIFY_MODE = 'local'
+    _local_verifier = None
+
+    @staticmethod
+    def get_local_verifier() -> LocalTokenVerifier:
+        """Retorna o verificador local de tokens, com as chaves de assinatura em cache."""
+        if AuthControl._local_verifier is None:
+            project_id = settings.AUTH_PROJECT_ID or firebase_admin.get_app().project_id
+            key_store = SigningKeyStore(jwks_file=settings.AUTH_JWKS_FILE)
+            AuthControl._local_verifier = LocalTokenVerifier(key_store, project_id)
+        return AuthControl._local_verifier
+
+    @staticmethod
+    def verify_token(token: str, check_revoked: bool = False) -> dict:
+        """
+        Verifica o ID token e retorna os claims decodificados.
+
+        :param token: Token JWT fornecido pelo cliente.
+        :param check_revoked: Se True, também confere no Firebase Auth que o usuário não está desativado
+                              e que o token não foi revogado (uma leitura de rede a mais).
+        :return: Claims do token, incluindo 'uid'.
+        """
+        if settings.AUTH_VERIFY_MODE == 'local':
+            claims = AuthControl.get_local_verifier().verify(token)
+            if check_revoked:
+                AuthControl.check_not_revoked(claims)
+            return claims
+        return auth.verify_id_token(token, check_revoked=check_revoked)
+
+    @staticmethod
+    def check_not_revoked(claims: dict):
+        """
+        Mesma checagem de auth.verify_id_token(..., check_revoked=True), para os tokens verificados localmente.
+
+        :raises auth.UserDisabledError: Se o usuário estiver desativado.
+        :raises auth.RevokedIdTokenError: Se o token foi emitido antes da última revogação (revoke_refresh_tokens).
+        """
+        user = auth.get_user(claims['uid'])
+        if user.disabled:
+            raise auth.UserDisabledError("O usuário do token está desativado")
+        if user.tokens_valid_after_timestamp and claims['iat'] * 1000 < user.tokens_valid_after_timestamp:
+            raise auth.RevokedIdTokenError("O token foi revogado")
+
+    @staticmethod
+    def verify_token_timed(token: str, check_revoked: bool = False) -> dict:
+        """Executa verify_token registrando a latência e o resultado nas métricas (ver monitoring/metrics.py)."""
+        with metrics.time_auth_verification(settings.AUTH_VERIFY_MODE):
+            return AuthControl.verify_token(token, check_revoked=check_revoked)
+
+    @staticmethod
+    async def decode_token(token: str) -> dict:
+        """
+        Obtém os claims do token, usando o cache de tokens verificados quando possível.
+
+        :param token: Token JWT fornecido pelo cliente para autenticação.
+        :return: Claims decodificados do token.
+        :raises HTTPException: Se o token for inválido ou expirado.
+        """
+        cached = token_cache.get(token)
+        metrics.record_token_cache(cached is not None)
+        if cached:
+            return cached.claims
+        try:
+            # A verificação pode buscar certificados na rede: executa fora do event loop
+            decoded_token = await run_in_threadpool(AuthControl.verify_token_timed, token)
+        except Exception as e:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        # Guarda apenas os claims; o usuário é resolvido sob demanda por get_current_user
+        token_cache.put(token, decoded_token, None)
+        return decoded_token
+
     @staticmethod
-    def get_current_user(token: str) -> User:
+    async def get_current_user(token: str) -> User:
         """
         Obtém o usuário atual a partir do token JWT fornecido.
 
@@ -32,47 +112,119 @@ class AuthControl:
         :return: Instância da classe User com as informações do usuário.
         :raises HTTPException: Se o token for inválido ou expirado, ou se o usuário não for encontrado.
         """
+        # Tokens já verificados dispensam a checagem de assinatura e a leitura no Firestore
+        cached = token_cache.get(token)
+        metrics.record_token_cache(cached is not None)
+        if cached and cached.user:
+            return cached.user
+
         try:
             # Decodifica o token JWT para obter o UID do usuário
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = cached.claims if cached else await run_in_threadpool(AuthControl.verify_token_timed, token)
             uid = decoded_token['uid']
 
-            # Obtém o cliente do banco de dados e recupera o documento do usuário
-            db = Db.get_client()
-            user_doc = db.collection('users').document(uid).get()
+            # Recupera o documento do usuário usando o cliente compartilhado da aplicação
+            user_info = await AsyncDb.get_document('users', uid)
 
             # Se o documento do usuário não existir, levanta uma exceção
-            if not user_doc.exists:
+            if not user_info:
                 raise HTTPException(status_code=404, detail="User not found")
 
-            # Converte os dados do documento para um dicionário e cria uma instância de User
-            user_info = user_doc.to_dict()
-            return User.from_dict({
+            # Cria uma instância de User a partir dos dados do documento
+            user = User.from_dict({
                 'name': user_info.get('name', ''),
                 'email': user_info.get('email', ''),
                 'role': user_info.get('role', 'student'),
                 'phone': user_info.get('phone', '')
             })
+            token_cache.put(token, decoded_token, user, bool(cached and cached.revocation_checked))
+            return user
         except Exception as e:
             # Levanta uma exceção se o token for inválido ou expirado
             raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    @staticmethod
+    def invalidate_user(uid: str):
+        """
+        Descarta os tokens em cache de um usuário.
+        Deve ser chamado sempre que o papel (role) ou os dados do usuário forem alterados.
+
+        :param uid: UID do usuário.
+        """
+        token_cache.invalidate_user(uid)
+
+    @staticmethod
+    def sync_role_claim(uid: str, role: str):
+        """
+        Grava o papel do usuário nos custom claims do Firebase Auth, preservando os demais claims.
+        O novo claim só aparece nos ID tokens emitidos após a próxima renovação do token.
+
+        :param uid: UID do usuário.
+        :param role: Papel do usuário ('student' ou 'admin').
+        """
+        claims = auth.get_user(uid).custom_claims or {}
+        if claims.get('role') != role:
+            auth.set_custom_user_claims(uid, {**claims, 'role': role})
+            if claims.get('role') == 'admin':
+                # Rebaixamento: força o cliente a se autenticar novamente para obter um token sem o claim
+                auth.revoke_refresh_tokens(uid)
+        AuthControl.invalidate_user(uid)
+
+    @staticmethod
+    def sync_all_role_claims() -> int:
+        """
+        Job de sincronização: copia o papel de cada documento 'users/{uid}' para os custom claims.
+        Útil para preencher os claims de usuários criados antes desta funcionalidade.
+
+        :return: Número de usuários cujos claims foram atualizados.
+        """
+        roles = {user['id']: user.get('role', 'student') for user in Db.get_all_documents('users')}
+        updated = 0
+        # list_users pagina os usuários do Firebase Auth (1000 por página) e já traz os custom claims
+        for auth_user in auth.list_users().iterate_all():
+            role = roles.get(auth_user.uid)
+            claims = auth_user.custom_claims or {}
+            if role is not None and claims.get('role') != role:
+                auth.set_custom_user_claims(auth_user.uid, {**claims, 'role': role})
+                AuthControl.invalidate_user(auth_user.uid)
+                updated += 1
+        return updated
+
     @classmethod
-    def is_admin(cls, token: str = Depends(oauth2_scheme)) -> Admin:
+    async def is_admin(cls, token: str = Depends(oauth2_scheme)) -> Admin:
         """
         Verifica se o usuário autenticado é um administrador.
+        O custom claim 'role' é a fonte do papel: um claim diferente de 'admin' recusa o acesso, e o claim
+        'admin' o concede sem ler o documento 'users/{uid}'. Na primeira vez que um token é usado como admin
+        neste processo, a verificação confere também que ele não foi revogado: o rebaixamento
+        (AuthControl.sync_role_claim) revoga os tokens do usuário e descarta os do cache local, e nos demais
+        processos o token em cache expira em até AUTH_TOKEN_CACHE_TTL segundos.
+        Só tokens sem o claim (emitidos antes de sync_all_role_claims) são confirmados no documento.
 
         :param token: Token JWT fornecido pelo cliente para autenticação.
                       O token é extraído usando OAuth2PasswordBearer.
         :return: Instância da classe Admin com as informações do usuário, se for um administrador.
         :raises HTTPException: Se o usuário não for um administrador ou se o token for inválido.
         """
-        # Obtém o usuário atual a partir do token
-        user = cls.get_current_user(token)
+        cached = token_cache.get(token)
+        metrics.record_token_cache(cached is not None)
+        if cached and (cached.revocation_checked or cached.claims.get('role') != 'admin'):
+            claims = cached.claims
+        else:
+            try:
+                claims = await run_in_threadpool(cls.verify_token_timed, token, True)
+            except Exception:
+                raise HTTPException(status_code=401, detail="Invalid or expired token")
+            token_cache.put(token, claims, cached.user if cached else None, revocation_checked=True)
 
-        # Verifica se o usuário tem o papel de administrador
-        if user.role != 'admin':
+        role = claims.get('role')
+        if role is None:
+            user_info = await AsyncDb.get_document('users', claims['uid'], ADMIN_FIELDS)
+            if user_info.get('role') != 'admin':
+                raise HTTPException(status_code=403, detail="Insufficient permissions")
+            return Admin(name=user_info.get('name', ''), email=user_info.get('email', ''),
+                         phone=user_info.get('phone', ''))
+        if role != 'admin':
             raise HTTPException(status_code=403, detail="Insufficient permissions")
-
-        # Cria e retorna uma instância de Admin com as informações do usuário
-        return Admin(name=user.name, email=user.email, phone=user.phone)
+        # Claims padrão do ID token do Firebase
+        return Admin(name=claims.get('name', ''), email=claims.get('email', ''), phone=claims.get('phone_number', ''))
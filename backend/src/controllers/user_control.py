@@ -1,13 +1,17 @@
-from typing import List
+from typing import List, Optional
 
 from firebase_admin import auth, firestore
-from repositories.repository import CourseRepository, DisciplineRepository, UserRepository
+
+from data.pagination import paginate
+from repositories.async_repository import AsyncCourseRepository, AsyncDisciplineRepository, AsyncUserRepository
+from repositories.catalog_mirror import catalog_mirror
+from services.matching_index import matching_index
 
 
 class UserControl:
     """
     Controlador de Usuários.
-    Gerencia as interações entre usuários, cursos e disciplinas usando os repositórios.
+    Gerencia as interações entre usuários, cursos e disciplinas usando os repositórios assíncronos.
     """
 
     def __init__(self, user):
@@ -18,26 +22,61 @@ class UserControl:
         """
         self.user = user
 
-    def get_course(self, course_id):
+    async def get_course(self, course_id):
         """Obtém um curso pelo seu ID."""
-        data = CourseRepository.get(course_id)
+        data = await AsyncCourseRepository.get(course_id)
         return data, course_id
 
-    def get_all_courses(self):
+    async def get_all_courses(self):
         """Obtém todos os cursos disponíveis."""
-        courses = CourseRepository.get_all()
-        print("Courses from repository:", courses)  # Adicione este print para depuração
+        # O espelho em memória, quando sincronizado, dispensa a consulta ao banco
+        courses = catalog_mirror.get_courses()
+        if courses is None:
+            courses = await AsyncCourseRepository.get_all()
         return courses
 
-    def get_discipline(self, course_id, discipline_id):
+    async def get_courses_page(self, limit: int, start_after: Optional[str] = None, order_by: Optional[str] = None):
+        """
+        Obtém uma página de cursos.
+
+        :param limit: Número máximo de cursos na página.
+        :param start_after: Cursor devolvido pela página anterior (opcional).
+        :param order_by: Campo de ordenação (opcional).
+        :return: Tupla (lista de cursos, cursor da próxima página ou None).
+        """
+        courses = catalog_mirror.get_courses()
+        if courses is not None:
+            return paginate(courses, limit, start_after, order_by)
+        return await AsyncCourseRepository.get_page(limit, start_after, order_by)
+
+    async def get_discipline(self, course_id, discipline_id):
         """Obtém uma disciplina pelo seu ID dentro do curso especificado."""
-        return DisciplineRepository.get(course_id, discipline_id)
+        return await AsyncDisciplineRepository.get(discipline_id, course_id=course_id)
 
-    def get_all_disciplines(self, course_id):
+    async def get_all_disciplines(self, course_id):
         """Obtém todas as disciplinas de um curso especificado."""
-        return DisciplineRepository.get_all_disciplines_in_course(course_id)
+        disciplines = catalog_mirror.get_disciplines(course_id)
+        if disciplines is None:
+            disciplines = await AsyncDisciplineRepository.get_all_disciplines_in_course(course_id)
+        return disciplines
 
-    def get_saved_disciplines(self, user_id: str, type_help: str):
+    async def get_disciplines_page(self, course_id, limit: int, start_after: Optional[str] = None,
+                                   order_by: Optional[str] = None):
+        """
+        Obtém uma página das disciplinas de um curso especificado.
+
+        :param course_id: ID do curso.
+        :param limit: Número máximo de disciplinas na página.
+        :param start_after: Cursor devolvido pela página anterior (opcional).
+        :param order_by: Campo de ordenação (opcional).
+        :return: Tupla (lista de disciplinas, cursor da próxima página ou None).
+        """
+        disciplines = catalog_mirror.get_disciplines(course_id)
+        if disciplines is not None:
+            return paginate(disciplines, limit, start_after, order_by)
+        return await AsyncDisciplineRepository.get_page(limit, start_after, order_by, course_id=course_id)
+
+    async def get_saved_disciplines(self, user_id: str, type_help: str):
         """
         Obtém todas as disciplinas salvas por um usuário na coleção 'seekers_disciplines' ou 'helpers_disciplines'.
 
@@ -46,11 +85,11 @@ class UserControl:
         :return: Lista de IDs das disciplinas salvas.
         """
         collection_name = "helpers_disciplines" if type_help == "offer_help" else "seekers_disciplines"
-        user_data = UserRepository.get(user_id)
+        user_data = await AsyncUserRepository.get(user_id)
         discipline_ids = user_data.get(collection_name, [])
         return discipline_ids
 
-    def get_disciplines_details(self, course_id: str, discipline_ids: List[str]):
+    async def get_disciplines_details(self, course_id: str, discipline_ids: List[str]):
         """
         Obtém os detalhes das disciplinas com base na lista de IDs fornecida.
 
@@ -58,57 +97,76 @@ class UserControl:
         :param discipline_ids: Lista de IDs das disciplinas.
         :return: Lista de detalhes das disciplinas.
         """
-        disciplines = []
-        for discipline_id in discipline_ids:
-            discipline = DisciplineRepository.get(discipline_id, course_id)
-            if discipline:
-                disciplines.append(discipline)
-        return disciplines
+        if not discipline_ids:
+            return []
+        return await AsyncDisciplineRepository.get_many(discipline_ids, course_id)
 
-    def assign_user_to_disciplines(self, user_id: str, course_id: str, discipline_ids: List[str], type_help: str):
+    async def assign_user_to_disciplines(self, user_id: str, course_id: str, discipline_ids: List[str], type_help: str):
         """
-        Adiciona o usuário a várias disciplinas e as disciplinas ao usuário.
+        Adiciona o usuário a várias disciplinas e as disciplinas ao usuário, em uma única transação.
         """
         if not discipline_ids:
             raise ValueError("A lista de IDs das disciplinas não pode estar vazia.")
 
-        # Adicionar o usuário a cada disciplina (helpers ou seekers)
-        DisciplineRepository.add_user_to_disciplines(user_id, course_id, discipline_ids, type_help)
+        await AsyncDisciplineRepository.add_user_to_disciplines(user_id, course_id, discipline_ids, type_help)
+        matching_index.add(user_id, discipline_ids, type_help)
 
-        # Adicionar cada disciplina ao usuário
-        UserRepository.add_discipline_to_user(user_id, discipline_ids, type_help)
+    async def update_user_disciplines(self, user_id: str, course_id: str, new_discipline_ids: List[str], type_help: str):
+        """
+        Atualiza as disciplinas de um usuário, substituindo a lista antiga pela nova.
+        Apenas as disciplinas que entraram ou saíram da lista são alteradas, e todas as escritas
+        (usuário, membros e contadores das disciplinas) são aplicadas em uma única transação.
+        """
+        await AsyncUserRepository.change_disciplines(user_id, course_id, type_help, lambda current: new_discipline_ids,
+                                                     new_discipline_ids)
+        matching_index.replace(user_id, new_discipline_ids, type_help)
 
-    def update_user_disciplines(self, user_id: str, course_id: str, new_discipline_ids: List[str], type_help: str):
+    async def remove_user_from_disciplines(self, user_id: str, course_id: str, discipline_ids: List[str], type_help: str):
         """
-        Atualiza as disciplinas de um usuário, removendo todas as disciplinas antigas e adicionando as novas.
+        Remove um usuário de várias disciplinas e remove as disciplinas da lista do usuário, em uma única transação.
+
+        :param user_id: ID do usuário a ser removido.
+        :param course_id: ID do curso ao qual as disciplinas pertencem.
+        :param discipline_ids: Lista de IDs das disciplinas das quais o usuário será removido.
+        :param type_help: Tipo de ajuda, 'offer_help' para helpers e 'seek_help' para seekers.
         """
-        # Obter as disciplinas atuais do usuário
-        user_data = UserRepository.get(user_id)
-        collection_name = "helpers_disciplines" if type_help == "offer_help" else "seekers_disciplines"
-        current_discipline_ids = user_data.get(collection_name, [])
+        removed = set(discipline_ids)
+        await AsyncUserRepository.change_disciplines(user_id, course_id, type_help,
+                                                     lambda current: [d for d in current if d not in removed])
+        matching_index.remove(user_id, discipline_ids, type_help)
 
-        # Remover o usuário de todas as disciplinas atuais
-        for discipline_id in current_discipline_ids:
-            DisciplineRepository.remove_user_from_discipline(user_id, discipline_id, type_help, course_id)
+    async def get_discipline_counts(self, course_id: Optional[str] = None, discipline_ids: List[str] = (),
+                                    whole_course: bool = False):
+        """
+        Obtém o número de helpers e seekers das disciplinas informadas de um curso.
 
-        # Atualizar a lista de disciplinas do usuário
-        UserRepository.update_user_disciplines(user_id, new_discipline_ids, type_help)
+        :param discipline_ids: IDs das disciplinas, por exemplo as da página retornada.
+        :param whole_course: Se True, `discipline_ids` é a listagem completa do curso
+                             (ver DisciplineRepository.get_counts).
+        :return: Dicionário {discipline_id: {'helpers': n, 'seekers': n}}.
+        """
+        return await AsyncDisciplineRepository.get_counts(course_id, list(discipline_ids), whole_course)
 
-        # Adicionar o usuário às novas disciplinas
-        DisciplineRepository.add_user_to_disciplines(user_id, course_id, new_discipline_ids, type_help)
+    async def get_helper_matches(self, user_id: str, limit: int = 20):
+        """
+        Obtém os helpers que oferecem ajuda nas disciplinas em que o usuário busca ajuda,
+        ordenados pelo número de disciplinas em comum (ver MatchingIndex.rank_helpers).
 
+        :param user_id: ID do usuário que busca ajuda.
+        :param limit: Número máximo de helpers retornados.
+        :return: Lista de dicionários com 'user_id', 'score' e 'disciplines'.
+        """
+        await matching_index.ensure_fresh()
+        return matching_index.rank_helpers(user_id, limit)
 
-    def remove_user_from_disciplines(self, user_id: str, course_id: str, discipline_ids: List[str], type_help: str):
+    async def get_helper_recommendations(self, user_id: str, limit: int = 20):
         """
-        Remove um usuário de várias disciplinas e remove as disciplinas da lista do usuário.
+        Recomenda helpers para o usuário, pontuados por disciplinas em comum, proximidade de semestre
+        e carga de cada helper (ver MatchingIndex.recommend_helpers).
 
-        :param user_id: ID do usuário a ser removido.
-        :param course_id: ID do curso ao qual as disciplinas pertencem.
-        :param discipline_ids: Lista de IDs das disciplinas das quais o usuário será removido.
-        :param type_help: Tipo de ajuda, 'offer_help' para helpers e 'seek_help' para seekers.
+        :param user_id: ID do usuário que busca ajuda.
+        :param limit: Número máximo de helpers retornados.
+        :return: Lista de dicionários com a pontuação e seus componentes para cada helper.
         """
-        collection_name = "helpers" if type_help == "offer_help" else "seekers"
-        for discipline_id in discipline_ids:
-            DisciplineRepository.remove_user_from_discipline(user_id, discipline_id, type_help, course_id)
-        # Remove as disciplinas da lista do usuário
-        UserRepository.remove_disciplines_from_user(user_id, discipline_ids, type_help)
\ No newline at end of file
+        await matching_index.ensure_fresh()
+        return await matching_index.recommend_helpers(user_id, limit)
@@ -1,24 +1,28 @@
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List
 
 from pydantic import BaseModel
 
+# Modelos de domínio: dataclasses com __slots__ (sem __dict__ por instância) e conversões de/para
+# dicionário em uma única passada. A validação fica com os modelos pydantic de entrada das rotas.
 
-class User:
-    def __init__(self, name: str, email: str, role: str = "student", phone: Optional[str] = None):
-        """
-        Inicializa um novo usuário.
 
-        :param name: Nome do usuário.
-        :param email: Email do usuário.
-        :param role: Papel do usuário (padrão é "student").
-        :param phone: Telefone do usuário (opcional).
-        """
-        self.name = name
-        self.email = email
-        self.role = role
-        self.phone = phone
-        self.helper_disciplines = []  # Disciplinas onde o usuário oferece ajuda
-        self.seeker_disciplines = []  # Disciplinas onde o usuário busca ajuda
+@dataclass(slots=True)
+class User:
+    """
+    Usuário da aplicação.
+
+    :param name: Nome do usuário.
+    :param email: Email do usuário.
+    :param role: Papel do usuário (padrão é "student").
+    :param phone: Telefone do usuário (opcional).
+    """
+    name: str
+    email: str
+    role: str = "student"
+    phone: Optional[str] = None
+    helper_disciplines: List[str] = field(default_factory=list)  # Disciplinas onde o usuário oferece ajuda
+    seeker_disciplines: List[str] = field(default_factory=list)  # Disciplinas onde o usuário busca ajuda
 
     def add_helper_discipline(self, discipline_id: str):
         """
@@ -61,18 +65,19 @@ class User:
         :param data: Dicionário com os dados do usuário.
         :return: Instância do usuário.
         """
-        user = cls(
-            name=data.get('name'),
-            email=data.get('email'),
-            role=data.get('role', 'student'),
-            phone=data.get('phone')
+        return cls(
+            data.get('name'),
+            data.get('email'),
+            data.get('role', 'student'),
+            data.get('phone'),
+            data.get('helper_disciplines', []),
+            data.get('seeker_disciplines', [])
         )
-        user.helper_disciplines = data.get('helper_disciplines', [])
-        user.seeker_disciplines = data.get('seeker_disciplines', [])
-        return user
 
 
 class Admin(User):
+    __slots__ = ()
+
     def __init__(self, name: str, email: str, phone: Optional[str] = None):
         """
         Inicializa um novo administrador.
@@ -81,13 +86,15 @@ class Admin(User):
         :param email: Email do administrador.
         :param phone: Telefone do administrador (opcional).
         """
-        super().__init__(name, email, role="admin", phone=phone)
+        # super() sem argumentos não funciona em subclasses de dataclasses com slots
+        User.__init__(self, name, email, role="admin", phone=phone)
 
     def __repr__(self):
         return (f"Admin(name={self.name}, email={self.email}, phone={self.phone})")
 
 
-class Course(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Course:
     id: Optional[str] = None  # ID pode ser None inicialmente
     name: str
     code: Optional[str]
@@ -99,9 +106,9 @@ class Course(BaseModel):
             "code": self.code
         }
 
-    @staticmethod
-    def from_dict(data: Dict[str, Any]) -> 'Course':
-        return Course(
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Course':
+        return cls(
             id=data.get("id"),
             name=data.get("name"),
             code=data.get("code")
@@ -110,16 +117,7 @@ class Course(BaseModel):
 class CourseResponse(BaseModel):
     id: Optional[str]
     name: str
-    code: str
-
-    @classmethod
-    def from_course(cls, course: Course) -> 'CourseResponse':
-        """Cria uma instância de CourseResponse a partir de um objeto Course."""
-        return cls(
-            id=course.id,
-            name=course.name,
-            code=course.code
-        )
+    code: Optional[str] = None
 
 class CourseCreate(BaseModel):
     name: str
@@ -134,22 +132,24 @@ class CourseCreate(BaseModel):
         }
 
 
+@dataclass(slots=True)
 class Discipline:
-    def __init__(self, id: Optional[str], name: str, code: str, semester: int):
-        """
-        Inicializa uma nova disciplina.
-
-        :param id: ID da disciplina (pode ser None inicialmente).
-        :param name: Nome da disciplina.
-        :param code: Código da disciplina.
-        :param semester: Semestre da disciplina.
-        """
-        self.id = id
-        self.name = name
-        self.code = code
-        self.semester = semester
-        self.helpers = []  # IDs dos usuários que oferecem ajuda nesta disciplina
-        self.seekers = []  # IDs dos usuários que buscam ajuda nesta disciplina
+    """
+    Disciplina de um curso.
+
+    :param id: ID da disciplina (pode ser None inicialmente).
+    :param name: Nome da disciplina.
+    :param code: Código da disciplina.
+    :param semester: Semestre da disciplina.
+    """
+    id: Optional[str]
+    name: str
+    code: str
+    semester: int
+    # Membros no formato antigo (arrays no documento da disciplina), mantidos apenas para a migração.
+    # Os membros atuais ficam nas subcoleções 'helpers' e 'seekers' (ver DisciplineRepository.membership_writes).
+    helpers: List[str] = field(default_factory=list)  # IDs dos usuários que oferecem ajuda nesta disciplina
+    seekers: List[str] = field(default_factory=list)  # IDs dos usuários que buscam ajuda nesta disciplina
 
     def add_helper(self, user_id: str):
         """
@@ -179,9 +179,7 @@ class Discipline:
             'id': self.id,
             'name': self.name,
             'code': self.code,
-            'semester': self.semester,
-            'helpers': self.helpers,
-            'seekers': self.seekers
+            'semester': self.semester
         }
 
     @classmethod
@@ -192,12 +190,11 @@ class Discipline:
         :param data: Dicionário com os dados da disciplina.
         :return: Instância da disciplina.
         """
-        discipline = cls(
-            id=data.get('id'),
-            name=data.get('name'),
-            code=data.get('code'),
-            semester=data.get('semester')
+        return cls(
+            data.get('id'),
+            data.get('name'),
+            data.get('code'),
+            data.get('semester'),
+            data.get('helpers', []),
+            data.get('seekers', [])
         )
-        discipline.helpers = data.get('helpers', [])
-        discipline.seekers = data.get('seekers', [])
-        return discipline
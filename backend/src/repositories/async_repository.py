@@ -0,0 +1,591 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional, List
+
+from data.async_database import AsyncDb
+from models import Course, Discipline
+from repositories.catalog_cache import catalog_cache
+from repositories.repository import (COUNTER_FIELDS, COURSE_FIELDS, DISCIPLINE_FIELDS, LEGACY_MEMBER_FIELDS,
+                                     MEMBERSHIP_MIGRATION_ID, MIGRATIONS_COLLECTION, DisciplineRepository,
+                                     StaleMemberships, UserRepository)
+
+
+# Abstração e Herança
+class AsyncCRUD(ABC):
+    """
+    Versão assíncrona da interface CRUD.
+    Define a mesma interface de criação, leitura, atualização e exclusão, com métodos aguardáveis.
+    """
+    @staticmethod
+    @abstractmethod
+    async def create(data, document_id=None):
+        """Cria um novo documento. Se `document_id` for fornecido, usa-o; caso contrário, gera um novo ID."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def get(document_id):
+        """Obtém um documento pelo seu ID."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def update(document_id, updates):
+        """Atualiza um documento existente com os dados fornecidos."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def delete(document_id):
+        """Deleta um documento pelo seu ID."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def get_all():
+        """Obtém todos os documentos. Pode retornar uma lista ou outro tipo de coleção."""
+        pass
+
+
+# Herança e Encapsulamento
+class AsyncCourseRepository(AsyncCRUD):
+    """
+    Versão assíncrona de CourseRepository, para a coleção 'courses'.
+    Compartilha o cache do catálogo com o repositório síncrono.
+    """
+
+    @staticmethod
+    async def create(course: Course, course_id: Optional[str] = None) -> str:
+        """
+        Cria um novo curso no banco de dados.
+
+        :param course: Instância da classe Course com dados do curso.
+        :param course_id: ID do curso (opcional). Se não fornecido, usa o ID do curso ou gera um novo.
+        :return: ID do curso criado.
+        """
+        document_id = await AsyncDb.create_document('courses', course.to_dict(), course_id or course.id)
+        catalog_cache.invalidate(('courses',))
+        return document_id
+
+    @staticmethod
+    def new_id() -> str:
+        """Gera um ID para um novo curso sem acessar o banco, para gravá-lo depois com o ID já definido."""
+        return AsyncDb.new_document_id('courses')
+
+    @staticmethod
+    async def existing_ids(course_ids):
+        """
+        Filtra os IDs dos cursos que existem, com uma única leitura em lote.
+
+        :return: Conjunto dos IDs encontrados.
+        """
+        if not course_ids:
+            return set()
+        courses_data = await AsyncDb.get_documents('courses', list(dict.fromkeys(course_ids)), ('id',))
+        return {data['id'] for data in courses_data}
+
+    @staticmethod
+    async def create_many(courses: List[Course]):
+        """
+        Cria vários cursos com escritas em lote, uma escrita por documento.
+        Cursos sem ID recebem um ID gerado no cliente.
+
+        :param courses: Lista de instâncias da classe Course.
+        :return: Lista alinhada com `courses`: None para cada curso criado, ou a exceção do lote que falhou.
+        """
+        for course in courses:
+            if not course.id:
+                course.id = AsyncCourseRepository.new_id()
+        results = await AsyncDb.batch_set([('courses', course.id, course.to_dict()) for course in courses])
+        catalog_cache.invalidate(('courses',))
+        return results
+
+    @staticmethod
+    async def get(document_id):
+        """
+        Obtém um curso pelo seu ID.
+
+        :param document_id: ID do curso a ser obtido.
+        :return: Instância da classe Course com os dados do curso, ou None se não encontrado.
+        """
+        data = await AsyncDb.get_document('courses', document_id, COURSE_FIELDS)
+        if data:
+            return Course.from_dict(data)
+        return None
+
+    @staticmethod
+    async def update(document_id, updates):
+        """
+        Atualiza um curso existente com os dados fornecidos.
+
+        :param document_id: ID do curso a ser atualizado.
+        :param updates: Dados para atualizar o curso.
+        """
+        await AsyncDb.update_document('courses', document_id, updates)
+        catalog_cache.invalidate(('courses',))
+
+    @staticmethod
+    async def delete(document_id, dry_run=False, on_progress=None):
+        """
+        Deleta um curso pelo seu ID, junto com as disciplinas em 'courses/{id}/disciplines'.
+
+        :param document_id: ID do curso a ser deletado.
+        :param dry_run: Se True, apenas conta os documentos que seriam deletados.
+        :param on_progress: Função chamada com o progresso após cada lote (ver AsyncDb.delete_recursive).
+        :return: Dicionário com o total de documentos deletados e de lotes gravados.
+        """
+        stats = await AsyncDb.delete_recursive('courses', [document_id], dry_run, on_progress)
+        if not dry_run:
+            catalog_cache.invalidate(('courses',), ('disciplines', document_id), ('counts', document_id))
+        return stats
+
+    @staticmethod
+    async def delete_all(dry_run=False, on_progress=None):
+        """
+        Deleta todos os cursos da coleção 'courses', junto com suas disciplinas.
+
+        :param dry_run: Se True, apenas conta os documentos que seriam deletados.
+        :param on_progress: Função chamada com o progresso após cada lote (ver AsyncDb.delete_recursive).
+        :return: Dicionário com o total de documentos deletados e de lotes gravados.
+        """
+        stats = await AsyncDb.delete_all_courses(dry_run, on_progress)
+        if not dry_run:
+            catalog_cache.invalidate()
+        return stats
+
+    @staticmethod
+    async def get_all():
+        """
+        Obtém todos os cursos da coleção 'courses'.
+
+        :return: Lista de instâncias da classe Course.
+        """
+        async def load():
+            courses_data = await AsyncDb.get_all_documents('courses', COURSE_FIELDS)
+            return [Course.from_dict(data) for data in courses_data]
+
+        return await catalog_cache.get_or_load_async(('courses',), load)
+
+    @staticmethod
+    async def get_page(limit: int, start_after: Optional[str] = None, order_by: Optional[str] = None):
+        """
+        Obtém uma página de cursos. Ver CourseRepository.get_page.
+
+        :return: Tupla (lista de instâncias de Course, cursor da próxima página ou None).
+        """
+        courses_data, next_cursor = await AsyncDb.get_documents_page('courses', limit, start_after, order_by,
+                                                                     COURSE_FIELDS)
+        return [Course.from_dict(data) for data in courses_data], next_cursor
+
+
+# Herança e Encapsulamento
+class AsyncDisciplineRepository(AsyncCRUD):
+    """
+    Versão assíncrona de DisciplineRepository.
+    Compartilha o cache do catálogo e a montagem das atualizações de membros com o repositório síncrono.
+    """
+
+    @staticmethod
+    async def create(data, document_id=None, course_id=None):
+        """
+        Cria uma nova disciplina no banco de dados. Pode ser criada dentro de um curso ou globalmente.
+
+        :param data: Instância da classe Discipline ou dicionário com dados da disciplina.
+        :param document_id: ID da disciplina (opcional). Se não fornecido, usa o ID da disciplina ou gera um novo.
+        :param course_id: ID do curso (opcional). Se fornecido, cria a disciplina dentro do curso.
+        :return: ID da disciplina criada.
+        """
+        if isinstance(data, Discipline):
+            discipline = data
+        elif isinstance(data, dict):
+            discipline = Discipline.from_dict(data)
+        else:
+            raise ValueError(f"Os dados devem ser um dicionário ou uma instância de Discipline, mas foi recebido {type(data).__name__}")
+
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        created_id = await AsyncDb.create_document(collection_path, discipline.to_dict(), document_id or discipline.id)
+        DisciplineRepository.invalidate_cache(course_id)
+        return created_id
+
+    @staticmethod
+    def new_id(course_id=None) -> str:
+        """Gera um ID para uma nova disciplina do curso (ou global) sem acessar o banco. Ver AsyncCourseRepository.new_id."""
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        return AsyncDb.new_document_id(collection_path)
+
+    @staticmethod
+    async def create_many(disciplines):
+        """
+        Cria várias disciplinas, de um ou mais cursos, com escritas em lote, uma escrita por documento.
+        Disciplinas sem ID recebem um ID gerado no cliente.
+
+        :param disciplines: Lista de tuplas (course_id, Discipline); course_id None cria a disciplina globalmente.
+        :return: Lista alinhada com `disciplines`: None para cada disciplina criada, ou a exceção do lote que falhou.
+        """
+        writes = []
+        for course_id, discipline in disciplines:
+            collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+            if not discipline.id:
+                discipline.id = AsyncDisciplineRepository.new_id(course_id)
+            writes.append((collection_path, discipline.id, discipline.to_dict()))
+        results = await AsyncDb.batch_set(writes)
+        for course_id in {course_id for course_id, _ in disciplines}:
+            DisciplineRepository.invalidate_cache(course_id)
+        return results
+
+    @staticmethod
+    async def get(document_id, course_id=None):
+        """
+        Obtém uma disciplina pelo seu ID. Pode ser obtida dentro de um curso ou globalmente.
+
+        :param document_id: ID da disciplina a ser obtida.
+        :param course_id: ID do curso (opcional). Se fornecido, obtém a disciplina dentro do curso.
+        :return: Instância da classe Discipline com os dados da disciplina, ou None se não encontrada.
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        data = await AsyncDb.get_document(collection_path, document_id, DISCIPLINE_FIELDS)
+        if data:
+            return Discipline.from_dict(data)
+        return None
+
+    @staticmethod
+    async def get_many(document_ids: List[str], course_id=None):
+        """
+        Obtém várias disciplinas em uma única leitura em lote. Podem ser obtidas dentro de um curso ou globalmente.
+
+        :param document_ids: Lista de IDs das disciplinas.
+        :param course_id: ID do curso (opcional). Se fornecido, obtém as disciplinas dentro do curso.
+        :return: Lista de instâncias da classe Discipline, na ordem dos IDs; disciplinas inexistentes são omitidas.
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        disciplines_data = await AsyncDb.get_documents(collection_path, document_ids, DISCIPLINE_FIELDS)
+        return [Discipline.from_dict(data) for data in disciplines_data]
+
+    @staticmethod
+    async def update(document_id, updates, course_id=None):
+        """
+        Atualiza uma disciplina existente com os dados fornecidos. Pode ser atualizada dentro de um curso ou globalmente.
+
+        :param document_id: ID da disciplina a ser atualizada.
+        :param updates: Dados para atualizar a disciplina.
+        :param course_id: ID do curso (opcional). Se fornecido, atualiza a disciplina dentro do curso.
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        await AsyncDb.update_document(collection_path, document_id, updates)
+        DisciplineRepository.invalidate_cache(course_id)
+
+    @staticmethod
+    async def delete(document_id, course_id=None):
+        """
+        Deleta uma disciplina pelo seu ID. Pode ser deletada dentro de um curso ou globalmente.
+
+        :param document_id: ID da disciplina a ser deletada.
+        :param course_id: ID do curso (opcional). Se fornecido, deleta a disciplina dentro do curso.
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        await AsyncDb.delete_document(collection_path, document_id)
+        DisciplineRepository.invalidate_cache(course_id)
+
+    @staticmethod
+    async def get_all(course_id=None):
+        """Obtém todas as disciplinas de um curso (ou globais). Ver get_all_disciplines_in_course."""
+        return await AsyncDisciplineRepository.get_all_disciplines_in_course(course_id)
+
+    @staticmethod
+    async def get_all_across_courses(fields=None):
+        """
+        Obtém as disciplinas de todos os cursos (e as globais) com uma única consulta de collection group.
+        Não passa pelo cache do catálogo.
+
+        :param fields: Campos a ler (opcional, ver AsyncDb.get_all_documents). Por padrão, os documentos
+                       inteiros, incluindo os arrays de membros do formato antigo.
+        :return: Lista de tuplas (course_id ou None, instância de Discipline).
+        """
+        disciplines_data = await AsyncDb.get_collection_group_documents('disciplines', fields=fields)
+        return [(data.pop('parent_id'), Discipline.from_dict(data)) for data in disciplines_data]
+
+    @staticmethod
+    async def get_all_disciplines_in_course(course_id=None):
+        """
+        Obtém todas as disciplinas de um curso específico ou globalmente.
+
+        :param course_id: ID do curso (opcional). Se fornecido, obtém disciplinas dentro do curso.
+        :return: Lista de instâncias da classe Discipline.
+        """
+        async def load():
+            collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+            disciplines_data = await AsyncDb.get_all_documents(collection_path, DISCIPLINE_FIELDS)
+            return [Discipline.from_dict(data) for data in disciplines_data]
+
+        return await catalog_cache.get_or_load_async(('disciplines', course_id), load)
+
+    @staticmethod
+    async def get_page(limit: int, start_after: Optional[str] = None, order_by: Optional[str] = None, course_id=None):
+        """
+        Obtém uma página de disciplinas de um curso (ou globais). Ver DisciplineRepository.get_page.
+
+        :return: Tupla (lista de instâncias de Discipline, cursor da próxima página ou None).
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        disciplines_data, next_cursor = await AsyncDb.get_documents_page(collection_path, limit, start_after, order_by,
+                                                                         DISCIPLINE_FIELDS)
+        return [Discipline.from_dict(data) for data in disciplines_data], next_cursor
+
+    @staticmethod
+    async def add_user_to_disciplines(user_id: str, course_id: str, discipline_ids: List[str], type_help: str):
+        """
+        Adiciona um usuário a várias disciplinas em uma coleção específica (helpers ou seekers).
+        Ver DisciplineRepository.add_user_to_disciplines.
+
+        :raises ValueError: Se course_id ou discipline_ids não forem fornecidos.
+        """
+        if not course_id or not discipline_ids:
+            raise ValueError("É necessário fornecer o ID do curso e uma lista de IDs das disciplinas.")
+
+        await AsyncUserRepository.change_disciplines(user_id, course_id, type_help,
+                                                     lambda current: current + discipline_ids, discipline_ids)
+
+    @staticmethod
+    async def remove_user_from_discipline(user_id: str, discipline_id: str, type_help: str, course_id: str = None):
+        """
+        Remove um usuário de uma disciplina em uma coleção específica (helpers ou seekers).
+        Ver DisciplineRepository.remove_user_from_discipline.
+        """
+        await AsyncUserRepository.change_disciplines(user_id, course_id, type_help,
+                                                     lambda current: [d for d in current if d != discipline_id])
+
+    @staticmethod
+    async def get_counts(course_id=None, discipline_ids=None, whole_course=False):
+        """
+        Obtém o número de helpers e seekers das disciplinas de um curso. Ver DisciplineRepository.get_counts.
+
+        :return: Dicionário {discipline_id: {'helpers': n, 'seekers': n}}.
+        """
+        if discipline_ids is None:
+            shards = await AsyncDb.get_collection_group_documents('counters', 'course_id', course_id, COUNTER_FIELDS)
+            return DisciplineRepository.sum_counters(shards)
+
+        async def load(missing):
+            if whole_course:
+                counts = await AsyncDisciplineRepository.get_counts(course_id)
+                return DisciplineRepository.fill_counts(counts, missing)
+            shard_lists = await asyncio.gather(*(
+                AsyncDb.get_all_documents(DisciplineRepository.counters_path(course_id, discipline_id), COUNTER_FIELDS)
+                for discipline_id in missing))
+            counts = DisciplineRepository.sum_counters(shard for shards in shard_lists for shard in shards)
+            return DisciplineRepository.fill_counts(counts, missing)
+
+        return await catalog_cache.get_items_or_load_async(('counts', course_id), discipline_ids, load)
+
+    @staticmethod
+    async def existing_ids(course_id, discipline_ids):
+        """
+        Filtra os IDs das disciplinas que existem no curso. Ver DisciplineRepository.existing_ids.
+
+        :return: Conjunto dos IDs encontrados.
+        """
+        if not discipline_ids:
+            return set()
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        disciplines_data = await AsyncDb.get_documents(collection_path, list(dict.fromkeys(discipline_ids)), ('id',))
+        return {data['id'] for data in disciplines_data}
+
+    @staticmethod
+    async def member_courses(user_id, type_help):
+        """
+        Obtém o curso de cada disciplina da qual o usuário é membro. Ver DisciplineRepository.member_courses.
+
+        :return: Dicionário {discipline_id: course_id}.
+        """
+        collection_name = "helpers" if type_help == "offer_help" else "seekers"
+        members = await AsyncDb.get_collection_group_documents(collection_name, 'user_id', user_id,
+                                                               ('course_id', 'discipline_id'))
+        return {member['discipline_id']: member.get('course_id') for member in members}
+
+    @staticmethod
+    async def membership_migrated():
+        """
+        Indica se a migração dos membros das disciplinas já foi concluída.
+        Ver DisciplineRepository.membership_migrated.
+        """
+        if not DisciplineRepository._membership_migrated:
+            marker = await AsyncDb.get_document(MIGRATIONS_COLLECTION, MEMBERSHIP_MIGRATION_ID)
+            DisciplineRepository._membership_migrated = bool(marker.get('completed'))
+        return DisciplineRepository._membership_migrated
+
+    @staticmethod
+    async def get_all_members():
+        """
+        Obtém os membros de todas as disciplinas (subcoleções 'helpers' e 'seekers').
+
+        :return: Lista de tuplas (type_help, user_id, discipline_id).
+        """
+        members = []
+        for type_help, collection_name in (('offer_help', 'helpers'), ('seek_help', 'seekers')):
+            for member in await AsyncDb.get_collection_group_documents(collection_name):
+                members.append((type_help, member['id'], member['parent_id']))
+        return members
+
+    @staticmethod
+    async def migrate_discipline_membership(course_id, discipline_id, legacy_data):
+        """
+        Migra os membros de uma disciplina no formato antigo. Ver DisciplineRepository.migrate_discipline_membership.
+
+        :return: Dicionário com 'migrated' e o número de helpers e seekers movidos.
+        """
+        existing_members = {}
+        for type_help, field in LEGACY_MEMBER_FIELDS.items():
+            user_ids = list(dict.fromkeys(legacy_data.get(field) or []))
+            members_path = DisciplineRepository.members_path(course_id, discipline_id, type_help)
+            existing = await AsyncDb.get_documents(members_path, user_ids, ['user_id'])
+            existing_members[type_help] = {member['id'] for member in existing}
+        build_updates, result = DisciplineRepository.legacy_membership_transaction(course_id, discipline_id,
+                                                                                   existing_members)
+        discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        await AsyncDb.update_in_transaction(discipline_collection_path, discipline_id, build_updates)
+        if result['migrated']:
+            DisciplineRepository.invalidate_cache(course_id)
+        return result
+
+    @staticmethod
+    async def migrate_touched_membership(user_id, course_id, type_help, requested_ids=()):
+        """
+        Migra sob demanda as disciplinas no formato antigo que uma alteração de membros pode afetar.
+        Ver DisciplineRepository.migrate_touched_membership.
+        """
+        collection_name = "helpers_disciplines" if type_help == "offer_help" else "seekers_disciplines"
+        user_data = await AsyncDb.get_document('users', user_id, (collection_name,))
+        discipline_ids = list(dict.fromkeys(list(user_data.get(collection_name) or []) + list(requested_ids)))
+        if not discipline_ids:
+            return
+        legacy_fields = tuple(LEGACY_MEMBER_FIELDS.values())
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        disciplines_data = await AsyncDb.get_documents(collection_path, discipline_ids, legacy_fields)
+        found = {data['id']: (course_id, data) for data in disciplines_data}
+        missing = set(discipline_ids) - found.keys()
+        if missing:
+            # Disciplinas de outros cursos na lista do usuário: localiza o curso de cada uma pelos IDs
+            missing_by_course = {}
+            for data in await AsyncDb.get_collection_group_documents('disciplines', fields=()):
+                if data['id'] in missing:
+                    missing_by_course.setdefault(data['parent_id'], []).append(data['id'])
+            for other_course_id, ids in missing_by_course.items():
+                other_path = f'courses/{other_course_id}/disciplines' if other_course_id else 'disciplines'
+                for data in await AsyncDb.get_documents(other_path, ids, legacy_fields):
+                    found[data['id']] = (other_course_id, data)
+        for discipline_id, (discipline_course_id, data) in found.items():
+            if any(data.get(field) for field in legacy_fields):
+                await AsyncDisciplineRepository.migrate_discipline_membership(discipline_course_id, discipline_id, data)
+
+    @staticmethod
+    async def migrate_legacy_membership():
+        """
+        Move os membros guardados nos arrays 'helpers'/'seekers' dos documentos das disciplinas para as
+        subcoleções de membros e contadores, removendo os arrays. Cada disciplina é migrada em uma transação
+        própria (ver migrate_discipline_membership); disciplinas já migradas (sem arrays) são ignoradas e
+        usuários que já têm documento de membro não são contados de novo, então a migração pode ser repetida.
+        Ao final, grava o marcador de conclusão: até lá, cada alteração de membros migra antes as disciplinas
+        que afeta (ver migrate_touched_membership).
+
+        :return: Dicionário com o número de disciplinas migradas e de helpers e seekers movidos.
+        """
+        stats = {'disciplines': 0, 'helpers': 0, 'seekers': 0}
+        for course_id, discipline in await AsyncDisciplineRepository.get_all_across_courses():
+            if not (discipline.helpers or discipline.seekers):
+                continue
+            result = await AsyncDisciplineRepository.migrate_discipline_membership(
+                course_id, discipline.id, {'helpers': discipline.helpers, 'seekers': discipline.seekers})
+            if result['migrated']:
+                stats['disciplines'] += 1
+                stats['helpers'] += result['helpers']
+                stats['seekers'] += result['seekers']
+        await AsyncDb.batch_write([DisciplineRepository.membership_migration_write()])
+        DisciplineRepository._membership_migrated = True
+        return stats
+
+
+# Herança e Encapsulamento
+class AsyncUserRepository(AsyncCRUD):
+    """
+    Versão assíncrona de UserRepository, para a coleção 'users'.
+    """
+
+    @staticmethod
+    async def create(data, document_id=None):
+        """
+        Cria um novo usuário. Normalmente o ID do documento é o UID do Firebase Auth.
+
+        :param data: Dicionário com os dados do usuário.
+        :param document_id: ID do usuário (opcional).
+        :return: ID do usuário criado.
+        """
+        return await AsyncDb.create_document('users', data, document_id)
+
+    @staticmethod
+    async def get(document_id: str):
+        return await AsyncDb.get_document('users', document_id)
+
+    @staticmethod
+    async def update(document_id: str, updates):
+        """
+        Atualiza um usuário existente com os dados fornecidos.
+
+        :param document_id: ID do usuário a ser atualizado.
+        :param updates: Dados para atualizar o usuário.
+        """
+        await AsyncDb.update_document('users', document_id, updates)
+
+    @staticmethod
+    async def delete(document_id: str):
+        """
+        Deleta um usuário pelo seu ID.
+
+        :param document_id: ID do usuário a ser deletado.
+        """
+        await AsyncDb.delete_document('users', document_id)
+
+    @staticmethod
+    async def get_all(fields=None):
+        """
+        Obtém todos os documentos da coleção 'users'.
+
+        :param fields: Campos a ler (opcional, ver AsyncDb.get_all_documents). Por padrão, os documentos inteiros.
+        """
+        return await AsyncDb.get_all_documents('users', fields)
+
+    @staticmethod
+    async def change_disciplines(user_id: str, course_id: str, type_help: str, compute_discipline_ids,
+                                 requested_ids=()):
+        """
+        Altera a lista de disciplinas do usuário e os membros e contadores das disciplinas em uma única
+        transação. Ver UserRepository.change_disciplines.
+
+        :return: Tupla (IDs adicionados, IDs removidos).
+        :raises ValueError: Se uma disciplina adicionada não existir no curso.
+        """
+        if not await AsyncDisciplineRepository.membership_migrated():
+            await AsyncDisciplineRepository.migrate_touched_membership(user_id, course_id, type_help, requested_ids)
+        known_ids = await AsyncDisciplineRepository.existing_ids(course_id, requested_ids)
+        for allow_orphans in (False, True):
+            build_updates, result = UserRepository.membership_transaction(
+                user_id, course_id, type_help, compute_discipline_ids, known_ids,
+                await AsyncDisciplineRepository.member_courses(user_id, type_help), allow_orphans)
+            try:
+                await AsyncDb.update_in_transaction('users', user_id, build_updates)
+            except StaleMemberships:
+                continue
+            break
+        for changed_course_id in result['courses']:
+            DisciplineRepository.invalidate_cache(changed_course_id)
+        return result['added'], result['removed']
+
+    @staticmethod
+    async def update_in_transaction(user_id: str, build_updates):
+        """
+        Lê o documento do usuário e aplica as atualizações calculadas a partir dele em uma única transação.
+
+        :param user_id: ID do usuário.
+        :param build_updates: Função que recebe os dados do usuário e retorna as atualizações a aplicar
+                              (ver UserRepository.membership_transaction).
+        """
+        await AsyncDb.update_in_transaction('users', user_id, build_updates)
@@ -0,0 +1,104 @@
+import threading
+
+from cachetools import TTLCache
+
+from configs import settings
+
+
+class CatalogCache:
+    """
+    Cache de leitura (read-through) para o catálogo de cursos e disciplinas.
+    As entradas expiram após `ttl` segundos e as menos usadas são descartadas quando o cache enche.
+    O cache é local ao processo: em outros workers, uma alteração só aparece após o TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        """
+        :param maxsize: Número máximo de listagens mantidas no cache.
+        :param ttl: Tempo de vida de uma entrada, em segundos.
+        """
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # Incrementado a cada invalidação; impede que uma carga iniciada antes dela grave dados antigos
+        self._generation = 0
+
+    def get_or_load(self, key, loader):
+        """
+        Retorna o valor em cache para a chave ou o carrega com `loader` e o armazena.
+
+        :param key: Chave da listagem, por exemplo ('courses',) ou ('disciplines', course_id).
+        :param loader: Função sem argumentos que carrega a lista do banco de dados.
+        :return: Cópia rasa da lista em cache.
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            generation = self._generation
+        if value is None:
+            value = loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._cache[key] = value
+        return list(value)
+
+    async def get_or_load_async(self, key, loader):
+        """Versão de get_or_load para repositórios assíncronos: `loader` é uma corrotina sem argumentos."""
+        with self._lock:
+            value = self._cache.get(key)
+            generation = self._generation
+        if value is None:
+            value = await loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._cache[key] = value
+        return list(value)
+
+    def get_items_or_load(self, key, item_ids, loader):
+        """
+        Variante de get_or_load para entradas preenchidas aos poucos: a chave guarda um dicionário
+        {item_id: valor}, e apenas os itens ausentes são carregados.
+
+        :param key: Chave da entrada, por exemplo ('counts', course_id).
+        :param item_ids: IDs dos itens pedidos.
+        :param loader: Função que recebe a lista de IDs ausentes e retorna {item_id: valor} para eles.
+        :return: Dicionário {item_id: valor} com os itens pedidos que o loader encontrou.
+        """
+        values, missing, generation = self._cached_items(key, item_ids)
+        if missing:
+            values.update(self._store_items(key, missing, loader(missing), generation))
+        return values
+
+    async def get_items_or_load_async(self, key, item_ids, loader):
+        """Versão de get_items_or_load para repositórios assíncronos: `loader` é uma corrotina."""
+        values, missing, generation = self._cached_items(key, item_ids)
+        if missing:
+            values.update(self._store_items(key, missing, await loader(missing), generation))
+        return values
+
+    def _cached_items(self, key, item_ids):
+        with self._lock:
+            entry = self._cache.get(key) or {}
+            values = {item_id: entry[item_id] for item_id in item_ids if item_id in entry}
+            generation = self._generation
+        return values, [item_id for item_id in dict.fromkeys(item_ids) if item_id not in values], generation
+
+    def _store_items(self, key, missing, loaded, generation):
+        with self._lock:
+            if generation == self._generation:
+                entry = self._cache.get(key)
+                if entry is None:
+                    entry = self._cache[key] = {}
+                # Itens carregados além dos pedidos (por exemplo, por uma consulta do curso inteiro) também ficam
+                entry.update(loaded)
+        return {item_id: loaded[item_id] for item_id in missing if item_id in loaded}
+
+    def invalidate(self, *keys):
+        """Remove as chaves informadas do cache. Sem argumentos, limpa o cache inteiro."""
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._cache.clear()
+            for key in keys:
+                self._cache.pop(key, None)
+
+
+catalog_cache = CatalogCache(maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL)
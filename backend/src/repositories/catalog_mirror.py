@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1.watch import ChangeType
+
+from models import Course, Discipline
+
+
+class CatalogMirror:
+    """
+    Espelho em memória das coleções 'courses' e 'disciplines' (incluindo 'courses/{id}/disciplines').
+    Os listeners on_snapshot do Firestore enviam apenas as alterações, que são aplicadas de forma
+    incremental. Enquanto a primeira sincronização não termina, as leituras retornam None e o
+    chamador deve recorrer aos repositórios.
+    """
+
+    def __init__(self):
+        self._courses = {}
+        self._disciplines = {}  # course_id (None para a coleção global) -> {discipline_id: Discipline}
+        self._sorted = {}  # Listagens já ordenadas, descartadas a cada alteração
+        self._lock = threading.Lock()
+        self._watches = []
+        self._courses_synced = False
+        self._disciplines_synced = False
+        self._last_read_time = None
+
+    def start(self, client):
+        """
+        Inicia os listeners no cliente Firestore informado.
+
+        :param client: Cliente Firestore (ver FirestoreEngine.client).
+        """
+        self._watches = [
+            client.collection('courses').on_snapshot(self._on_courses_snapshot),
+            # O collection group cobre tanto 'disciplines' quanto 'courses/{id}/disciplines'
+            client.collection_group('disciplines').on_snapshot(self._on_disciplines_snapshot),
+        ]
+
+    def stop(self):
+        """Encerra os listeners e descarta o conteúdo do espelho."""
+        for watch in self._watches:
+            watch.unsubscribe()
+        with self._lock:
+            self._watches = []
+            self._courses.clear()
+            self._disciplines.clear()
+            self._sorted.clear()
+            self._courses_synced = self._disciplines_synced = False
+            self._last_read_time = None
+
+    def _on_courses_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type == ChangeType.REMOVED:
+                    self._courses.pop(doc.id, None)
+                else:
+                    self._courses[doc.id] = Course.from_dict({'id': doc.id, **doc.to_dict()})
+            self._sorted.pop('courses', None)
+            self._courses_synced = True
+            self._last_read_time = read_time
+
+    def _on_disciplines_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                course_ref = doc.reference.parent.parent
+                course_id = course_ref.id if course_ref else None
+                disciplines = self._disciplines.setdefault(course_id, {})
+                if change.type == ChangeType.REMOVED:
+                    disciplines.pop(doc.id, None)
+                else:
+                    disciplines[doc.id] = Discipline.from_dict({'id': doc.id, **doc.to_dict()})
+                self._sorted.pop(('disciplines', course_id), None)
+            self._disciplines_synced = True
+            self._last_read_time = read_time
+
+    def _is_live(self):
+        return bool(self._watches) and all(watch.is_active for watch in self._watches)
+
+    def _listing(self, key, documents):
+        listing = self._sorted.get(key)
+        if listing is None:
+            # Mesma ordem de Db.get_all_documents (por ID do documento)
+            listing = self._sorted[key] = [documents[document_id] for document_id in sorted(documents)]
+        return list(listing)
+
+    def get_courses(self):
+        """Retorna todos os cursos, ou None se o espelho não estiver sincronizado."""
+        with self._lock:
+            if not (self._courses_synced and self._is_live()):
+                return None
+            return self._listing('courses', self._courses)
+
+    def get_disciplines(self, course_id=None):
+        """Retorna as disciplinas do curso (ou globais), ou None se o espelho não estiver sincronizado."""
+        with self._lock:
+            if not (self._disciplines_synced and self._is_live()):
+                return None
+            return self._listing(('disciplines', course_id), self._disciplines.get(course_id, {}))
+
+    def stats(self):
+        """Retorna o tamanho do espelho e o atraso desde o último snapshot recebido."""
+        with self._lock:
+            lag = None
+            if self._last_read_time is not None:
+                lag = (datetime.now(timezone.utc) - self._last_read_time).total_seconds()
+            return {
+                'active': self._is_live(),
+                'synced': self._courses_synced and self._disciplines_synced,
+                'courses': len(self._courses),
+                'disciplines': sum(len(disciplines) for disciplines in self._disciplines.values()),
+                'last_read_time': self._last_read_time.isoformat() if self._last_read_time else None,
+                'lag_seconds': lag,
+            }
+
+
+catalog_mirror = CatalogMirror()
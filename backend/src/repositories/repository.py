@@ -1,8 +1,32 @@
+import random
 from abc import ABC, abstractmethod
 from typing import Optional, List
 from google.cloud import firestore
-from data.database import Db
+from configs import settings
+from data.database import Db, Write
 from models import Course, Discipline
+from repositories.catalog_cache import catalog_cache
+
+# Campos lidos nas consultas do catálogo (projeção): apenas os usados pelos modelos e pelas respostas.
+# Documentos de disciplinas ainda não migrados guardam os membros nos arrays 'helpers' e 'seekers',
+# que crescem com o número de alunos e não são transferidos nessas leituras.
+COURSE_FIELDS = ('id', 'name', 'code')
+DISCIPLINE_FIELDS = ('id', 'name', 'code', 'semester')
+COUNTER_FIELDS = ('discipline_id', 'helpers', 'seekers')
+# Documento que marca a conclusão da migração dos membros das disciplinas para as subcoleções
+# (ver AsyncDisciplineRepository.migrate_legacy_membership)
+MIGRATIONS_COLLECTION = 'migrations'
+MEMBERSHIP_MIGRATION_ID = 'discipline_membership'
+# Arrays de membros das disciplinas no formato antigo, por tipo de ajuda
+LEGACY_MEMBER_FIELDS = {'offer_help': 'helpers', 'seek_help': 'seekers'}
+
+
+class StaleMemberships(Exception):
+    """Disciplinas removidas da lista do usuário sem documento de membro conhecido (ver membership_transaction)."""
+
+    def __init__(self, discipline_ids):
+        super().__init__(f"Membros desconhecidos: {', '.join(discipline_ids)}")
+        self.discipline_ids = discipline_ids
 
 def convert_to_dict(data):
     if isinstance(data, tuple):
@@ -60,11 +84,12 @@ class CourseRepository(CRUD):
         Cria um novo curso no banco de dados.
 
         :param course: Instância da classe Course com dados do curso.
-        :param course_id: ID do curso (opcional). Se não fornecido, um novo ID será gerado.
+        :param course_id: ID do curso (opcional). Se não fornecido, usa o ID do curso ou gera um novo.
         :return: ID do curso criado.
         """
         course_data = course.to_dict()  # Converte o curso para um dicionário
-        document_id = Db.create_document('courses', course_data, course_id)
+        document_id = Db.create_document('courses', course_data, course_id or course.id)
+        catalog_cache.invalidate(('courses',))
         return document_id
 
     @staticmethod
@@ -75,7 +100,7 @@ class CourseRepository(CRUD):
         :param document_id: ID do curso a ser obtido.
         :return: Instância da classe Course com os dados do curso, ou None se não encontrado.
         """
-        data = Db.get_document('courses', document_id)
+        data = Db.get_document('courses', document_id, COURSE_FIELDS)
         if data:
             data = Course.from_dict(data)
             return data
@@ -90,22 +115,36 @@ class CourseRepository(CRUD):
         :param updates: Dados para atualizar o curso.
         """
         Db.update_document('courses', document_id, updates)
+        catalog_cache.invalidate(('courses',))
 
     @staticmethod
-    def delete(document_id):
+    def delete(document_id, dry_run=False, on_progress=None):
         """
-        Deleta um curso pelo seu ID.
+        Deleta um curso pelo seu ID, junto com as disciplinas em 'courses/{id}/disciplines'.
 
         :param document_id: ID do curso a ser deletado.
+        :param dry_run: Se True, apenas conta os documentos que seriam deletados.
+        :param on_progress: Função chamada com o progresso após cada lote (ver Db.delete_recursive).
+        :return: Dicionário com o total de documentos deletados e de lotes gravados.
         """
-        Db.delete_document('courses', document_id)
+        stats = Db.delete_recursive('courses', [document_id], dry_run, on_progress)
+        if not dry_run:
+            catalog_cache.invalidate(('courses',), ('disciplines', document_id), ('counts', document_id))
+        return stats
 
     @staticmethod
-    def delete_all():
+    def delete_all(dry_run=False, on_progress=None):
         """
-        Deleta todos os cursos da coleção 'courses'.
+        Deleta todos os cursos da coleção 'courses', junto com suas disciplinas.
+
+        :param dry_run: Se True, apenas conta os documentos que seriam deletados.
+        :param on_progress: Função chamada com o progresso após cada lote (ver Db.delete_recursive).
+        :return: Dicionário com o total de documentos deletados e de lotes gravados.
         """
-        Db.delete_all_courses()
+        stats = Db.delete_all_courses(dry_run, on_progress)
+        if not dry_run:
+            catalog_cache.invalidate()
+        return stats
 
     @staticmethod
     def get_all():
@@ -114,8 +153,24 @@ class CourseRepository(CRUD):
 
         :return: Lista de instâncias da classe Course.
         """
-        courses_data = Db.get_all_documents('courses')
-        return [Course.from_dict(data) for data in courses_data]
+        def load():
+            courses_data = Db.get_all_documents('courses', COURSE_FIELDS)
+            return [Course.from_dict(data) for data in courses_data]
+
+        return catalog_cache.get_or_load(('courses',), load)
+
+    @staticmethod
+    def get_page(limit: int, start_after: Optional[str] = None, order_by: Optional[str] = None):
+        """
+        Obtém uma página de cursos.
+
+        :param limit: Número máximo de cursos na página.
+        :param start_after: Cursor devolvido pela página anterior (opcional).
+        :param order_by: Campo de ordenação (opcional); o desempate é sempre pelo ID.
+        :return: Tupla (lista de instâncias de Course, cursor da próxima página ou None).
+        """
+        courses_data, next_cursor = Db.get_documents_page('courses', limit, start_after, order_by, COURSE_FIELDS)
+        return [Course.from_dict(data) for data in courses_data], next_cursor
 
 
 # Herança e Encapsulamento
@@ -125,13 +180,16 @@ class DisciplineRepository(CRUD):
     Herda de CRUD e implementa os métodos para lidar com a coleção 'disciplines'.
     """
 
+    # Conclusão da migração de membros já confirmada neste processo (ver membership_migrated)
+    _membership_migrated = False
+
     @staticmethod
     def create(data, document_id=None, course_id=None):
         """
         Cria uma nova disciplina no banco de dados. Pode ser criada dentro de um curso ou globalmente.
 
         :param data: Instância da classe Discipline ou dicionário com dados da disciplina.
-        :param document_id: ID da disciplina (opcional).
+        :param document_id: ID da disciplina (opcional). Se não fornecido, usa o ID da disciplina ou gera um novo.
         :param course_id: ID do curso (opcional). Se fornecido, cria a disciplina dentro do curso.
         :return: ID da disciplina criada.
         """
@@ -143,9 +201,13 @@ class DisciplineRepository(CRUD):
             raise ValueError(f"Os dados devem ser um dicionário ou uma instância de Discipline, mas foi recebido {type(data).__name__}")
 
         discipline_data = discipline.to_dict()
+        document_id = document_id or discipline.id
         if course_id:
-            return Db.create_document(f'courses/{course_id}/disciplines', discipline_data, document_id)
-        return Db.create_document('disciplines', discipline_data, document_id)
+            created_id = Db.create_document(f'courses/{course_id}/disciplines', discipline_data, document_id)
+        else:
+            created_id = Db.create_document('disciplines', discipline_data, document_id)
+        DisciplineRepository.invalidate_cache(course_id)
+        return created_id
 
     @staticmethod
     def get(document_id, course_id=None):
@@ -157,13 +219,25 @@ class DisciplineRepository(CRUD):
         :return: Instância da classe Discipline com os dados da disciplina, ou None se não encontrada.
         """
         if course_id:
-            data = Db.get_document(f'courses/{course_id}/disciplines', document_id)
+            data = Db.get_document(f'courses/{course_id}/disciplines', document_id, DISCIPLINE_FIELDS)
         else:
-            data = Db.get_document('disciplines', document_id)
+            data = Db.get_document('disciplines', document_id, DISCIPLINE_FIELDS)
         if data:
             return Discipline.from_dict(data)
         return None
 
+    @staticmethod
+    def get_many(document_ids: List[str], course_id=None):
+        """
+        Obtém várias disciplinas em uma única leitura em lote. Podem ser obtidas dentro de um curso ou globalmente.
+
+        :param document_ids: Lista de IDs das disciplinas.
+        :param course_id: ID do curso (opcional). Se fornecido, obtém as disciplinas dentro do curso.
+        :return: Lista de instâncias da classe Discipline, na ordem dos IDs; disciplinas inexistentes são omitidas.
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        return [Discipline.from_dict(data) for data in Db.get_documents(collection_path, document_ids, DISCIPLINE_FIELDS)]
+
     @staticmethod
     def update(document_id, updates, course_id=None):
         """
@@ -177,6 +251,7 @@ class DisciplineRepository(CRUD):
             Db.update_document(f'courses/{course_id}/disciplines', document_id, updates)
         else:
             Db.update_document('disciplines', document_id, updates)
+        DisciplineRepository.invalidate_cache(course_id)
 
     @staticmethod
     def delete(document_id, course_id=None):
@@ -190,6 +265,17 @@ class DisciplineRepository(CRUD):
             Db.delete_document(f'courses/{course_id}/disciplines', document_id)
         else:
             Db.delete_document('disciplines', document_id)
+        DisciplineRepository.invalidate_cache(course_id)
+
+    @staticmethod
+    def invalidate_cache(course_id=None):
+        """
+        Descarta do cache do catálogo a listagem de disciplinas de um curso (ou a listagem global).
+        Deve ser chamado após qualquer escrita em disciplinas feita fora deste repositório.
+
+        :param course_id: ID do curso (opcional).
+        """
+        catalog_cache.invalidate(('disciplines', course_id), ('counts', course_id))
 
     @staticmethod
     def get_all_disciplines_in_course(course_id=None):
@@ -199,16 +285,36 @@ class DisciplineRepository(CRUD):
         :param course_id: ID do curso (opcional). Se fornecido, obtém disciplinas dentro do curso.
         :return: Lista de instâncias da classe Discipline.
         """
-        if course_id:
-            disciplines_data = Db.get_all_documents(f'courses/{course_id}/disciplines')
-        else:
-            disciplines_data = Db.get_all_documents('disciplines')
-        return [Discipline.from_dict(data) for data in disciplines_data]
+        def load():
+            if course_id:
+                disciplines_data = Db.get_all_documents(f'courses/{course_id}/disciplines', DISCIPLINE_FIELDS)
+            else:
+                disciplines_data = Db.get_all_documents('disciplines', DISCIPLINE_FIELDS)
+            return [Discipline.from_dict(data) for data in disciplines_data]
+
+        return catalog_cache.get_or_load(('disciplines', course_id), load)
+
+    @staticmethod
+    def get_page(limit: int, start_after: Optional[str] = None, order_by: Optional[str] = None, course_id=None):
+        """
+        Obtém uma página de disciplinas de um curso (ou globais).
+
+        :param limit: Número máximo de disciplinas na página.
+        :param start_after: Cursor devolvido pela página anterior (opcional).
+        :param order_by: Campo de ordenação (opcional); o desempate é sempre pelo ID.
+        :param course_id: ID do curso (opcional).
+        :return: Tupla (lista de instâncias de Discipline, cursor da próxima página ou None).
+        """
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        disciplines_data, next_cursor = Db.get_documents_page(collection_path, limit, start_after, order_by,
+                                                              DISCIPLINE_FIELDS)
+        return [Discipline.from_dict(data) for data in disciplines_data], next_cursor
 
     @staticmethod
     def add_user_to_disciplines(user_id: str, course_id: str, discipline_ids: List[str], type_help: str):
         """
         Adiciona um usuário a várias disciplinas em uma coleção específica (helpers ou seekers).
+        A lista de disciplinas do usuário é atualizada na mesma transação (ver UserRepository.change_disciplines).
 
         :param user_id: ID do usuário a ser adicionado.
         :param course_id: ID do curso onde as disciplinas estão localizadas.
@@ -219,39 +325,271 @@ class DisciplineRepository(CRUD):
         if not course_id or not discipline_ids:
             raise ValueError("É necessário fornecer o ID do curso e uma lista de IDs das disciplinas.")
 
+        UserRepository.change_disciplines(user_id, course_id, type_help, lambda current: current + discipline_ids,
+                                          discipline_ids)
+
+    @staticmethod
+    def members_path(course_id, discipline_id, type_help):
+        """Caminho da subcoleção de membros ('helpers' ou 'seekers') de uma disciplina."""
+        collection_name = "helpers" if type_help == "offer_help" else "seekers"
+        discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        return f'{discipline_collection_path}/{discipline_id}/{collection_name}'
+
+    @staticmethod
+    def counters_path(course_id, discipline_id):
+        """Caminho da subcoleção com os shards do contador de membros de uma disciplina."""
+        discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        return f'{discipline_collection_path}/{discipline_id}/counters'
+
+    @staticmethod
+    def counter_write(course_id, discipline_id, deltas):
+        """
+        Monta o incremento de um shard, escolhido ao acaso, do contador de membros de uma disciplina.
+        O contador é a soma dos campos 'helpers' e 'seekers' de todos os shards (ver get_counts).
+
+        :param deltas: Dicionário {'helpers': n, 'seekers': n} com os incrementos (podem ser negativos).
+        :return: Escrita Write.
+        """
+        discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        shard_id = str(random.randrange(settings.DISCIPLINE_COUNTER_SHARDS))
+        data = {'course_id': course_id, 'discipline_id': discipline_id}
+        data.update({field: firestore.Increment(delta) for field, delta in deltas.items()})
+        return Write('merge', f'{discipline_collection_path}/{discipline_id}/counters', shard_id, data)
+
+    @staticmethod
+    def membership_writes(user_id: str, course_id: str, added_ids: List[str], removed_ids: List[str], type_help: str):
+        """
+        Monta as escritas que adicionam e removem um usuário das disciplinas, sem aplicá-las: o documento
+        de membro em 'helpers'/'seekers' e o incremento do contador de cada disciplina.
+        Os IDs devem refletir mudanças reais (como as calculadas em UserRepository.membership_transaction),
+        caso contrário os contadores divergem.
+
+        :param user_id: ID do usuário.
+        :param course_id: ID do curso onde as disciplinas estão localizadas.
+        :param added_ids: IDs das disciplinas às quais o usuário será adicionado.
+        :param removed_ids: IDs das disciplinas das quais o usuário será removido.
+        :param type_help: Tipo de ajuda ('offer_help' para helpers e 'seek_help' para seekers).
+        :return: Lista de escritas Write.
+        """
+        counter_field = "helpers" if type_help == "offer_help" else "seekers"
+        writes = []
+        for discipline_id in added_ids:
+            member = {'user_id': user_id, 'course_id': course_id, 'discipline_id': discipline_id}
+            writes.append(Write('set', DisciplineRepository.members_path(course_id, discipline_id, type_help), user_id, member))
+            writes.append(DisciplineRepository.counter_write(course_id, discipline_id, {counter_field: 1}))
+        for discipline_id in removed_ids:
+            writes.append(Write('delete', DisciplineRepository.members_path(course_id, discipline_id, type_help), user_id))
+            writes.append(DisciplineRepository.counter_write(course_id, discipline_id, {counter_field: -1}))
+        return writes
+
+    @staticmethod
+    def existing_ids(course_id, discipline_ids):
+        """
+        Filtra os IDs das disciplinas que existem no curso.
+
+        :param course_id: ID do curso (ou None, para as disciplinas globais).
+        :return: Conjunto dos IDs encontrados.
+        """
+        if not discipline_ids:
+            return set()
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        return {data['id'] for data in Db.get_documents(collection_path, list(dict.fromkeys(discipline_ids)), ('id',))}
+
+    @staticmethod
+    def member_courses(user_id, type_help):
+        """
+        Obtém o curso de cada disciplina da qual o usuário é membro, a partir dos documentos de membro
+        (a lista de disciplinas do usuário guarda só os IDs). Usa uma consulta de collection group em
+        'helpers'/'seekers' por 'user_id', que precisa desse índice de campo habilitado no Firestore.
+
+        :return: Dicionário {discipline_id: course_id}.
+        """
         collection_name = "helpers" if type_help == "offer_help" else "seekers"
+        members = Db.get_collection_group_documents(collection_name, 'user_id', user_id, ('course_id', 'discipline_id'))
+        return {member['discipline_id']: member.get('course_id') for member in members}
+
+    @staticmethod
+    def membership_migrated():
+        """
+        Indica se a migração dos membros das disciplinas (arrays 'helpers'/'seekers') já foi concluída.
+        Uma vez concluída, a resposta fica guardada no processo; até lá, o marcador é lido a cada chamada.
+        """
+        if not DisciplineRepository._membership_migrated:
+            marker = Db.get_document(MIGRATIONS_COLLECTION, MEMBERSHIP_MIGRATION_ID)
+            DisciplineRepository._membership_migrated = bool(marker.get('completed'))
+        return DisciplineRepository._membership_migrated
+
+    @staticmethod
+    def legacy_membership_transaction(course_id, discipline_id, existing_members):
+        """
+        Monta a função de transação que move os membros guardados nos arrays 'helpers'/'seekers' de uma
+        disciplina para as subcoleções de membros e o contador, removendo os arrays. A transação lê o
+        documento da disciplina: se outra requisição já o migrou (sem arrays), nada é gravado.
+
+        :param existing_members: Dicionário {type_help: conjunto de IDs} dos usuários que já têm documento
+                                 de membro, que não são contados de novo (por exemplo, em um documento reimportado).
+        :return: Tupla (build_updates, result); após a transação, `result` tem o número de helpers e seekers
+                 movidos e 'migrated', que indica se a disciplina ainda tinha os arrays.
+        """
+        result = {'migrated': False, 'helpers': 0, 'seekers': 0}
+
+        def build_updates(discipline_data):
+            result.update(migrated=False, helpers=0, seekers=0)
+            if not any(discipline_data.get(field) for field in LEGACY_MEMBER_FIELDS.values()):
+                return []
+            writes = []
+            deltas = {}
+            for type_help, counter_field in LEGACY_MEMBER_FIELDS.items():
+                members_path = DisciplineRepository.members_path(course_id, discipline_id, type_help)
+                user_ids = list(dict.fromkeys(discipline_data.get(counter_field) or []))
+                new_ids = [user_id for user_id in user_ids if user_id not in existing_members[type_help]]
+                for user_id in new_ids:
+                    member = {'user_id': user_id, 'course_id': course_id, 'discipline_id': discipline_id}
+                    writes.append(Write('set', members_path, user_id, member))
+                deltas[counter_field] = len(new_ids)
+            writes.append(DisciplineRepository.counter_write(course_id, discipline_id, deltas))
+            discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+            writes.append(Write('update', discipline_collection_path, discipline_id,
+                                {field: firestore.DELETE_FIELD for field in LEGACY_MEMBER_FIELDS.values()}))
+            result.update(deltas, migrated=True)
+            return writes
+
+        return build_updates, result
+
+    @staticmethod
+    def migrate_discipline_membership(course_id, discipline_id, legacy_data):
+        """
+        Migra os membros de uma disciplina no formato antigo (ver legacy_membership_transaction).
+
+        :param legacy_data: Dados da disciplina com os arrays 'helpers' e 'seekers', lidos antes da transação
+                            para consultar os usuários que já têm documento de membro.
+        :return: Dicionário com 'migrated' e o número de helpers e seekers movidos.
+        """
+        existing_members = {}
+        for type_help, field in LEGACY_MEMBER_FIELDS.items():
+            user_ids = list(dict.fromkeys(legacy_data.get(field) or []))
+            members_path = DisciplineRepository.members_path(course_id, discipline_id, type_help)
+            existing = Db.get_documents(members_path, user_ids, ['user_id'])
+            existing_members[type_help] = {member['id'] for member in existing}
+        build_updates, result = DisciplineRepository.legacy_membership_transaction(course_id, discipline_id,
+                                                                                   existing_members)
+        discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        Db.update_in_transaction(discipline_collection_path, discipline_id, build_updates)
+        if result['migrated']:
+            DisciplineRepository.invalidate_cache(course_id)
+        return result
+
+    @staticmethod
+    def migrate_touched_membership(user_id, course_id, type_help, requested_ids=()):
+        """
+        Migração sob demanda, enquanto a migração completa não foi concluída: migra as disciplinas no formato
+        antigo que uma alteração de membros pode afetar (as da lista do usuário e as pedidas). Assim, nenhum
+        membro existe só nos arrays quando a alteração é aplicada, e removê-lo não deixa o contador negativo
+        nem permite que a migração completa o traga de volta.
+
+        :param requested_ids: IDs das disciplinas que a alteração pode adicionar em course_id.
+        """
+        collection_name = "helpers_disciplines" if type_help == "offer_help" else "seekers_disciplines"
+        user_data = Db.get_document('users', user_id, (collection_name,))
+        discipline_ids = list(dict.fromkeys(list(user_data.get(collection_name) or []) + list(requested_ids)))
+        if not discipline_ids:
+            return
+        legacy_fields = tuple(LEGACY_MEMBER_FIELDS.values())
+        collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
+        disciplines_data = Db.get_documents(collection_path, discipline_ids, legacy_fields)
+        found = {data['id']: (course_id, data) for data in disciplines_data}
+        missing = set(discipline_ids) - found.keys()
+        if missing:
+            # Disciplinas de outros cursos na lista do usuário: localiza o curso de cada uma pelos IDs
+            missing_by_course = {}
+            for data in Db.get_collection_group_documents('disciplines', fields=()):
+                if data['id'] in missing:
+                    missing_by_course.setdefault(data['parent_id'], []).append(data['id'])
+            for other_course_id, ids in missing_by_course.items():
+                other_path = f'courses/{other_course_id}/disciplines' if other_course_id else 'disciplines'
+                for data in Db.get_documents(other_path, ids, legacy_fields):
+                    found[data['id']] = (other_course_id, data)
+        for discipline_id, (discipline_course_id, data) in found.items():
+            if any(data.get(field) for field in legacy_fields):
+                DisciplineRepository.migrate_discipline_membership(discipline_course_id, discipline_id, data)
+
+    @staticmethod
+    def membership_migration_write():
+        """Monta a escrita do marcador de conclusão da migração dos membros das disciplinas."""
+        return Write('set', MIGRATIONS_COLLECTION, MEMBERSHIP_MIGRATION_ID,
+                     {'completed': True, 'completed_at': firestore.SERVER_TIMESTAMP})
 
+    @staticmethod
+    def sum_counters(shards):
+        """
+        Soma os shards dos contadores de membros.
+
+        :param shards: Dicionários dos documentos em 'counters', com 'discipline_id', 'helpers' e 'seekers'.
+        :return: Dicionário {discipline_id: {'helpers': n, 'seekers': n}}.
+        """
+        counts = {}
+        for shard in shards:
+            total = counts.setdefault(shard['discipline_id'], {'helpers': 0, 'seekers': 0})
+            total['helpers'] += shard.get('helpers', 0)
+            total['seekers'] += shard.get('seekers', 0)
+        return counts
+
+    @staticmethod
+    def fill_counts(counts, discipline_ids):
+        """
+        Completa os totais com zero para as disciplinas sem shards, para que também fiquem no cache.
+
+        :return: O próprio dicionário `counts`.
+        """
         for discipline_id in discipline_ids:
-            discipline_collection_path = f'courses/{course_id}/disciplines'
-            existing_document = Db.get_document(discipline_collection_path, discipline_id)
-            existing_users = existing_document.get(collection_name, [])
+            counts.setdefault(discipline_id, {'helpers': 0, 'seekers': 0})
+        return counts
+
+    @staticmethod
+    def get_counts(course_id=None, discipline_ids=None, whole_course=False):
+        """
+        Obtém o número de helpers e seekers das disciplinas de um curso.
+
+        Sem `discipline_ids`, soma os shards de todas as disciplinas do curso com uma única consulta.
+        Com `discipline_ids`, os totais vêm do cache do catálogo, e só os shards das disciplinas ausentes
+        dele são lidos (invalidado junto com as disciplinas, ver invalidate_cache).
+
+        :param course_id: ID do curso (opcional). Se não fornecido, considera as disciplinas globais.
+        :param discipline_ids: IDs das disciplinas cujos totais serão retornados (opcional).
+        :param whole_course: Se True, carrega as disciplinas ausentes do cache com a consulta única do curso,
+                             mais barata quando `discipline_ids` é a listagem completa.
+        :return: Dicionário {discipline_id: {'helpers': n, 'seekers': n}}. Sem `discipline_ids`,
+                 disciplinas sem membros não aparecem.
+        """
+        if discipline_ids is None:
+            shards = Db.get_collection_group_documents('counters', 'course_id', course_id, COUNTER_FIELDS)
+            return DisciplineRepository.sum_counters(shards)
 
-            if user_id not in existing_users:
-                existing_users.append(user_id)
+        def load(missing):
+            if whole_course:
+                return DisciplineRepository.fill_counts(DisciplineRepository.get_counts(course_id), missing)
+            counts = {}
+            for discipline_id in missing:
+                shards = Db.get_all_documents(DisciplineRepository.counters_path(course_id, discipline_id),
+                                              COUNTER_FIELDS)
+                counts.update(DisciplineRepository.sum_counters(shards))
+            return DisciplineRepository.fill_counts(counts, missing)
 
-            updates = {collection_name: existing_users}
-            Db.update_document(discipline_collection_path, discipline_id, updates)
+        return catalog_cache.get_items_or_load(('counts', course_id), discipline_ids, load)
 
     @staticmethod
     def remove_user_from_discipline(user_id: str, discipline_id: str, type_help: str, course_id: str = None):
         """
         Remove um usuário de uma disciplina em uma coleção específica (helpers ou seekers).
+        A lista de disciplinas do usuário é atualizada na mesma transação (ver UserRepository.change_disciplines).
 
         :param user_id: ID do usuário a ser removido.
         :param discipline_id: ID da disciplina da qual o usuário será removido.
         :param type_help: Tipo de ajuda ('offer_help' para helpers e 'seek_help' para seekers).
         :param course_id: ID do curso (opcional). Se fornecido, remove o usuário da disciplina dentro do curso.
         """
-        collection_name = "helpers" if type_help == "offer_help" else "seekers"
-        discipline_collection_path = f'courses/{course_id}/disciplines' if course_id else 'disciplines'
-
-        existing_document = Db.get_document(discipline_collection_path, discipline_id)
-        existing_users = existing_document.get(collection_name, [])
-
-        if user_id in existing_users:
-            existing_users.remove(user_id)
-            updates = {collection_name: existing_users}
-            Db.update_document(discipline_collection_path, discipline_id, updates)
+        UserRepository.change_disciplines(user_id, course_id, type_help,
+                                          lambda current: [d for d in current if d != discipline_id])
 
 
 # Herança e Encapsulamento
@@ -261,62 +599,132 @@ class UserRepository(CRUD):
     Herda de CRUD e implementa os métodos para lidar com a coleção 'users'.
     """
 
+    @staticmethod
+    def create(data, document_id=None):
+        """
+        Cria um novo usuário. Normalmente o ID do documento é o UID do Firebase Auth.
+
+        :param data: Dicionário com os dados do usuário.
+        :param document_id: ID do usuário (opcional).
+        :return: ID do usuário criado.
+        """
+        return Db.create_document('users', data, document_id)
+
     @staticmethod
     def get(document_id: str):
         return Db.get_document('users', document_id)
 
     @staticmethod
-    def add_discipline_to_user(user_id: str, discipline_ids: List[str], type_help: str):
+    def update(document_id: str, updates):
         """
-        Adiciona uma lista de IDs de disciplinas ao documento do usuário na coleção 'disciplines'.
+        Atualiza um usuário existente com os dados fornecidos.
 
-        :param user_id: ID do usuário.
-        :param discipline_ids: Lista de IDs das disciplinas a serem adicionadas.
-        :param type_help: Tipo de ajuda ('offer_help' para helpers e 'seek_help' para seekers).
+        :param document_id: ID do usuário a ser atualizado.
+        :param updates: Dados para atualizar o usuário.
         """
-        updates = {}
-        if type_help == "offer_help":
-            updates['helpers_disciplines'] = firestore.ArrayUnion(discipline_ids)
-        else:
-            updates['seekers_disciplines'] = firestore.ArrayUnion(discipline_ids)
-
-        Db.update_document('users', user_id, updates)
+        Db.update_document('users', document_id, updates)
 
     @staticmethod
-    def update_user_disciplines(user_id: str, new_discipline_ids: List[str], type_help: str):
+    def disciplines_update(user_id: str, discipline_ids: List[str], type_help: str):
         """
-        Atualiza as disciplinas de um usuário na coleção 'disciplines'.
+        Monta a atualização que substitui a lista de disciplinas do usuário, sem aplicá-la.
 
-        :param user_id: ID do usuário.
-        :param new_discipline_ids: Lista de novos IDs de disciplinas.
-        :param type_help: Tipo de ajuda ('offer_help' para helpers e 'seek_help' para seekers).
+        :return: Escrita Write.
         """
         collection_name = "helpers_disciplines" if type_help == "offer_help" else "seekers_disciplines"
-        updates = {collection_name: new_discipline_ids}
-        Db.update_document('users', user_id, updates)
+        return Write('update', 'users', user_id, {collection_name: discipline_ids})
 
     @staticmethod
-    def remove_disciplines_from_user(user_id: str, discipline_ids: List[str], type_help: str):
-        """
-        Remove IDs de disciplinas de um usuário na coleção 'seekers_disciplines' ou 'helpers_disciplines'.
-
-        :param user_id: ID do usuário.
-        :param discipline_ids: Lista de IDs das disciplinas a serem removidas.
-        :param type_help: Tipo de ajuda ('offer_help' para helpers e 'seek_help' para seekers).
+    def membership_transaction(user_id: str, course_id: str, type_help: str, compute_discipline_ids,
+                               known_ids=None, member_courses=None, allow_orphans=False):
+        """
+        Monta a função de transação que substitui a lista de disciplinas do usuário e, a partir da
+        diferença em relação à lista atual, os membros e contadores das disciplinas afetadas.
+
+        :param compute_discipline_ids: Função que recebe a lista atual de IDs do usuário e retorna a nova.
+        :param known_ids: IDs das disciplinas que existem em course_id (ver DisciplineRepository.existing_ids).
+                          Se fornecido, adicionar qualquer outra levanta ValueError.
+        :param member_courses: Curso de cada disciplina da qual o usuário é membro (ver
+                               DisciplineRepository.member_courses). Se fornecido, cada disciplina é removida
+                               do curso a que pertence, e não de course_id.
+        :param allow_orphans: Se False, remover uma disciplina ausente de member_courses levanta StaleMemberships
+                              (ela pode ter sido adicionada depois da consulta); se True, ela sai apenas da lista
+                              do usuário, pois não tem documento de membro.
+        :return: Tupla (build_updates, result); após a transação, `result` tem as listas 'added' e 'removed'
+                 e o conjunto 'courses' dos cursos alterados.
         """
         collection_name = "helpers_disciplines" if type_help == "offer_help" else "seekers_disciplines"
+        result = {'added': [], 'removed': [], 'courses': set()}
+
+        def build_updates(user_data):
+            # Executado dentro da transação (e repetido em caso de conflito): a lista atual é lida de forma consistente
+            if not user_data:
+                raise ValueError("Usuário não encontrado")
+            current_ids = user_data.get(collection_name, [])
+            new_ids = list(dict.fromkeys(compute_discipline_ids(list(current_ids))))
+            current_set, new_set = set(current_ids), set(new_ids)
+            result['added'] = [d for d in new_ids if d not in current_set]
+            result['removed'] = [d for d in current_ids if d not in new_set]
+            if known_ids is not None:
+                missing = [d for d in result['added'] if d not in known_ids]
+                if missing:
+                    raise ValueError(f"Disciplinas não encontradas no curso {course_id}: {', '.join(missing)}")
+
+            removed_by_course = {}
+            if member_courses is None:
+                removed_by_course[course_id] = result['removed']
+            else:
+                unknown = [d for d in result['removed'] if d not in member_courses]
+                if unknown and not allow_orphans:
+                    raise StaleMemberships(unknown)
+                for discipline_id in result['removed']:
+                    if discipline_id in member_courses:
+                        removed_by_course.setdefault(member_courses[discipline_id], []).append(discipline_id)
+
+            writes = DisciplineRepository.membership_writes(user_id, course_id, result['added'], [], type_help)
+            for member_course_id, removed_ids in removed_by_course.items():
+                writes += DisciplineRepository.membership_writes(user_id, member_course_id, [], removed_ids, type_help)
+            writes.append(UserRepository.disciplines_update(user_id, new_ids, type_help))
+            result['courses'] = {course_id} | removed_by_course.keys()
+            return writes
+
+        return build_updates, result
 
-        # Recupera o documento do usuário
-        user_data = Db.get_document('users', user_id)
-        if not user_data:
-            raise ValueError("Usuário não encontrado")
-
-        # Obtém a lista atual de IDs de disciplinas
-        existing_discipline_ids = user_data.get(collection_name, [])
+    @staticmethod
+    def change_disciplines(user_id: str, course_id: str, type_help: str, compute_discipline_ids, requested_ids=()):
+        """
+        Altera a lista de disciplinas do usuário e os membros e contadores das disciplinas em uma única
+        transação (ver membership_transaction). As disciplinas adicionadas devem existir em course_id;
+        as removidas saem do curso a que pertencem.
+
+        :param requested_ids: IDs das disciplinas que a alteração pode adicionar, verificados antes da transação.
+        :return: Tupla (IDs adicionados, IDs removidos).
+        :raises ValueError: Se uma disciplina adicionada não existir no curso.
+        """
+        if not DisciplineRepository.membership_migrated():
+            DisciplineRepository.migrate_touched_membership(user_id, course_id, type_help, requested_ids)
+        known_ids = DisciplineRepository.existing_ids(course_id, requested_ids)
+        for allow_orphans in (False, True):
+            # Na segunda tentativa, os membros são consultados de novo: uma disciplina adicionada por outra
+            # requisição depois da primeira consulta passa a ter curso conhecido
+            build_updates, result = UserRepository.membership_transaction(
+                user_id, course_id, type_help, compute_discipline_ids, known_ids,
+                DisciplineRepository.member_courses(user_id, type_help), allow_orphans)
+            try:
+                Db.update_in_transaction('users', user_id, build_updates)
+            except StaleMemberships:
+                continue
+            break
+        for changed_course_id in result['courses']:
+            DisciplineRepository.invalidate_cache(changed_course_id)
+        return result['added'], result['removed']
 
-        # Remove as disciplinas especificadas
-        updated_discipline_ids = [id for id in existing_discipline_ids if id not in discipline_ids]
+    @staticmethod
+    def update_in_transaction(user_id: str, build_updates):
+        """
+        Lê o documento do usuário e aplica as atualizações calculadas a partir dele em uma única transação.
 
-        # Atualiza o documento do usuário com a nova lista
-        updates = {collection_name: updated_discipline_ids}
-        Db.update_document('users', user_id, updates)
+        :param user_id: ID do usuário.
+        :param build_updates: Função que recebe os dados do usuário e retorna as atualizações a aplicar.
+        """
+        Db.update_in_transaction('users', user_id, build_updates)
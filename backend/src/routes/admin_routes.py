@@ -1,10 +1,19 @@
+import csv
+import io
+import json
 import logging
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-from admin_control import AdminControl
+from admin_control import AdminControl, EXPORT_COLLECTIONS
+from configs import settings
+from data.pagination import MAX_PAGE_SIZE
+from monitoring.tracing import hot_documents
+from repositories.catalog_mirror import catalog_mirror
+from services.matching_index import matching_index
 from models import Course, Discipline as DisciplineModel, CourseResponse, CourseCreate
 from src.controllers.auth_control import AuthControl, oauth2_scheme
 
@@ -23,72 +32,248 @@ class DisciplineResponse(BaseModel):
     name: str
     code: str
     semester: int
+    helpers_count: int = 0
+    seekers_count: int = 0
+
+class RoleUpdate(BaseModel):
+    role: str
 
 # Função para obter o administrador atual a partir do token de autenticação
-def get_current_admin(token: str = Depends(oauth2_scheme)) -> AdminControl:
-    user = auth_control.is_admin(token)  # Verifica se o token pertence a um administrador
+async def get_current_admin(token: str = Depends(oauth2_scheme)) -> AdminControl:
+    user = await auth_control.is_admin(token)  # Verifica se o token pertence a um administrador
     return AdminControl(user)  # Retorna uma instância de AdminControl para o administrador autenticado
 
 @router.post("/courses", response_model=CourseResponse, status_code=201)
-def create_course(course: CourseCreate, admin: AdminControl = Depends(get_current_admin)):
+async def create_course(course: CourseCreate, admin: AdminControl = Depends(get_current_admin)):
     try:
         # Cria o curso com o nome e código fornecidos
-        created_course_id = admin.create_course(id=None, name=course.name, code=course.code)
-        created_course = Course(id=created_course_id, name=course.name, code=course.code)
-        return CourseResponse(id=created_course.id, name=created_course.name, code=created_course.code)
+        created_course_id = await admin.create_course(id=None, name=course.name, code=course.code)
+        return Course(id=created_course_id, name=course.name, code=course.code).to_dict()
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": f"Error creating course: {str(e)}"})
 
 
 @router.put("/courses/{course_id}", response_model=CourseResponse)
-def update_course(course_id: str, course: CourseCreate, admin: AdminControl = Depends(get_current_admin)):
+async def update_course(course_id: str, course: CourseCreate, admin: AdminControl = Depends(get_current_admin)):
     try:
-        course_model = Course(uid=course_id, name=course.name, code=course.code)
-        admin.update_course(course_id, name=course_model.name, code=course_model.code)
-        updated_course = admin.get_course(course_id)
+        await admin.update_course(course_id, name=course.name, code=course.code)
+        updated_course, _ = await admin.get_course(course_id)
         if not updated_course:
             raise HTTPException(status_code=404, detail={"error": "Course not found"})
-        return CourseResponse(uid=updated_course.uid, name=updated_course.name, code=updated_course.code)
+        return updated_course.to_dict()
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": f"Error updating course: {str(e)}"})
 
+@router.delete("/courses", status_code=200)
+async def delete_all_courses(dry_run: bool = Query(False), confirm: bool = Query(False),
+                             admin: AdminControl = Depends(get_current_admin)):
+    """Deleta todos os cursos e suas disciplinas. Exige confirm=true, exceto com dry_run=true."""
+    if not (dry_run or confirm):
+        raise HTTPException(status_code=400, detail={"error": "Use confirm=true para deletar todos os cursos"})
+    try:
+        return await admin.delete_all(dry_run)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail={"error": f"Error deleting courses: {str(e)}"})
+
 @router.delete("/courses/{course_id}", status_code=204)
-def delete_course(course_id: str, admin: AdminControl = Depends(get_current_admin)):
+async def delete_course(course_id: str, dry_run: bool = Query(False), admin: AdminControl = Depends(get_current_admin)):
     try:
-        admin.delete_course(course_id)
+        stats = await admin.delete_course(course_id, dry_run)
+        if dry_run:
+            # Nada foi deletado: informa quantos documentos seriam
+            return JSONResponse(stats)
         return Response(status_code=204)
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": f"Error deleting course: {str(e)}"})
 
 @router.post("/courses/{course_id}/disciplines", response_model=DisciplineResponse, status_code=201)
-def create_discipline(course_id: str, discipline: DisciplineCreate, admin: AdminControl = Depends(get_current_admin)):
-    try:
-        discipline_model = DisciplineModel(id=None, name=discipline.name, code=discipline.code, semester=discipline.semester)
-        discipline_id = admin.create_discipline(course_id=course_id, id=discipline_model.id, name=discipline_model.name,
-                                                     code=discipline_model.code, semester=discipline_model.semester)
-        created_discipline = DisciplineModel(id=discipline_id, name=discipline.name,
-                                             code=discipline.code, semester=discipline.semester)
-        return DisciplineResponse(id=created_discipline.id, name=created_discipline.name,
-                                  code=created_discipline.code, semester=created_discipline.semester)
+async def create_discipline(course_id: str, discipline: DisciplineCreate, admin: AdminControl = Depends(get_current_admin)):
+    try:
+        discipline_id = await admin.create_discipline(course_id=course_id, id=None, name=discipline.name,
+                                                     code=discipline.code, semester=discipline.semester)
+        return DisciplineModel(discipline_id, discipline.name, discipline.code, discipline.semester).to_dict()
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": f"Error creating discipline: {str(e)}"})
 
 @router.put("/courses/{course_id}/disciplines/{discipline_id}", response_model=DisciplineResponse)
-def update_discipline(course_id: str, discipline_id: str, discipline: DisciplineCreate, admin: AdminControl = Depends(get_current_admin)):
+async def update_discipline(course_id: str, discipline_id: str, discipline: DisciplineCreate, admin: AdminControl = Depends(get_current_admin)):
     try:
-        discipline_model = DisciplineModel(uid=discipline_id, name=discipline.name, code=discipline.code, semester=discipline.semester)
-        admin.update_discipline(course_id, discipline_id, name=discipline_model.name, code=discipline_model.code, semester=discipline_model.semester)
-        updated_discipline = admin.get_discipline(course_id, discipline_id)
+        await admin.update_discipline(course_id, discipline_id, name=discipline.name, code=discipline.code, semester=discipline.semester)
+        updated_discipline = await admin.get_discipline(course_id, discipline_id)
         if not updated_discipline:
             raise HTTPException(status_code=404, detail={"error": "Discipline not found"})
-        return DisciplineResponse(uid=updated_discipline.uid, name=updated_discipline.name, code=updated_discipline.code, semester=updated_discipline.semester)
+        return updated_discipline.to_dict()
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": f"Error updating discipline: {str(e)}"})
 
 @router.delete("/courses/{course_id}/disciplines/{discipline_id}", status_code=204)
-def delete_discipline(course_id: str, discipline_id: str, admin: AdminControl = Depends(get_current_admin)):
+async def delete_discipline(course_id: str, discipline_id: str, admin: AdminControl = Depends(get_current_admin)):
     try:
-        admin.delete_discipline(course_id, discipline_id)
+        await admin.delete_discipline(course_id, discipline_id)
         return Response(status_code=204)
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": f"Error deleting discipline: {str(e)}"})
+
+@router.put("/users/{user_id}/role", status_code=200)
+async def update_user_role(user_id: str, request: RoleUpdate, admin: AdminControl = Depends(get_current_admin)):
+    try:
+        await admin.update_user_role(user_id, request.role)
+        return {"message": "User role successfully updated"}
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail={"error": str(ve)})
+    except Exception as e:
+        logging.error(f"Error updating user role: {str(e)}")
+        raise HTTPException(status_code=500, detail={"error": "Internal server error"})
+
+@router.post("/users/claims/sync", status_code=200)
+async def sync_role_claims(admin: AdminControl = Depends(get_current_admin)):
+    try:
+        updated = await admin.sync_role_claims()
+        return {"message": "Role claims successfully synchronized", "updated": updated}
+    except Exception as e:
+        logging.error(f"Error synchronizing role claims: {str(e)}")
+        raise HTTPException(status_code=500, detail={"error": "Internal server error"})
+
+@router.get("/auth/key-cache")
+async def get_key_cache_stats(admin: AdminControl = Depends(get_current_admin)):
+    """Retorna as métricas do cache de chaves de assinatura usado na verificação local de tokens."""
+    if settings.AUTH_VERIFY_MODE != 'local':
+        return {"mode": settings.AUTH_VERIFY_MODE}
+    return {"mode": "local", **AuthControl.get_local_verifier().key_store.stats()}
+
+@router.get("/catalog/mirror")
+async def get_catalog_mirror_stats(admin: AdminControl = Depends(get_current_admin)):
+    """Retorna o estado do espelho do catálogo: tamanho e atraso desde o último snapshot."""
+    return {"enabled": settings.CATALOG_MIRROR_ENABLED, **catalog_mirror.stats()}
+
+@router.get("/matching/index")
+async def get_matching_index_stats(admin: AdminControl = Depends(get_current_admin)):
+    """Retorna o tamanho e a idade do índice de matchmaking deste processo."""
+    return matching_index.stats()
+
+@router.get("/db/hot-documents")
+async def get_hot_documents(limit: int = Query(20, ge=1, le=100), admin: AdminControl = Depends(get_current_admin)):
+    """Retorna os documentos mais lidos, mais escritos e mais disputados por este processo desde o último reset."""
+    return {"enabled": settings.DB_TRACE_ENABLED, **hot_documents.stats(limit)}
+
+@router.delete("/db/hot-documents", status_code=204)
+async def reset_hot_documents(admin: AdminControl = Depends(get_current_admin)):
+    """Zera as estatísticas de documentos mais acessados."""
+    hot_documents.clear()
+
+
+@router.post("/disciplines/membership/migrate", status_code=200)
+async def migrate_discipline_membership(admin: AdminControl = Depends(get_current_admin)):
+    """Move os arrays 'helpers'/'seekers' das disciplinas para as subcoleções de membros e os contadores."""
+    try:
+        return await admin.migrate_discipline_membership()
+    except Exception as e:
+        logging.error(f"Error migrating discipline membership: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/export")
+async def export_collections(collections: List[str] = Query(list(EXPORT_COLLECTIONS)),
+                             cursor: Optional[str] = Query(None),
+                             page_size: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             admin: AdminControl = Depends(get_current_admin)):
+    """
+    Exporta 'users', 'courses', as disciplinas de cada curso e os membros e contadores de cada disciplina
+    em NDJSON (um documento por linha). Cada linha traz um 'cursor'; para retomar uma exportação
+    interrompida, envie o cursor da última linha recebida. As linhas podem ser regravadas com POST /restore.
+    """
+    try:
+        lines = await admin.export_documents(collections, cursor, page_size)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail={"error": str(ve)})
+
+    async def ndjson():
+        try:
+            async for line in lines:
+                yield json.dumps(line, default=str, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # O status já foi enviado: o cliente detecta a interrupção e retoma pelo último cursor
+            logging.error(f"Error exporting collections: {str(e)}")
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+def parse_ndjson_lines(body: bytes):
+    """
+    Converte um corpo NDJSON (um objeto JSON por linha, como o de GET /export) em uma lista de dicionários.
+
+    :raises ValueError: Se alguma linha não for um objeto JSON.
+    """
+    try:
+        text = body.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError("O arquivo deve estar em UTF-8")
+    lines = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            lines.append(json.loads(line))
+        except json.JSONDecodeError:
+            raise ValueError(f"Linha {number}: JSON inválido")
+        if not isinstance(lines[-1], dict):
+            raise ValueError(f"Linha {number}: cada linha deve ser um objeto JSON")
+    return lines
+
+
+@router.post("/restore", status_code=200)
+async def restore_collections(request: Request, dry_run: bool = Query(False),
+                              admin: AdminControl = Depends(get_current_admin)):
+    """
+    Regrava os documentos de uma exportação NDJSON de GET /export (ver AdminControl.restore_documents).
+    Se alguma linha for inválida, nada é gravado.
+    """
+    try:
+        lines = parse_ndjson_lines(await request.body())
+        return await admin.restore_documents(lines, dry_run)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail={"error": str(ve)})
+    except Exception as e:
+        logging.error(f"Error restoring collections: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def parse_import_rows(body: bytes, content_type: str):
+    """
+    Converte o corpo de uma importação em uma lista de dicionários.
+    Aceita CSV com cabeçalho (text/csv) ou JSON: uma lista de objetos ou {"rows": [...]}.
+
+    :raises ValueError: Se o corpo não puder ser lido.
+    """
+    try:
+        text = body.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError("O arquivo deve estar em UTF-8")
+    if 'csv' in content_type:
+        return list(csv.DictReader(io.StringIO(text)))
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        raise ValueError("Envie um CSV (text/csv) ou um JSON com a lista de linhas")
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError("O JSON deve ser uma lista de objetos ou {\"rows\": [...]}")
+    return data
+
+
+@router.post("/import", status_code=200)
+async def import_catalog(request: Request, dry_run: bool = Query(False),
+                         admin: AdminControl = Depends(get_current_admin)):
+    """
+    Importa cursos e disciplinas em massa a partir de um CSV ou JSON (ver AdminControl.import_catalog).
+    Retorna um relatório por linha; linhas inválidas não impedem a gravação das demais.
+    """
+    try:
+        rows = parse_import_rows(await request.body(), request.headers.get('content-type', ''))
+        return await admin.import_catalog(rows, dry_run)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail={"error": str(ve)})
+    except Exception as e:
+        logging.error(f"Error importing catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,10 +1,11 @@
 # src/routes/user_routes.py
 import logging
 from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Query, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from pydantic import BaseModel, TypeAdapter
 
 from admin_routes import DisciplineResponse
+from data.pagination import MAX_PAGE_SIZE
 from src.controllers.auth_control import AuthControl, oauth2_scheme
 from models import CourseResponse
 from user_control import UserControl
@@ -12,6 +13,17 @@ from user_control import UserControl
 router = APIRouter()
 auth_control = AuthControl()
 
+# Campos aceitos em order_by nas listagens paginadas
+COURSE_ORDER_FIELDS = ('name', 'code')
+DISCIPLINE_ORDER_FIELDS = ('name', 'code', 'semester')
+# Cabeçalho com o cursor da próxima página; ausente na última página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Validadores das respostas das listagens (ver validated_response)
+COURSE_RESPONSE = TypeAdapter(CourseResponse)
+COURSE_RESPONSES = TypeAdapter(List[CourseResponse])
+DISCIPLINE_RESPONSE = TypeAdapter(DisciplineResponse)
+DISCIPLINE_RESPONSES = TypeAdapter(List[DisciplineResponse])
+
 class AssignDisciplinesRequest(BaseModel):
     user_id: str
     course_id: str
@@ -24,61 +36,108 @@ class DeleteDisciplinesRequest(BaseModel):
     discipline_ids: List[str]
     type_help: str
 
+class HelperMatch(BaseModel):
+    user_id: str
+    score: int
+    disciplines: List[str]
+
+class HelperRecommendation(HelperMatch):
+    score: float
+    overlap: int
+    semester_proximity: float
+    load: int
+
+def discipline_response(discipline, counts):
+    """Monta a resposta de uma disciplina com os contadores de helpers e seekers (ver UserControl.get_discipline_counts)."""
+    discipline_counts = counts.get(discipline.id, {})
+    response = discipline.to_dict()
+    response['helpers_count'] = discipline_counts.get('helpers', 0)
+    response['seekers_count'] = discipline_counts.get('seekers', 0)
+    return response
+
+def validated_response(adapter: TypeAdapter, value, next_cursor=None):
+    """
+    Valida a resposta contra o modelo da rota e a serializa em JSON numa única passada do pydantic-core,
+    sem o custo de criar um modelo por item e de a revalidar no FastAPI.
+
+    :param adapter: TypeAdapter do response_model (ver COURSE_RESPONSES e DISCIPLINE_RESPONSES).
+    :param value: Dicionário ou lista de dicionários (to_dict() dos modelos ou discipline_response).
+    :param next_cursor: Cursor da próxima página, enviado no cabeçalho X-Next-Cursor (opcional).
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    content = adapter.dump_json(adapter.validate_python(value))
+    return Response(content, media_type="application/json", headers=headers)
+
 # Injeção de Dependencia - Aqui estamos injetando a dependência AuthControl e criando uma instância de UserControl.
-def get_user(token: str = Depends(oauth2_scheme)) -> UserControl:
-    user = auth_control.get_current_user(token)
+async def get_user(token: str = Depends(oauth2_scheme)) -> UserControl:
+    user = await auth_control.get_current_user(token)
     return UserControl(user)  # Retorna uma instância de UserControl com o usuário encapsulado
 
 
 @router.get("/courses", response_model=List[CourseResponse])
-def get_courses(course_id: Optional[str] = Query(None), user: UserControl = Depends(get_user)):
+async def get_courses(course_id: Optional[str] = Query(None),
+                      limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                      cursor: Optional[str] = Query(None),
+                      order_by: Optional[str] = Query(None, enum=list(COURSE_ORDER_FIELDS)),
+                      user: UserControl = Depends(get_user)):
+    """
+    Lista os cursos. Sem `limit` nem `cursor`, retorna todos; caso contrário, retorna uma página
+    e o cursor da próxima no cabeçalho X-Next-Cursor.
+    """
     try:
         if course_id:
-            course = user.get_course(course_id)
+            course, _ = await user.get_course(course_id)
             if not course:
                 raise HTTPException(status_code=404, detail={"error": "Course not found"})
-            # Criar e retornar uma instância de CourseResponse
-            return CourseResponse.from_course(course)
+            # Um único curso não corresponde ao response_model (lista) da rota: validado como CourseResponse
+            return validated_response(COURSE_RESPONSE, course.to_dict())
+        elif limit or cursor:
+            courses, next_cursor = await user.get_courses_page(limit or MAX_PAGE_SIZE, cursor, order_by)
+            return validated_response(COURSE_RESPONSES, [c.to_dict() for c in courses], next_cursor)
         else:
-            all_courses = user.get_all_courses()
-            # Criar e retornar uma lista de CourseResponse
-            return [CourseResponse.from_course(c) for c in all_courses]
+            all_courses = await user.get_all_courses()
+            return validated_response(COURSE_RESPONSES, [c.to_dict() for c in all_courses])
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail={"error": str(ve)})
     except Exception as e:
         logging.error(f"Error retrieving courses: {str(e)}")
         raise HTTPException(status_code=500, detail={"error": "Internal server error"})
 
 
 @router.get("/courses/{course_id}/disciplines", response_model=List[DisciplineResponse])
-def get_disciplines(course_id: str,discipline_id: Optional[str] = Query(None), user: UserControl = Depends(get_user)):
+async def get_disciplines(course_id: str, discipline_id: Optional[str] = Query(None),
+                          limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                          cursor: Optional[str] = Query(None),
+                          order_by: Optional[str] = Query(None, enum=list(DISCIPLINE_ORDER_FIELDS)),
+                          user: UserControl = Depends(get_user)):
+    """
+    Lista as disciplinas de um curso. Sem `limit` nem `cursor`, retorna todas; caso contrário,
+    retorna uma página e o cursor da próxima no cabeçalho X-Next-Cursor.
+    """
     try:
         if discipline_id:
             # Buscar uma única disciplina associada ao course_id
-            discipline = user.get_discipline(course_id=course_id, discipline_id=discipline_id)
+            discipline = await user.get_discipline(course_id=course_id, discipline_id=discipline_id)
             if not discipline:
                 raise HTTPException(status_code=404, detail="Discipline not found")
-            return DisciplineResponse(
-                id=discipline.id,
-                name=discipline.name,
-                code=discipline.code,
-                semester=discipline.semester
-            )
+            counts = await user.get_discipline_counts(course_id, [discipline.id])
+            return validated_response(DISCIPLINE_RESPONSE, discipline_response(discipline, counts))
+        elif limit or cursor:
+            disciplines, next_cursor = await user.get_disciplines_page(course_id, limit or MAX_PAGE_SIZE,
+                                                                       cursor, order_by)
+            counts = await user.get_discipline_counts(course_id, [d.id for d in disciplines])
+            return validated_response(DISCIPLINE_RESPONSES, [discipline_response(d, counts) for d in disciplines],
+                                      next_cursor)
         else:
             # Buscar todas as disciplinas associadas ao course_id
-            all_disciplines = user.get_all_disciplines(course_id=course_id)
-            return [
-                DisciplineResponse(
-                    id=d.id,
-                    name=d.name,
-                    code=d.code,
-                    semester=d.semester
-                )
-                for d in all_disciplines
-            ]
+            all_disciplines = await user.get_all_disciplines(course_id=course_id)
+            counts = await user.get_discipline_counts(course_id, [d.id for d in all_disciplines], whole_course=True)
+            return validated_response(DISCIPLINE_RESPONSES, [discipline_response(d, counts) for d in all_disciplines])
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error retrieving disciplines: {str(e)}")
 
 @router.get("/disciplines/saved/seekers", response_model=List[DisciplineResponse])
-def get_saved_seekers_disciplines(user_id: str, user: UserControl = Depends(get_user)):
+async def get_saved_seekers_disciplines(user_id: str, user: UserControl = Depends(get_user)):
     """
     Obtém todas as disciplinas salvas por um usuário na coleção 'seekers_disciplines'.
 
@@ -87,21 +146,17 @@ def get_saved_seekers_disciplines(user_id: str, user: UserControl = Depends(get_
     :return: Lista de disciplinas salvas.
     """
     try:
-        discipline_ids = user.get_saved_disciplines(user_id, type_help="seek_help")
+        discipline_ids = await user.get_saved_disciplines(user_id, type_help="seek_help")
         course_id = "yvm1KcPdwS1i64VPsj9Y"  # Substitua pelo ID do curso apropriado, se necessário
-        disciplines = user.get_disciplines_details(course_id, discipline_ids)
-        return [DisciplineResponse(
-            id=d.id,
-            name=d.name,
-            code=d.code,
-            semester=d.semester
-        ) for d in disciplines]
+        disciplines = await user.get_disciplines_details(course_id, discipline_ids)
+        counts = await user.get_discipline_counts(course_id, [d.id for d in disciplines])
+        return validated_response(DISCIPLINE_RESPONSES, [discipline_response(d, counts) for d in disciplines])
     except Exception as e:
         logging.error(f"Error retrieving saved seekers disciplines: {str(e)}")
         raise HTTPException(status_code=500, detail={"error": "Internal server error"})
 
 @router.get("/disciplines/saved/helpers", response_model=List[DisciplineResponse])
-def get_saved_helpers_disciplines(user_id: str, user: UserControl = Depends(get_user)):
+async def get_saved_helpers_disciplines(user_id: str, user: UserControl = Depends(get_user)):
     """
     Obtém todas as disciplinas salvas por um usuário na coleção 'helpers_disciplines'.
 
@@ -110,22 +165,18 @@ def get_saved_helpers_disciplines(user_id: str, user: UserControl = Depends(get_
     :return: Lista de disciplinas salvas.
     """
     try:
-        discipline_ids = user.get_saved_disciplines(user_id, type_help="offer_help")
+        discipline_ids = await user.get_saved_disciplines(user_id, type_help="offer_help")
         course_id = "yvm1KcPdwS1i64VPsj9Y"
-        disciplines = user.get_disciplines_details(course_id, discipline_ids)
-        return [DisciplineResponse(
-            id=d.id,
-            name=d.name,
-            code=d.code,
-            semester=d.semester
-        ) for d in disciplines]
+        disciplines = await user.get_disciplines_details(course_id, discipline_ids)
+        counts = await user.get_discipline_counts(course_id, [d.id for d in disciplines])
+        return validated_response(DISCIPLINE_RESPONSES, [discipline_response(d, counts) for d in disciplines])
     except Exception as e:
         logging.error(f"Error retrieving saved helpers disciplines: {str(e)}")
         raise HTTPException(status_code=500, detail={"error": "Internal server error"})
 
 
 @router.post("/disciplines/assign", status_code=200)
-def assign_user_to_disciplines(request: AssignDisciplinesRequest, user: UserControl = Depends(get_user)):
+async def assign_user_to_disciplines(request: AssignDisciplinesRequest, user: UserControl = Depends(get_user)):
     """
     Atribui um usuário a várias disciplinas e atualiza as coleções 'helpers' ou 'seekers'.
 
@@ -134,7 +185,7 @@ def assign_user_to_disciplines(request: AssignDisciplinesRequest, user: UserCont
     """
     try:
         # Chama o método no UserControl para adicionar as disciplinas ao usuário
-        user.assign_user_to_disciplines(
+        await user.assign_user_to_disciplines(
             user_id=request.user_id,
             course_id=request.course_id,
             discipline_ids=request.discipline_ids,
@@ -150,7 +201,7 @@ def assign_user_to_disciplines(request: AssignDisciplinesRequest, user: UserCont
 
 
 @router.put("/disciplines/update", status_code=200)
-def update_user_disciplines(request: AssignDisciplinesRequest, user: UserControl = Depends(get_user)):
+async def update_user_disciplines(request: AssignDisciplinesRequest, user: UserControl = Depends(get_user)):
     """
     Atualiza as disciplinas de um usuário, removendo as antigas e adicionando as novas.
 
@@ -159,7 +210,7 @@ def update_user_disciplines(request: AssignDisciplinesRequest, user: UserControl
     """
     try:
         # Chama o método no UserControl para atualizar as disciplinas do usuário
-        user.update_user_disciplines(
+        await user.update_user_disciplines(
             user_id=request.user_id,
             course_id=request.course_id,
             new_discipline_ids=request.discipline_ids,
@@ -174,7 +225,7 @@ def update_user_disciplines(request: AssignDisciplinesRequest, user: UserControl
         raise HTTPException(status_code=500, detail={"error": "Internal server error"})
 
 @router.delete("/disciplines/remove", status_code=200)
-def remove_user_disciplines(request: DeleteDisciplinesRequest, user: UserControl = Depends(get_user)):
+async def remove_user_disciplines(request: DeleteDisciplinesRequest, user: UserControl = Depends(get_user)):
     """
     Remove disciplinas específicas do usuário.
 
@@ -183,7 +234,7 @@ def remove_user_disciplines(request: DeleteDisciplinesRequest, user: UserControl
     """
     try:
         # Chama o método no UserControl para remover as disciplinas do usuário
-        user.remove_user_from_disciplines(
+        await user.remove_user_from_disciplines(
             user_id=request.user_id,
             course_id=request.course_id,
             discipline_ids=request.discipline_ids,
@@ -196,3 +247,37 @@ def remove_user_disciplines(request: DeleteDisciplinesRequest, user: UserControl
     except Exception as e:
         logging.error(f"Error removing user disciplines: {str(e)}")
         raise HTTPException(status_code=500, detail={"error": "Internal server error"})
+
+
+@router.get("/match/helpers", response_model=List[HelperMatch])
+async def get_helper_matches(user_id: str, limit: int = Query(20, ge=1, le=100), user: UserControl = Depends(get_user)):
+    """
+    Obtém os helpers com mais disciplinas em comum com as que o usuário busca ajuda.
+
+    :param user_id: ID do usuário que busca ajuda.
+    :param limit: Número máximo de helpers retornados.
+    :param user: Instância do UserControl.
+    """
+    try:
+        return await user.get_helper_matches(user_id, limit)
+    except Exception as e:
+        logging.error(f"Error matching helpers: {str(e)}")
+        raise HTTPException(status_code=500, detail={"error": "Internal server error"})
+
+
+@router.get("/match/recommendations", response_model=List[HelperRecommendation])
+async def get_helper_recommendations(user_id: str, limit: int = Query(20, ge=1, le=100),
+                                     user: UserControl = Depends(get_user)):
+    """
+    Recomenda helpers para o usuário, considerando disciplinas em comum, proximidade de semestre
+    e quantos seekers cada helper já atende.
+
+    :param user_id: ID do usuário que busca ajuda.
+    :param limit: Número máximo de helpers retornados.
+    :param user: Instância do UserControl.
+    """
+    try:
+        return await user.get_helper_recommendations(user_id, limit)
+    except Exception as e:
+        logging.error(f"Error recommending helpers: {str(e)}")
+        raise HTTPException(status_code=500, detail={"error": "Internal server error"})
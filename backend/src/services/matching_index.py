@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+
+from starlette.concurrency import run_in_threadpool
+
+from configs import settings
+from repositories.async_repository import AsyncDisciplineRepository, AsyncUserRepository
+from services.recommendations import HelperMatrix
+
+# Campos de disciplinas no documento do usuário, por tipo de ajuda
+USER_FIELDS = {'offer_help': 'helpers_disciplines', 'seek_help': 'seekers_disciplines'}
+# Campos das disciplinas lidos na reconstrução; antes da migração dos membros, também os arrays antigos
+INDEX_DISCIPLINE_FIELDS = ('id', 'semester')
+LEGACY_INDEX_DISCIPLINE_FIELDS = INDEX_DISCIPLINE_FIELDS + ('helpers', 'seekers')
+
+
+def _log_matrix_build_error(task):
+    # Um cálculo em segundo plano que falha é refeito na próxima recomendação
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Error building helper matrix: {task.exception()}")
+
+
+def _log_index_rebuild_error(task):
+    # Uma reconstrução em segundo plano que falha é refeita na próxima consulta; até lá, vale o índice atual
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Error rebuilding matching index: {task.exception()}")
+
+
+def _help_type(type_help):
+    # Mesma convenção dos repositórios: qualquer valor diferente de 'offer_help' significa 'seek_help'
+    return 'offer_help' if type_help == 'offer_help' else 'seek_help'
+
+
+class MatchingIndex:
+    """
+    Índice invertido em memória para o matchmaking entre quem busca ajuda (seekers) e quem a oferece
+    (helpers): disciplina -> usuários e usuário -> disciplinas, para cada tipo de ajuda.
+
+    O índice é construído a partir dos campos 'helpers_disciplines'/'seekers_disciplines' dos usuários e
+    dos membros das disciplinas, e atualizado pelo UserControl a cada alteração. Como alterações
+    feitas em outros processos não são vistas, ele é reconstruído a cada `ttl` segundos.
+    """
+
+    def __init__(self, ttl: int):
+        """
+        :param ttl: Intervalo, em segundos, entre reconstruções a partir do banco.
+        """
+        self._ttl = ttl
+        self._members = {'offer_help': {}, 'seek_help': {}}  # discipline_id -> {user_id}
+        self._disciplines = {'offer_help': {}, 'seek_help': {}}  # user_id -> {discipline_id}
+        self._semesters = {}  # discipline_id -> semestre
+        # Incrementado a cada alteração; a HelperMatrix é recalculada quando fica desatualizada
+        self._version = 0
+        self._matrix = None  # Tupla (versão, HelperMatrix)
+        self._matrix_build = None  # Tarefa que recalcula a HelperMatrix em uma thread, se houver
+        self._lock = threading.Lock()
+        self._rebuild_task = None  # Tarefa que reconstrói o índice a partir do banco, se houver
+        self._built_at = None
+        # Alterações recebidas durante uma reconstrução, reaplicadas sobre o novo índice
+        self._journal = None
+
+    async def ensure_fresh(self):
+        """
+        Constrói o índice na primeira chamada e o reconstrói quando tiver mais de `ttl` segundos.
+        A reconstrução roda em segundo plano e, enquanto isso, as consultas usam o índice atual
+        (como a HelperMatrix em recommend_helpers): só a primeira construção é esperada.
+        """
+        with self._lock:
+            if self._is_fresh():
+                return
+            if self._rebuild_task is None:
+                self._rebuild_task = asyncio.ensure_future(self._rebuild_in_background())
+                self._rebuild_task.add_done_callback(_log_index_rebuild_error)
+            task = self._rebuild_task
+            built = self._built_at is not None
+        if not built:
+            # Uma requisição cancelada não cancela a construção compartilhada com as demais
+            await asyncio.shield(task)
+
+    async def _rebuild_in_background(self):
+        try:
+            await self.rebuild()
+        finally:
+            with self._lock:
+                self._rebuild_task = None
+
+    async def rebuild(self):
+        """Reconstrói o índice a partir dos usuários e das disciplinas de todos os cursos."""
+        with self._lock:
+            self._journal = []
+        try:
+            users = await AsyncUserRepository.get_all(list(USER_FIELDS.values()))
+            # Depois da migração, os arrays antigos não são mais lidos: um documento importado de uma
+            # exportação anterior não traz de volta membros já removidos
+            migrated = await AsyncDisciplineRepository.membership_migrated()
+            disciplines = await AsyncDisciplineRepository.get_all_across_courses(
+                INDEX_DISCIPLINE_FIELDS if migrated else LEGACY_INDEX_DISCIPLINE_FIELDS)
+            members = await AsyncDisciplineRepository.get_all_members()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        self.load(users, [discipline for _, discipline in disciplines], members)
+
+    def load(self, users, disciplines, members=()):
+        """
+        Substitui o conteúdo do índice.
+
+        :param users: Dicionários de usuários com 'id' e os campos de USER_FIELDS.
+        :param disciplines: Instâncias de Discipline (semestres e, se ainda não migrados, 'helpers' e 'seekers').
+        :param members: Tuplas (type_help, user_id, discipline_id) das subcoleções de membros das disciplinas.
+        """
+        discipline_members = {'offer_help': {}, 'seek_help': {}}
+        user_disciplines = {'offer_help': {}, 'seek_help': {}}
+        semesters = {discipline.id: discipline.semester for discipline in disciplines
+                     if isinstance(discipline.semester, (int, float))}
+
+        def link(type_help, user_id, discipline_id):
+            discipline_members[type_help].setdefault(discipline_id, set()).add(user_id)
+            user_disciplines[type_help].setdefault(user_id, set()).add(discipline_id)
+
+        for user in users:
+            for type_help, field in USER_FIELDS.items():
+                for discipline_id in user.get(field) or []:
+                    link(type_help, user['id'], discipline_id)
+        for type_help, user_id, discipline_id in members:
+            link(type_help, user_id, discipline_id)
+        for discipline in disciplines:
+            for user_id in discipline.helpers or []:
+                link('offer_help', user_id, discipline.id)
+            for user_id in discipline.seekers or []:
+                link('seek_help', user_id, discipline.id)
+
+        with self._lock:
+            journal, self._journal = self._journal or [], None
+            self._members, self._disciplines, self._semesters = discipline_members, user_disciplines, semesters
+            self._version += 1
+            for operation, args in journal:
+                operation(*args)
+            self._built_at = time.monotonic()
+
+    def add(self, user_id, discipline_ids, type_help):
+        """Registra o usuário nas disciplinas informadas."""
+        self._apply(self._add, user_id, discipline_ids, _help_type(type_help))
+
+    def remove(self, user_id, discipline_ids, type_help):
+        """Remove o usuário das disciplinas informadas."""
+        self._apply(self._remove, user_id, discipline_ids, _help_type(type_help))
+
+    def replace(self, user_id, discipline_ids, type_help):
+        """Substitui a lista de disciplinas do usuário para o tipo de ajuda informado."""
+        self._apply(self._replace, user_id, discipline_ids, _help_type(type_help))
+
+    def rank_helpers(self, seeker_id, limit=20):
+        """
+        Ordena os helpers pelo número de disciplinas em comum com as que o seeker busca
+        (e, em caso de empate, pelo ID).
+
+        :param seeker_id: ID do usuário que busca ajuda.
+        :param limit: Número máximo de helpers retornados.
+        :return: Lista de dicionários com 'user_id', 'score' e 'disciplines' (as disciplinas em comum).
+        """
+        with self._lock:
+            wanted = self._disciplines['seek_help'].get(seeker_id, set())
+            helpers = self._members['offer_help']
+            scores = Counter()
+            for discipline_id in wanted:
+                scores.update(helpers.get(discipline_id, ()))
+            scores.pop(seeker_id, None)
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            offered = self._disciplines['offer_help']
+            return [
+                {'user_id': user_id, 'score': score, 'disciplines': sorted(wanted & offered[user_id])}
+                for user_id, score in best
+            ]
+
+    async def recommend_helpers(self, seeker_id, limit=20):
+        """
+        Recomenda helpers para um seeker combinando disciplinas em comum, proximidade de semestre
+        e carga do helper (ver HelperMatrix.recommend).
+
+        A HelperMatrix é recalculada em uma thread quando o índice muda; enquanto isso, as recomendações
+        usam a matriz anterior. Só a primeira chamada espera o cálculo.
+
+        :param seeker_id: ID do usuário que busca ajuda.
+        :param limit: Número máximo de helpers retornados.
+        :return: Lista de dicionários com a pontuação e seus componentes para cada helper.
+        """
+        with self._lock:
+            wanted = sorted(self._disciplines['seek_help'].get(seeker_id, ()))
+            current = self._matrix
+            if (current is None or current[0] != self._version) and self._matrix_build is None:
+                self._matrix_build = asyncio.ensure_future(self._build_matrix())
+                self._matrix_build.add_done_callback(_log_matrix_build_error)
+            build = self._matrix_build
+        if current is None:
+            # Uma requisição cancelada não cancela o cálculo compartilhado com as demais
+            current = await asyncio.shield(build)
+        return current[1].recommend(seeker_id, wanted, limit)
+
+    async def _build_matrix(self):
+        try:
+            # Cópia das estruturas do índice, que continuam sendo alteradas enquanto a matriz é calculada
+            with self._lock:
+                version = self._version
+                helper_disciplines = {user_id: set(ids) for user_id, ids in self._disciplines['offer_help'].items()}
+                seeker_members = {discipline_id: set(ids) for discipline_id, ids in self._members['seek_help'].items()}
+                semesters = dict(self._semesters)
+            matrix = await run_in_threadpool(HelperMatrix, helper_disciplines, seeker_members, semesters)
+            with self._lock:
+                if self._matrix is None or self._matrix[0] < version:
+                    self._matrix = (version, matrix)
+                return self._matrix
+        finally:
+            with self._lock:
+                self._matrix_build = None
+
+    def stats(self):
+        """Retorna o tamanho do índice e a idade da última reconstrução."""
+        with self._lock:
+            return {
+                'built': self._built_at is not None,
+                'age_seconds': time.monotonic() - self._built_at if self._built_at is not None else None,
+                'helpers': len(self._disciplines['offer_help']),
+                'seekers': len(self._disciplines['seek_help']),
+                'disciplines': len(self._members['offer_help'].keys() | self._members['seek_help'].keys()),
+            }
+
+    def _is_fresh(self):
+        return self._built_at is not None and time.monotonic() - self._built_at < self._ttl
+
+    def _apply(self, operation, *args):
+        with self._lock:
+            operation(*args)
+            self._version += 1
+            if self._journal is not None:
+                self._journal.append((operation, args))
+
+    def _add(self, user_id, discipline_ids, type_help):
+        for discipline_id in discipline_ids:
+            self._members[type_help].setdefault(discipline_id, set()).add(user_id)
+        if discipline_ids:
+            self._disciplines[type_help].setdefault(user_id, set()).update(discipline_ids)
+
+    def _remove(self, user_id, discipline_ids, type_help):
+        members, user_disciplines = self._members[type_help], self._disciplines[type_help]
+        for discipline_id in discipline_ids:
+            users = members.get(discipline_id)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del members[discipline_id]
+        current = user_disciplines.get(user_id)
+        if current is not None:
+            current.difference_update(discipline_ids)
+            if not current:
+                del user_disciplines[user_id]
+
+    def _replace(self, user_id, discipline_ids, type_help):
+        current = self._disciplines[type_help].get(user_id, set())
+        self._remove(user_id, list(current - set(discipline_ids)), type_help)
+        self._add(user_id, [d for d in discipline_ids if d not in current], type_help)
+
+
+matching_index = MatchingIndex(ttl=settings.MATCHING_INDEX_TTL)
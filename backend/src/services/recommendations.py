@@ -0,0 +1,109 @@
+import numpy as np
+
+# Pesos dos componentes da pontuação de um helper
+OVERLAP_WEIGHT = 1.0  # Fração das disciplinas do seeker que o helper cobre
+SEMESTER_WEIGHT = 0.3  # Proximidade entre os semestres médios das disciplinas de cada um
+LOAD_WEIGHT = 0.2  # Preferência por helpers com menos seekers nas disciplinas que oferecem
+# Proximidade atribuída quando o semestre de um dos lados é desconhecido
+UNKNOWN_SEMESTER_PROXIMITY = 0.5
+
+
+class HelperMatrix:
+    """
+    Matriz esparsa helper x disciplina, em formato CSR (indptr/indices), com os dados por disciplina
+    (semestre e número de seekers) e por helper (semestre médio e carga) já calculados.
+    É uma fotografia imutável do MatchingIndex: a pontuação de todos os helpers para um seeker
+    é feita com operações vetorizadas do NumPy, sem laços em Python.
+    """
+
+    def __init__(self, helper_disciplines, seeker_members, semesters):
+        """
+        :param helper_disciplines: Dicionário user_id -> conjunto de disciplinas em que o usuário oferece ajuda.
+        :param seeker_members: Dicionário discipline_id -> conjunto de seekers da disciplina.
+        :param semesters: Dicionário discipline_id -> semestre da disciplina (quando conhecido).
+        """
+        self.user_ids = sorted(user_id for user_id, disciplines in helper_disciplines.items() if disciplines)
+        self.discipline_ids = sorted(set().union(*helper_disciplines.values(), seeker_members))
+        self._rows = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self._columns = {discipline_id: column for column, discipline_id in enumerate(self.discipline_ids)}
+
+        lengths = np.fromiter((len(helper_disciplines[user_id]) for user_id in self.user_ids),
+                              dtype=np.int64, count=len(self.user_ids))
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.indices = np.fromiter(
+            (self._columns[discipline_id] for user_id in self.user_ids for discipline_id in helper_disciplines[user_id]),
+            dtype=np.int64, count=int(self.indptr[-1]))
+
+        self.semester = np.array([semesters.get(discipline_id, np.nan) for discipline_id in self.discipline_ids],
+                                 dtype=np.float64)
+        seekers = np.array([len(seeker_members.get(discipline_id, ())) for discipline_id in self.discipline_ids],
+                           dtype=np.int64)
+        # Como todo helper tem ao menos uma disciplina, os segmentos de reduceat nunca são vazios
+        self.load = self._row_sum(seekers[self.indices])
+        helper_semesters = self.semester[self.indices]
+        known = ~np.isnan(helper_semesters)
+        with np.errstate(invalid='ignore'):
+            self.helper_semester = self._row_sum(np.where(known, helper_semesters, 0.0)) / self._row_sum(known)
+
+    def _row_sum(self, values):
+        if not len(self.user_ids):
+            return np.zeros(0, dtype=values.dtype)
+        return np.add.reduceat(values, self.indptr[:-1])
+
+    def recommend(self, seeker_id, wanted_ids, limit=20):
+        """
+        Pontua os helpers para um seeker e retorna os melhores.
+
+        score = OVERLAP_WEIGHT * disciplinas em comum / disciplinas buscadas
+              + SEMESTER_WEIGHT * 1 / (1 + |semestre médio do helper - semestre médio do seeker|)
+              + LOAD_WEIGHT * 1 / (1 + carga do helper)
+
+        Apenas helpers com ao menos uma disciplina em comum são considerados.
+
+        :param seeker_id: ID do seeker (excluído dos resultados).
+        :param wanted_ids: Disciplinas em que o seeker busca ajuda.
+        :param limit: Número máximo de helpers retornados.
+        :return: Lista de dicionários com 'user_id', 'score', 'overlap', 'semester_proximity', 'load' e 'disciplines'.
+        """
+        columns = [self._columns[discipline_id] for discipline_id in wanted_ids if discipline_id in self._columns]
+        if not columns or not self.user_ids:
+            return []
+        wanted = np.zeros(len(self.discipline_ids), dtype=bool)
+        wanted[columns] = True
+
+        in_wanted = wanted[self.indices]
+        overlap = self._row_sum(in_wanted.astype(np.int64))
+        wanted_semesters = self.semester[columns]
+        wanted_semesters = wanted_semesters[~np.isnan(wanted_semesters)]
+        if len(wanted_semesters):
+            proximity = 1.0 / (1.0 + np.abs(self.helper_semester - wanted_semesters.mean()))
+            proximity = np.where(np.isnan(proximity), UNKNOWN_SEMESTER_PROXIMITY, proximity)
+        else:
+            proximity = np.full(len(self.user_ids), UNKNOWN_SEMESTER_PROXIMITY)
+        score = (OVERLAP_WEIGHT * overlap / len(columns)
+                 + SEMESTER_WEIGHT * proximity
+                 + LOAD_WEIGHT / (1.0 + self.load))
+
+        candidates = overlap > 0
+        seeker_row = self._rows.get(seeker_id)
+        if seeker_row is not None:
+            candidates[seeker_row] = False
+        rows = np.flatnonzero(candidates)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-score[rows], limit - 1)[:limit]]
+        # Ordena por pontuação decrescente e, no empate, pelo ID do helper (as linhas seguem a ordem dos IDs)
+        rows = rows[np.lexsort((rows, -score[rows]))]
+
+        results = []
+        for row in rows:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            shared = self.indices[start:end][in_wanted[start:end]]
+            results.append({
+                'user_id': self.user_ids[row],
+                'score': round(float(score[row]), 4),
+                'overlap': int(overlap[row]),
+                'semester_proximity': round(float(proximity[row]), 4),
+                'load': int(self.load[row]),
+                'disciplines': sorted(self.discipline_ids[column] for column in shared),
+            })
+        return results
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mesmas raízes de código do projeto (ver benchmarks/load_test.py)
+sys.path[:0] = [BACKEND] + [os.path.join(BACKEND, *path) for path in
+                            (('src',), ('src', 'models'), ('src', 'controllers'), ('src', 'routes'))]
+
+# Importados depois de configurar as raízes acima
+from data.async_database import AsyncDb  # noqa: E402
+from data.database import Db  # noqa: E402
+from data.memory_engine import MemoryEngine  # noqa: E402
+from data.storage import AsyncEngineAdapter  # noqa: E402
+from repositories.catalog_cache import catalog_cache  # noqa: E402
+from repositories.repository import DisciplineRepository  # noqa: E402
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """Db e AsyncDb sobre um MemoryEngine novo, com o cache do catálogo e o estado da migração zerados."""
+    engine = MemoryEngine()
+    Db.use_engine(engine)
+    AsyncDb.use_engine(AsyncEngineAdapter(engine))
+    catalog_cache.invalidate()
+    monkeypatch.setattr(DisciplineRepository, '_membership_migrated', False)
+    yield engine
+    Db.use_engine(None)
+    AsyncDb.use_engine(None)
+    catalog_cache.invalidate()
+
+
+@pytest.fixture
+def admin_client(memory_db):
+    """Cliente HTTP das rotas de admin (prefixo /admin) sobre o memory_db, sem verificação do token de admin."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from admin_control import AdminControl
+    from admin_routes import get_current_admin, router
+
+    app = FastAPI()
+    app.include_router(router, prefix="/admin")
+    app.dependency_overrides[get_current_admin] = lambda: AdminControl(None)
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,89 @@
+"""Exclusão recursiva de cursos (DELETE /admin/courses e /admin/courses/{id}) sobre o engine em memória."""
+import asyncio
+
+from data.database import Db
+from data.storage import BATCH_LIMIT, Write
+from repositories.async_repository import AsyncCourseRepository
+
+# Documentos de cada curso semeado: o curso, duas disciplinas e, em cada uma, um helper, um seeker e um contador
+DOCUMENTS_PER_COURSE = 1 + 2 * 4
+
+
+def seed_courses(*course_ids):
+    writes = [Write('set', 'users', 'ana', {'name': 'Ana'}), Write('set', 'disciplines', 'global', {'name': 'G'})]
+    for course_id in course_ids:
+        writes.append(Write('set', 'courses', course_id, {'name': course_id, 'code': course_id.upper()}))
+        for discipline_id in ('d1', 'd2'):
+            path = f'courses/{course_id}/disciplines/{discipline_id}'
+            writes += [
+                Write('set', f'courses/{course_id}/disciplines', discipline_id, {'name': discipline_id}),
+                Write('set', f'{path}/helpers', 'ana', {'user_id': 'ana', 'course_id': course_id}),
+                Write('set', f'{path}/seekers', 'bia', {'user_id': 'bia', 'course_id': course_id}),
+                Write('set', f'{path}/counters', '0', {'course_id': course_id, 'helpers': 1, 'seekers': 1}),
+            ]
+    Db.batch_write(writes)
+
+
+def snapshot(engine):
+    return {path: dict(documents) for path, documents in engine._collections.items() if documents}
+
+
+def test_delete_all_dry_run_counts_and_deletes_nothing(admin_client, memory_db):
+    seed_courses('c1', 'c2')
+    before = snapshot(memory_db)
+
+    response = admin_client.delete('/admin/courses', params={'dry_run': 'true'})
+
+    assert response.status_code == 200
+    assert response.json() == {'deleted': 2 * DOCUMENTS_PER_COURSE, 'batches': 1, 'dry_run': True}
+    assert snapshot(memory_db) == before
+
+
+def test_delete_all_requires_confirmation(admin_client, memory_db):
+    seed_courses('c1')
+    before = snapshot(memory_db)
+
+    assert admin_client.delete('/admin/courses').status_code == 400
+    assert snapshot(memory_db) == before
+
+
+def test_delete_all_removes_nested_subcollections(admin_client, memory_db):
+    seed_courses('c1', 'c2')
+    # Preenche o cache do catálogo, que deve ser invalidado pela exclusão
+    assert len(asyncio.run(AsyncCourseRepository.get_all())) == 2
+
+    response = admin_client.delete('/admin/courses', params={'confirm': 'true'})
+
+    assert response.json() == {'deleted': 2 * DOCUMENTS_PER_COURSE, 'batches': 1, 'dry_run': False}
+    assert set(snapshot(memory_db)) == {'users', 'disciplines'}
+    for collection_id in ('helpers', 'seekers', 'counters', 'disciplines'):
+        assert [doc for doc in Db.get_collection_group_documents(collection_id) if doc.get('course_id')] == []
+    assert asyncio.run(AsyncCourseRepository.get_all()) == []
+
+
+def test_delete_course_removes_only_its_subtree(admin_client, memory_db):
+    seed_courses('c1', 'c2')
+    before = snapshot(memory_db)
+
+    response = admin_client.delete('/admin/courses/c1', params={'dry_run': 'true'})
+    assert response.status_code == 200
+    assert response.json()['deleted'] == DOCUMENTS_PER_COURSE
+    assert snapshot(memory_db) == before
+
+    assert admin_client.delete('/admin/courses/c1').status_code == 204
+    assert not any(path.startswith('courses/c1/') for path in snapshot(memory_db))
+    assert Db.get_document('courses', 'c1') == {}
+    assert len(Db.get_collection_group_documents('helpers', 'course_id', 'c2')) == 2
+    assert Db.get_document('courses', 'c2')['name'] == 'c2'
+
+
+def test_delete_recursive_reports_progress_per_batch(memory_db):
+    Db.batch_write([Write('set', 'courses/c1/disciplines', f'd{i}', {'n': i}) for i in range(BATCH_LIMIT)]
+                   + [Write('set', 'courses', 'c1', {'n': 0})])
+    progress = []
+
+    stats = Db.delete_recursive('courses', ['c1'], on_progress=progress.append)
+
+    assert stats == {'deleted': BATCH_LIMIT + 1, 'batches': 2, 'dry_run': False}
+    assert [update['deleted'] for update in progress] == [BATCH_LIMIT, BATCH_LIMIT + 1]
+    assert snapshot(memory_db) == {}
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from data.database import Db
+from src.auth.token_cache import token_cache
+from src.controllers import auth_control
+from src.controllers.auth_control import AuthControl
+
+
+@pytest.fixture
+def tokens(memory_db, monkeypatch):
+    """
+    Tokens de teste 'token:<uid>[:<role>]', verificados sem o Firebase. Registra as verificações
+    (token, check_revoked); os tokens dos UIDs em `revoked` são recusados quando check_revoked é True.
+    """
+    verified = []
+    revoked = set()
+
+    def verify_token(token, check_revoked=False):
+        verified.append((token, check_revoked))
+        _, uid, *role = token.split(':')
+        if check_revoked and uid in revoked:
+            raise ValueError("Token revogado")
+        claims = {'uid': uid, 'name': uid.capitalize(), 'exp': time.time() + 3600}
+        if role:
+            claims['role'] = role[0]
+        return claims
+
+    monkeypatch.setattr(AuthControl, 'verify_token', staticmethod(verify_token))
+    token_cache.clear()
+    yield verified, revoked
+    token_cache.clear()
+
+
+def is_admin(token):
+    return asyncio.run(AuthControl.is_admin(token))
+
+
+def test_admin_claim_is_trusted_after_one_revocation_check(tokens):
+    verified, _ = tokens
+
+    # Sem documento 'users/ana': o claim basta
+    assert is_admin('token:ana:admin').name == 'Ana'
+    assert is_admin('token:ana:admin').name == 'Ana'
+    assert verified == [('token:ana:admin', True)]
+    assert Db.get_document('users', 'ana') == {}
+
+
+def test_demotion_revokes_cached_admin_tokens(tokens, monkeypatch):
+    verified, revoked = tokens
+    claims = {'ana': {'role': 'admin'}}
+    monkeypatch.setattr(auth_control.auth, 'get_user', lambda uid: SimpleNamespace(custom_claims=claims[uid]))
+    monkeypatch.setattr(auth_control.auth, 'set_custom_user_claims', lambda uid, new: claims.update({uid: new}))
+    monkeypatch.setattr(auth_control.auth, 'revoke_refresh_tokens', revoked.add)
+    # O token já foi usado numa rota de usuário e está em cache sem a checagem de revogação
+    asyncio.run(AuthControl.decode_token('token:ana:admin'))
+    assert is_admin('token:ana:admin').name == 'Ana'
+
+    AuthControl.sync_role_claim('ana', 'student')
+
+    assert revoked == {'ana'}
+    with pytest.raises(HTTPException) as error:
+        is_admin('token:ana:admin')
+    assert error.value.status_code == 401
+    assert verified == [('token:ana:admin', False), ('token:ana:admin', True), ('token:ana:admin', True)]
+
+
+def test_non_admin_claim_is_rejected_without_reads(tokens):
+    Db.create_document('users', {'name': 'Bia', 'role': 'admin'}, 'bia')
+
+    with pytest.raises(HTTPException) as error:
+        is_admin('token:bia:student')
+    assert error.value.status_code == 403
+
+
+def test_token_without_role_claim_uses_the_user_document(tokens):
+    Db.create_document('users', {'name': 'Caio', 'role': 'admin'}, 'caio')
+    Db.create_document('users', {'name': 'Davi', 'role': 'student'}, 'davi')
+
+    assert is_admin('token:caio').name == 'Caio'
+    with pytest.raises(HTTPException):
+        is_admin('token:davi')
+
+
+def test_locally_verified_tokens_issued_before_revocation_are_rejected(monkeypatch):
+    user = SimpleNamespace(disabled=False, tokens_valid_after_timestamp=2_000_000)
+    monkeypatch.setattr(auth_control.auth, 'get_user', lambda uid: user)
+
+    AuthControl.check_not_revoked({'uid': 'ana', 'iat': 2000})
+    with pytest.raises(auth_control.auth.RevokedIdTokenError):
+        AuthControl.check_not_revoked({'uid': 'ana', 'iat': 1999})
+    user.disabled = True
+    with pytest.raises(auth_control.auth.UserDisabledError):
+        AuthControl.check_not_revoked({'uid': 'ana', 'iat': 2000})
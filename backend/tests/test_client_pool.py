@@ -0,0 +1,60 @@
+"""
+O FirestoreClientPool substitui o transporte dos clientes do Firestore por atributos privados
+(ver FirestoreClientPool._create_client). Estes testes falham se uma atualização do
+google-cloud-firestore mudar esses atributos.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+
+from data.client_pool import AsyncFirestoreClientPool, FirestoreClientPool
+
+CLIENT_ATTRIBUTES = ('_emulator_host', '_target', '_credentials', '_client_options', '_transport',
+                     '_firestore_api_internal')
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.delenv('FIRESTORE_EMULATOR_HOST', raising=False)
+    return SimpleNamespace(credential=SimpleNamespace(get_credential=AnonymousCredentials), project_id='demo')
+
+
+def record_channel_options(monkeypatch, pool_class):
+    create_channel = pool_class.transport_class.create_channel
+    options = []
+
+    def recording_create_channel(*args, **kwargs):
+        options.append(dict(kwargs['options']))
+        return create_channel(*args, **kwargs)
+
+    monkeypatch.setattr(pool_class.transport_class, 'create_channel', recording_create_channel)
+    return options
+
+
+def test_pool_clients_use_the_pool_channel(app, monkeypatch):
+    options = record_channel_options(monkeypatch, FirestoreClientPool)
+    pool = FirestoreClientPool(size=2, keepalive_time_ms=1234, app=app).open()
+    client = pool.get()
+
+    assert all(hasattr(client, attribute) for attribute in CLIENT_ATTRIBUTES)
+    # O cliente usa o cliente GAPIC criado pelo pool, e não cria outro com as opções padrão
+    assert client._firestore_api is client._firestore_api_internal
+    assert client._firestore_api.transport is client._transport
+    assert [channel_options['grpc.keepalive_time_ms'] for channel_options in options] == [1234, 1234]
+    pool.close()
+
+
+def test_async_pool_clients_use_the_pool_channel(app, monkeypatch):
+    options = record_channel_options(monkeypatch, AsyncFirestoreClientPool)
+
+    async def run():
+        pool = AsyncFirestoreClientPool(size=1, keepalive_time_ms=1234, app=app).open()
+        client = pool.get()
+        assert all(hasattr(client, attribute) for attribute in CLIENT_ATTRIBUTES)
+        assert client._firestore_api is client._firestore_api_internal
+        await pool.aclose()
+
+    asyncio.run(run())
+    assert options[0]['grpc.use_local_subchannel_pool'] == 1
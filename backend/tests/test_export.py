@@ -0,0 +1,70 @@
+import json
+
+from data.database import Db, Write
+from repositories.repository import DisciplineRepository
+
+
+def seed():
+    writes = [DisciplineRepository.membership_migration_write()]
+    for course_id in ('c1', 'c2'):
+        writes.append(Write('set', 'courses', course_id, {'name': course_id, 'code': course_id}))
+        for discipline_id in ('d1', 'd2'):
+            writes.append(Write('set', f'courses/{course_id}/disciplines', discipline_id,
+                                {'name': discipline_id, 'code': discipline_id, 'semester': 1}))
+    for user_id in ('ana', 'bia'):
+        writes.append(Write('set', 'users', user_id, {'helpers_disciplines': ['d1'], 'seekers_disciplines': ['d2']}))
+        writes += DisciplineRepository.membership_writes(user_id, 'c1', ['d1'], [], 'offer_help')
+        writes += DisciplineRepository.membership_writes(user_id, 'c1', ['d2'], [], 'seek_help')
+    Db.batch_write(writes)
+
+
+def export(client, cursor=None, limit=None):
+    params = {'page_size': 1}
+    if cursor:
+        params['cursor'] = cursor
+    response = client.get('/admin/export', params=params)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:limit] if limit else lines
+
+
+def test_export_covers_members_and_counters_and_resumes(admin_client):
+    seed()
+
+    lines = export(admin_client)
+    paths = [f"{line['collection']}/{line['id']}" for line in lines]
+    assert len(paths) == len(set(paths))
+    assert 'courses/c1/disciplines/d1/helpers/ana' in paths
+    assert 'courses/c1/disciplines/d2/seekers/bia' in paths
+    assert sum('/counters/' in path for path in paths) >= 2
+
+    # Retomada a partir de cada linha: continua exatamente na linha seguinte
+    for index in (0, 3, 6, len(lines) - 2):
+        resumed = export(admin_client, lines[index]['cursor'])
+        assert [line['cursor'] for line in resumed] == [line['cursor'] for line in lines[index + 1:]]
+
+
+def test_restore_rewrites_an_export(admin_client, memory_db):
+    seed()
+    snapshot = {path: dict(documents) for path, documents in memory_db._collections.items()}
+    body = "\n".join(json.dumps(line) for line in export(admin_client))
+    for path in list(memory_db._collections):
+        if path != 'migrations':
+            Db.delete_recursive(path)
+
+    assert admin_client.post('/admin/restore', params={'dry_run': True}, content=body).json()['total'] > 0
+    assert DisciplineRepository.get_counts('c1') == {}
+
+    response = admin_client.post('/admin/restore', content=body)
+    assert response.status_code == 200
+    assert {path: dict(documents) for path, documents in memory_db._collections.items()} == snapshot
+    assert DisciplineRepository.get_counts('c1') == {'d1': {'helpers': 2, 'seekers': 0},
+                                                     'd2': {'helpers': 0, 'seekers': 2}}
+
+
+def test_restore_rejects_paths_outside_the_export(admin_client):
+    line = json.dumps({'collection': 'migrations', 'id': 'discipline_membership', 'data': {}})
+
+    response = admin_client.post('/admin/restore', content=line)
+
+    assert response.status_code == 400
@@ -0,0 +1,67 @@
+"""Importação do catálogo em massa (POST /admin/import) sobre o engine em memória."""
+from data.database import Db
+from data.storage import Write
+
+ROWS = [
+    {'type': 'course', 'name': 'Computação', 'code': 'CC'},
+    {'type': 'discipline', 'name': 'Cálculo', 'code': 'MAT1', 'semester': '1', 'course_code': 'CC'},
+    {'type': 'discipline', 'name': 'Redes', 'code': 'RED', 'semester': 5, 'course_id': 'existing'},
+    {'type': 'discipline', 'name': 'Física', 'code': 'FIS', 'semester': 2, 'course_id': 'missing'},
+    {'type': 'discipline', 'name': 'Química', 'code': 'QUI', 'semester': 2, 'course_id': 'existing', 'id': 'qui'},
+]
+
+
+def seed_existing_course():
+    Db.batch_write([Write('set', 'courses', 'existing', {'name': 'Existente', 'code': 'EX'})])
+
+
+def test_dry_run_allocates_ids_and_rejects_unknown_courses(admin_client, memory_db):
+    seed_existing_course()
+
+    response = admin_client.post('/admin/import', params={'dry_run': 'true'}, json=ROWS)
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body['valid'], body['failed'], body['created']) == (4, 1, 0)
+    rows = body['rows']
+    assert all(row['id'] for row in rows if row['status'] == 'valid')
+    assert rows[1]['course_id'] == rows[0]['id']
+    assert rows[4]['id'] == 'qui'
+    assert rows[3] == {'row': 4, 'type': 'discipline', 'status': 'error', 'id': None,
+                       'error': "Curso não encontrado: missing"}
+    # Nada foi gravado além do curso semeado
+    assert Db.get_all_documents('courses') == [{'id': 'existing', 'name': 'Existente', 'code': 'EX'}]
+    assert Db.get_collection_group_documents('disciplines') == []
+
+
+def test_import_writes_rows_with_the_reported_ids(admin_client, memory_db):
+    seed_existing_course()
+
+    body = admin_client.post('/admin/import', json={'rows': ROWS}).json()
+
+    assert (body['created'], body['failed']) == (4, 1)
+    course_row, calculus_row, networks_row, _, _ = body['rows']
+    assert Db.get_document('courses', course_row['id'])['name'] == 'Computação'
+    assert Db.get_document(f"courses/{course_row['id']}/disciplines", calculus_row['id'])['name'] == 'Cálculo'
+    assert Db.get_document('courses/existing/disciplines', networks_row['id'])['semester'] == 5
+    assert Db.get_document('courses/existing/disciplines', 'qui')['name'] == 'Química'
+    assert Db.get_all_documents('courses/missing/disciplines') == []
+
+
+def test_unknown_course_is_checked_with_a_single_read(admin_client, memory_db, monkeypatch):
+    from data.async_database import AsyncDb
+
+    reads = []
+    get_documents = AsyncDb.get_documents
+
+    async def recording_get_documents(collection_name, document_ids, fields=None):
+        reads.append((collection_name, sorted(document_ids)))
+        return await get_documents(collection_name, document_ids, fields)
+
+    monkeypatch.setattr(AsyncDb, 'get_documents', staticmethod(recording_get_documents))
+    rows = [dict(ROWS[3], code=f'FIS{i}') for i in range(3)] + [ROWS[2]]
+
+    body = admin_client.post('/admin/import', params={'dry_run': 'true'}, json=rows).json()
+
+    assert body['failed'] == 4
+    assert reads == [('courses', ['existing', 'missing'])]
@@ -0,0 +1,170 @@
+import datetime
+import json
+import time
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from prometheus_client import REGISTRY
+
+from src.auth import jwt_verifier
+from src.auth.jwt_verifier import LocalTokenVerifier, SigningKeyStore
+
+PROJECT_ID = 'ifocus-test'
+ISSUER = f'https://securetoken.google.com/{PROJECT_ID}'
+
+
+def new_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def write_jwks(path, keys):
+    """Grava um JWKS com as chaves públicas de {kid: chave privada}."""
+    jwks = []
+    for kid, key in keys.items():
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+        jwks.append({**jwk, 'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+    path.write_text(json.dumps({'keys': jwks}))
+
+
+def sign(key, kid, algorithm='RS256', **overrides):
+    now = int(time.time())
+    claims = {'aud': PROJECT_ID, 'iss': ISSUER, 'sub': 'ana', 'iat': now, 'exp': now + 3600, **overrides}
+    return jwt.encode(claims, key, algorithm=algorithm, headers={'kid': kid})
+
+
+@pytest.fixture
+def keys(tmp_path):
+    keys = {'k1': new_key()}
+    jwks_file = tmp_path / 'jwks.json'
+    write_jwks(jwks_file, keys)
+    store = SigningKeyStore(jwks_file=str(jwks_file), min_refresh_interval=0)
+    return keys, jwks_file, store, LocalTokenVerifier(store, PROJECT_ID)
+
+
+def test_valid_token(keys):
+    private_keys, _, _, verifier = keys
+
+    claims = verifier.verify(sign(private_keys['k1'], 'k1'))
+
+    assert claims['uid'] == claims['sub'] == 'ana'
+
+
+@pytest.mark.parametrize('overrides', [{'aud': 'other-project'},
+                                       {'iss': 'https://securetoken.google.com/other-project'},
+                                       {'sub': ''}])
+def test_wrong_audience_issuer_or_subject(keys, overrides):
+    private_keys, _, _, verifier = keys
+
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(sign(private_keys['k1'], 'k1', **overrides))
+
+
+def test_expired_token(keys):
+    private_keys, _, _, verifier = keys
+    expired = sign(private_keys['k1'], 'k1', iat=int(time.time()) - 7200, exp=int(time.time()) - 60)
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(expired)
+    # Dentro da tolerância configurada, o mesmo token é aceito
+    assert LocalTokenVerifier(keys[2], PROJECT_ID, leeway=120).verify(expired)['uid'] == 'ana'
+
+
+@pytest.mark.parametrize('algorithm', ['RS512', 'HS256'])
+def test_wrong_algorithm(keys, algorithm):
+    private_keys, _, _, verifier = keys
+    secret = b'shared-secret-with-at-least-32-bytes' if algorithm == 'HS256' else private_keys['k1']
+
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(sign(secret, 'k1', algorithm=algorithm))
+
+
+def test_token_signed_by_another_key(keys):
+    _, _, _, verifier = keys
+
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(sign(new_key(), 'k1'))
+
+
+def test_unknown_kid_refreshes_keys(keys):
+    private_keys, jwks_file, store, verifier = keys
+    verifier.verify(sign(private_keys['k1'], 'k1'))
+    refreshes = store.refreshes
+
+    # Rotação: uma chave nova é publicada depois da primeira carga
+    private_keys['k2'] = new_key()
+    write_jwks(jwks_file, private_keys)
+
+    assert verifier.verify(sign(private_keys['k2'], 'k2'))['uid'] == 'ana'
+    assert store.refreshes == refreshes + 1
+
+
+def test_unknown_kid_refresh_is_rate_limited(keys):
+    private_keys, jwks_file, store, _ = keys
+    store.min_refresh_interval = 3600
+    verifier = LocalTokenVerifier(store, PROJECT_ID)
+    verifier.verify(sign(private_keys['k1'], 'k1'))
+
+    for _ in range(3):
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(sign(new_key(), 'forged'))
+
+    assert store.refreshes == 1
+
+
+def test_google_certificates_respect_max_age(monkeypatch):
+    key = new_key()
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                   .serial_number(1).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+                   .sign(key, hashes.SHA256()))
+    pem = certificate.public_bytes(serialization.Encoding.PEM).decode()
+    requests_made = []
+
+    class Response:
+        headers = {'Cache-Control': 'public, max-age=120, must-revalidate'}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'c1': pem}
+
+    def get(url, timeout):
+        requests_made.append(url)
+        return Response()
+
+    monkeypatch.setattr(jwt_verifier.requests, 'get', get)
+    store = SigningKeyStore()
+    verifier = LocalTokenVerifier(store, PROJECT_ID)
+
+    for _ in range(3):
+        assert verifier.verify(sign(key, 'c1'))['uid'] == 'ana'
+
+    assert requests_made == [jwt_verifier.GOOGLE_CERTS_URL]
+    assert 110 < store.stats()['expires_in'] <= 120
+
+
+def test_key_cache_lookups_are_exported_to_prometheus(keys):
+    private_keys, _, _, verifier = keys
+
+    def sample(name, result):
+        return REGISTRY.get_sample_value(name, {'result': result}) or 0
+
+    before = {(name, result): sample(name, result)
+              for name, result in (('ifocus_auth_signing_key_cache_total', 'hit'),
+                                   ('ifocus_auth_signing_key_cache_total', 'miss'),
+                                   ('ifocus_auth_signing_key_refreshes_total', 'ok'))}
+    for _ in range(3):
+        verifier.verify(sign(private_keys['k1'], 'k1'))
+
+    # A primeira verificação carrega as chaves; as demais as encontram no cache
+    assert {key: sample(*key) - value for key, value in before.items()} == {
+        ('ifocus_auth_signing_key_cache_total', 'hit'): 2,
+        ('ifocus_auth_signing_key_cache_total', 'miss'): 1,
+        ('ifocus_auth_signing_key_refreshes_total', 'ok'): 1,
+    }
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+
+from models import Discipline
+from repositories.async_repository import AsyncDisciplineRepository, AsyncUserRepository
+from services.matching_index import MatchingIndex
+
+
+def discipline(discipline_id, semester, helpers=(), seekers=()):
+    # Disciplina ainda não migrada: membros nos arrays antigos do documento
+    result = Discipline(discipline_id, discipline_id.upper(), discipline_id, semester)
+    result.helpers, result.seekers = list(helpers), list(seekers)
+    return result
+
+
+USERS = [
+    {'id': 'seeker', 'helpers_disciplines': [], 'seekers_disciplines': ['d1', 'd2']},
+    {'id': 'ana', 'helpers_disciplines': ['d1'], 'seekers_disciplines': []},
+]
+DISCIPLINES = [discipline('d1', 1, helpers=['bia']), discipline('d2', 2, seekers=['caio'])]
+MEMBERS = [('offer_help', 'bia', 'd2'), ('offer_help', 'davi', 'd2'), ('seek_help', 'caio', 'd1')]
+
+
+def test_load_combines_users_legacy_arrays_and_member_subcollections():
+    index = MatchingIndex(ttl=60)
+    index.load(USERS, DISCIPLINES, MEMBERS)
+
+    assert index.rank_helpers('seeker') == [
+        {'user_id': 'bia', 'score': 2, 'disciplines': ['d1', 'd2']},
+        {'user_id': 'ana', 'score': 1, 'disciplines': ['d1']},
+        {'user_id': 'davi', 'score': 1, 'disciplines': ['d2']},
+    ]
+    assert index.stats()['helpers'] == 3
+    assert index.stats()['seekers'] == 2
+
+
+def test_rebuild_reads_members_from_repositories(monkeypatch):
+    async def get_users(*args):
+        return USERS
+
+    async def get_disciplines(*args):
+        return [('course', item) for item in DISCIPLINES]
+
+    async def get_members():
+        return MEMBERS
+
+    async def membership_migrated():
+        return False
+
+    monkeypatch.setattr(AsyncUserRepository, 'get_all', get_users)
+    monkeypatch.setattr(AsyncDisciplineRepository, 'get_all_across_courses', get_disciplines)
+    monkeypatch.setattr(AsyncDisciplineRepository, 'get_all_members', get_members)
+    monkeypatch.setattr(AsyncDisciplineRepository, 'membership_migrated', membership_migrated)
+
+    index = MatchingIndex(ttl=60)
+    asyncio.run(index.rebuild())
+
+    assert [helper['user_id'] for helper in index.rank_helpers('seeker')] == ['bia', 'ana', 'davi']
+    assert [helper['user_id'] for helper in asyncio.run(index.recommend_helpers('seeker'))][0] == 'bia'
+
+
+def test_recommendations_use_the_previous_matrix_while_a_new_one_is_built(monkeypatch):
+    from services import matching_index as matching_index_module
+
+    index = MatchingIndex(ttl=60)
+    index.load(USERS, DISCIPLINES, MEMBERS)
+    built = []
+    build_matrix = matching_index_module.HelperMatrix
+
+    def recording_build(*args):
+        built.append(threading.get_ident())
+        return build_matrix(*args)
+
+    monkeypatch.setattr(matching_index_module, 'HelperMatrix', recording_build)
+
+    async def run():
+        # Sem matriz, a primeira chamada espera o cálculo
+        first = await index.recommend_helpers('seeker')
+        index.add('eva', ['d1', 'd2'], 'offer_help')
+        # A matriz anterior atende enquanto a nova é calculada em segundo plano
+        stale = await index.recommend_helpers('seeker')
+        await index._matrix_build
+        fresh = await index.recommend_helpers('seeker')
+        return threading.get_ident(), first, stale, fresh
+
+    loop_thread, first, stale, fresh = asyncio.run(run())
+
+    assert 'eva' not in [helper['user_id'] for helper in first + stale]
+    assert 'eva' in [helper['user_id'] for helper in fresh]
+    assert len(built) == 2 and loop_thread not in built
+    assert index._matrix_build is None
+
+
+def test_expired_index_is_rebuilt_in_the_background(monkeypatch):
+    index = MatchingIndex(ttl=60)
+    users = [dict(user) for user in USERS]
+    rebuilds = []
+
+    async def rebuild():
+        rebuilds.append(len(rebuilds))
+        if len(rebuilds) > 1:
+            # A reconstrução depois do TTL só termina depois das consultas abaixo
+            await asyncio.sleep(0.01)
+        index.load(users, DISCIPLINES, MEMBERS)
+
+    monkeypatch.setattr(index, 'rebuild', rebuild)
+
+    async def run():
+        # Sem índice, a primeira chamada espera a construção
+        await index.ensure_fresh()
+        first = index.rank_helpers('seeker')
+        users.append({'id': 'eva', 'helpers_disciplines': ['d1', 'd2'], 'seekers_disciplines': []})
+        index._built_at -= 61
+        await index.ensure_fresh()
+        await index.ensure_fresh()
+        stale = index.rank_helpers('seeker')
+        await index._rebuild_task
+        return first, stale, index.rank_helpers('seeker')
+
+    first, stale, fresh = asyncio.run(run())
+
+    assert stale == first and 'eva' not in [helper['user_id'] for helper in stale]
+    assert 'eva' in [helper['user_id'] for helper in fresh]
+    assert rebuilds == [0, 1] and index._rebuild_task is None
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from data.async_database import AsyncDb
+from data.database import Db, Write
+from repositories.async_repository import AsyncDisciplineRepository, AsyncUserRepository
+from repositories.repository import DisciplineRepository, UserRepository
+from services.matching_index import MatchingIndex
+
+COURSE = 'c1'
+DISCIPLINES = f'courses/{COURSE}/disciplines'
+
+
+def seed_legacy():
+    # Formato antigo: membros nos arrays das disciplinas e nas listas dos usuários, sem subcoleções nem contadores
+    Db.batch_write([
+        Write('set', 'courses', COURSE, {'name': 'Curso', 'code': 'C'}),
+        Write('set', DISCIPLINES, 'd1', {'name': 'D1', 'code': 'D1', 'semester': 1,
+                                         'helpers': ['ana', 'bia'], 'seekers': ['caio']}),
+        Write('set', DISCIPLINES, 'd2', {'name': 'D2', 'code': 'D2', 'semester': 2, 'helpers': ['ana']}),
+        Write('set', 'users', 'ana', {'helpers_disciplines': ['d1', 'd2'], 'seekers_disciplines': []}),
+        Write('set', 'users', 'bia', {'helpers_disciplines': ['d1'], 'seekers_disciplines': []}),
+        Write('set', 'users', 'caio', {'helpers_disciplines': [], 'seekers_disciplines': ['d1']}),
+    ])
+
+
+def test_membership_change_migrates_the_disciplines_it_touches(memory_db):
+    seed_legacy()
+
+    added, removed = asyncio.run(AsyncUserRepository.change_disciplines('ana', COURSE, 'offer_help',
+                                                                        lambda current: ['d2']))
+
+    assert (added, removed) == ([], ['d1'])
+    # d1 e d2 estão na lista de ana: os membros dos arrays passam para as subcoleções antes da alteração
+    assert DisciplineRepository.get_counts(COURSE) == {'d1': {'helpers': 1, 'seekers': 1},
+                                                       'd2': {'helpers': 1, 'seekers': 0}}
+    assert 'helpers' not in Db.get_document(DISCIPLINES, 'd1')
+    # A migração completa não traz ana de volta a d1
+    assert asyncio.run(AsyncDisciplineRepository.migrate_legacy_membership()) == \
+        {'disciplines': 0, 'helpers': 0, 'seekers': 0}
+    assert Db.get_documents(f'{DISCIPLINES}/d1/helpers', ['ana', 'bia'], ['user_id']) == \
+        [{'id': 'bia', 'user_id': 'bia'}]
+
+
+def test_sync_membership_change_migrates_disciplines_of_other_courses(memory_db):
+    seed_legacy()
+    Db.batch_write([
+        Write('set', 'courses/c2/disciplines', 'e1', {'name': 'E1', 'code': 'E1', 'semester': 1, 'helpers': ['ana']}),
+        Write('update', 'users', 'ana', {'helpers_disciplines': ['d1', 'd2', 'e1']}),
+    ])
+
+    UserRepository.change_disciplines('ana', COURSE, 'offer_help', lambda current: [])
+
+    assert DisciplineRepository.get_counts('c2') == {'e1': {'helpers': 0, 'seekers': 0}}
+    assert 'helpers' not in Db.get_document('courses/c2/disciplines', 'e1')
+    assert Db.get_collection_group_documents('helpers', 'user_id', 'ana') == []
+
+
+def test_migration_moves_arrays_and_can_be_repeated(memory_db):
+    seed_legacy()
+
+    assert asyncio.run(AsyncDisciplineRepository.migrate_legacy_membership()) == \
+        {'disciplines': 2, 'helpers': 3, 'seekers': 1}
+    assert DisciplineRepository.get_counts(COURSE) == {'d1': {'helpers': 2, 'seekers': 1},
+                                                       'd2': {'helpers': 1, 'seekers': 0}}
+    assert 'helpers' not in Db.get_document(DISCIPLINES, 'd1')
+
+    # Um documento reimportado com os arrays antigos não conta de novo quem já é membro
+    Db.update_document(DISCIPLINES, 'd1', {'helpers': ['ana']})
+    assert asyncio.run(AsyncDisciplineRepository.migrate_legacy_membership())['helpers'] == 0
+    assert DisciplineRepository.get_counts(COURSE)['d1'] == {'helpers': 2, 'seekers': 1}
+
+
+def test_removal_after_migration_keeps_counters_consistent(memory_db):
+    seed_legacy()
+    asyncio.run(AsyncDisciplineRepository.migrate_legacy_membership())
+
+    added, removed = UserRepository.change_disciplines('ana', COURSE, 'offer_help', lambda current: [])
+
+    assert (added, removed) == ([], ['d1', 'd2'])
+    assert DisciplineRepository.get_counts(COURSE) == {'d1': {'helpers': 1, 'seekers': 1},
+                                                       'd2': {'helpers': 0, 'seekers': 0}}
+    assert Db.get_documents(f'{DISCIPLINES}/d1/helpers', ['ana', 'bia'], ['user_id']) == \
+        [{'id': 'bia', 'user_id': 'bia'}]
+
+    # Depois da migração, a reconstrução do índice ignora arrays antigos que reapareçam
+    Db.update_document(DISCIPLINES, 'd1', {'helpers': ['ana']})
+    index = MatchingIndex(ttl=60)
+    asyncio.run(index.rebuild())
+    assert index.rank_helpers('caio') == [{'user_id': 'bia', 'score': 1, 'disciplines': ['d1']}]
+
+
+def seed_two_courses():
+    Db.batch_write([
+        Write('set', DISCIPLINES, 'd1', {'name': 'D1', 'code': 'D1', 'semester': 1}),
+        Write('set', 'courses/c2/disciplines', 'e1', {'name': 'E1', 'code': 'E1', 'semester': 1}),
+        Write('set', 'users', 'ana', {'helpers_disciplines': [], 'seekers_disciplines': []}),
+        DisciplineRepository.membership_migration_write(),
+    ])
+
+
+def test_assigning_unknown_discipline_writes_nothing(memory_db):
+    seed_two_courses()
+
+    with pytest.raises(ValueError):
+        asyncio.run(AsyncDisciplineRepository.add_user_to_disciplines('ana', COURSE, ['d1', 'e1'], 'offer_help'))
+
+    assert Db.get_document('users', 'ana')['helpers_disciplines'] == []
+    assert DisciplineRepository.get_counts(COURSE) == {}
+    assert DisciplineRepository.get_counts('c2') == {}
+
+
+def test_removal_uses_the_course_of_each_discipline(memory_db):
+    seed_two_courses()
+    DisciplineRepository.add_user_to_disciplines('ana', COURSE, ['d1'], 'offer_help')
+    asyncio.run(AsyncDisciplineRepository.add_user_to_disciplines('ana', 'c2', ['e1'], 'offer_help'))
+    # Disciplina na lista do usuário sem documento de membro: sai apenas da lista
+    Db.update_document('users', 'ana', {'helpers_disciplines': ['d1', 'e1', 'orphan']})
+
+    # A requisição informa o curso c1, mas e1 pertence a c2
+    asyncio.run(AsyncUserRepository.change_disciplines('ana', COURSE, 'offer_help', lambda current: []))
+
+    assert Db.get_document('users', 'ana')['helpers_disciplines'] == []
+    assert DisciplineRepository.get_counts(COURSE) == {'d1': {'helpers': 0, 'seekers': 0}}
+    assert DisciplineRepository.get_counts('c2') == {'e1': {'helpers': 0, 'seekers': 0}}
+    assert Db.get_collection_group_documents('helpers') == []
+    assert Db.get_collection_group_documents('counters', 'discipline_id', 'orphan') == []
+
+
+def test_removal_requeries_members_added_concurrently(memory_db, monkeypatch):
+    seed_two_courses()
+    member_courses = DisciplineRepository.member_courses
+    calls = []
+
+    def stale_member_courses(user_id, type_help):
+        # A primeira consulta acontece antes de outra requisição adicionar e1
+        calls.append(user_id)
+        return {} if len(calls) == 1 else member_courses(user_id, type_help)
+
+    monkeypatch.setattr(DisciplineRepository, 'member_courses', stale_member_courses)
+    UserRepository.change_disciplines('ana', 'c2', 'offer_help', lambda current: ['e1'], ['e1'])
+    calls.clear()
+
+    UserRepository.change_disciplines('ana', COURSE, 'offer_help', lambda current: [])
+
+    assert len(calls) == 2
+    assert Db.get_collection_group_documents('helpers') == []
+    assert DisciplineRepository.get_counts('c2') == {'e1': {'helpers': 0, 'seekers': 0}}
+
+
+def test_page_counts_read_only_its_disciplines_and_follow_membership_changes(memory_db, monkeypatch):
+    seed_two_courses()
+    Db.batch_write([Write('set', DISCIPLINES, 'd2', {'name': 'D2', 'code': 'D2', 'semester': 2})])
+    DisciplineRepository.add_user_to_disciplines('ana', COURSE, ['d1', 'd2'], 'offer_help')
+    get_all_documents = AsyncDb.get_all_documents
+    reads = []
+
+    async def recording_get_all_documents(collection_name, fields=None):
+        reads.append(collection_name)
+        return await get_all_documents(collection_name, fields)
+
+    monkeypatch.setattr(AsyncDb, 'get_all_documents', recording_get_all_documents)
+    counts = asyncio.run(AsyncDisciplineRepository.get_counts(COURSE, ['d1']))
+
+    assert counts == {'d1': {'helpers': 1, 'seekers': 0}}
+    assert reads == [f'{DISCIPLINES}/d1/counters']
+
+    # Em cache até a próxima alteração de membros do curso
+    asyncio.run(AsyncDisciplineRepository.get_counts(COURSE, ['d1']))
+    assert len(reads) == 1
+    asyncio.run(AsyncUserRepository.change_disciplines('ana', COURSE, 'offer_help', lambda current: ['d2']))
+    assert asyncio.run(AsyncDisciplineRepository.get_counts(COURSE, ['d1', 'd2'])) == \
+        {'d1': {'helpers': 0, 'seekers': 0}, 'd2': {'helpers': 1, 'seekers': 0}}
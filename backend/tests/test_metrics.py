@@ -0,0 +1,29 @@
+"""Acesso ao endpoint de métricas (monitoring.metrics.metrics_authorized)."""
+import os
+
+import pytest
+
+from configs import settings
+from monitoring.metrics import metrics_authorized
+
+
+@pytest.mark.skipif('METRICS_ENABLED' in os.environ, reason="METRICS_ENABLED definido no ambiente")
+def test_metrics_are_disabled_by_default():
+    assert settings.METRICS_ENABLED is False
+
+
+@pytest.mark.parametrize('authorization, allowed', [
+    ('Bearer s3cret', True),
+    ('bearer s3cret', True),
+    ('Bearer wrong', False),
+    ('Basic s3cret', False),
+    ('s3cret', False),
+    ('', False),
+    (None, False),
+])
+def test_token_is_required_when_configured(authorization, allowed):
+    assert metrics_authorized(authorization, 's3cret') is allowed
+
+
+def test_no_token_configured_allows_access():
+    assert metrics_authorized(None, None)
@@ -0,0 +1,168 @@
+"""Cursores e páginas de data/pagination.py, do Db (engine em memória) e das rotas de listagem."""
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from data.database import Db
+from data.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, page_query, paginate, split_page
+from data.storage import Write
+from repositories.repository import DisciplineRepository
+
+
+class RecordingQuery:
+    """Consulta falsa que registra as chamadas de page_query."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def method(*args):
+            self.calls.append((name,) + args)
+            return self
+        return method
+
+
+@pytest.fixture
+def user_client(memory_db):
+    """Cliente HTTP das rotas de usuário sobre o memory_db, sem verificação do token."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from user_control import UserControl
+    from user_routes import get_user, router
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_user] = lambda: UserControl(None)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize('order_value', [None, 3, 2.5, 'Álgebra', True])
+def test_cursor_round_trip(order_value):
+    cursor = encode_cursor('doc/1', order_value)
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (order_value, 'doc/1')
+
+
+@pytest.mark.parametrize('cursor', [
+    'não-é-base64',
+    encode_cursor('abc')[:-2],  # Truncado
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(),  # JSON sem o par [valor, id]
+    base64.urlsafe_b64encode(json.dumps([1, 2, 3]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(['x', 42]).encode()).decode(),  # ID que não é string
+])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_page_query_orders_by_field_then_document_id_and_maps_the_cursor_to_name():
+    query = page_query(RecordingQuery(), 10, encode_cursor('d7', 4), 'semester')
+
+    assert query.calls == [
+        ('order_by', 'semester'),
+        ('order_by', FieldPath.document_id()),
+        ('start_after', {'__name__': 'd7', 'semester': 4}),
+        ('limit', 11),
+    ]
+    # Sem ordenação por campo, o cursor contém apenas o ID
+    assert page_query(RecordingQuery(), 5, encode_cursor('d7')).calls[1:] == [
+        ('start_after', {'__name__': 'd7'}), ('limit', 6)]
+
+
+@pytest.mark.parametrize('count, expected_cursor', [(0, None), (2, None), (3, None), (4, 'c')])
+def test_split_page_boundaries(count, expected_cursor):
+    docs = [{'id': document_id, 'n': i} for i, document_id in enumerate('abcd'[:count])]
+
+    page, cursor = split_page(docs, 3, order_by='n')
+
+    assert page == docs[:3]
+    if expected_cursor is None:
+        assert cursor is None
+    else:
+        assert decode_cursor(cursor) == (2, expected_cursor)
+
+
+def read_pages(get_page, limit, order_by=None):
+    pages, cursor = [], None
+    while True:
+        page, cursor = get_page(limit, cursor, order_by)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_paginate_matches_db_pages(memory_db):
+    semesters = {'a': 2, 'b': 1, 'c': None, 'd': 2, 'e': 1}
+    # 'c' não tem o campo (e não aparece quando a listagem é ordenada por ele)
+    Db.batch_write([Write('set', 'disciplines', document_id, {'semester': semester} if semester else {})
+                    for document_id, semester in semesters.items()])
+    items = [SimpleNamespace(id=document_id, semester=semester) for document_id, semester in semesters.items()]
+
+    for limit in (1, 2, 4, 5, MAX_PAGE_SIZE):
+        for order_by in (None, 'semester'):
+            in_memory = [[item.id for item in page]
+                         for page in read_pages(lambda *args: paginate(items, *args), limit, order_by)]
+            from_db = [[doc['id'] for doc in page]
+                       for page in read_pages(lambda *args: Db.get_documents_page('disciplines', *args), limit, order_by)]
+            assert in_memory == from_db
+
+    # Itens sem o campo de ordenação ficam de fora, e a última página não tem cursor
+    assert paginate(items, 4, None, 'semester') == ([items[1], items[4], items[0], items[3]], None)
+
+
+def test_courses_route_pages_with_the_next_cursor_header(user_client, memory_db):
+    Db.batch_write([Write('set', 'courses', f'c{i}', {'name': f'Curso {i}', 'code': f'C{i}'}) for i in range(5)])
+
+    names, cursor = [], None
+    while True:
+        params = {'limit': 2, 'order_by': 'name'}
+        if cursor:
+            params['cursor'] = cursor
+        response = user_client.get('/courses', params=params)
+        assert response.status_code == 200
+        names.append([course['name'] for course in response.json()])
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert names == [['Curso 0', 'Curso 1'], ['Curso 2', 'Curso 3'], ['Curso 4']]
+
+
+@pytest.mark.parametrize('path', ['/courses', '/courses/c1/disciplines'])
+def test_tampered_cursor_returns_400(user_client, path):
+    cursor = encode_cursor('c1')
+    tampered = cursor[:-3] + ('A' if cursor[-3] != 'A' else 'B') + cursor[-2:]
+
+    for bad_cursor in ('%%%', tampered, base64.urlsafe_b64encode(b'[1, 2]').decode()):
+        response = user_client.get(path, params={'cursor': bad_cursor})
+        assert response.status_code == 400, bad_cursor
+
+    assert user_client.get(path, params={'limit': MAX_PAGE_SIZE + 1}).status_code == 422
+
+
+def test_list_routes_validate_items_against_the_response_model(user_client, memory_db):
+    saved_course = 'yvm1KcPdwS1i64VPsj9Y'  # Curso fixo das rotas de disciplinas salvas
+    Db.batch_write([
+        Write('set', 'courses', saved_course, {'name': 'Curso'}),
+        Write('set', f'courses/{saved_course}/disciplines', 'd1', {'name': 'D1', 'code': 'D1', 'semester': 1}),
+        Write('set', 'users', 'ana', {'helpers_disciplines': [], 'seekers_disciplines': []}),
+        DisciplineRepository.membership_migration_write(),
+    ])
+    DisciplineRepository.add_user_to_disciplines('ana', saved_course, ['d1'], 'offer_help')
+
+    # Curso sem código: o campo é opcional no modelo
+    assert user_client.get('/courses').json() == [{'id': saved_course, 'name': 'Curso', 'code': None}]
+    expected = [{'id': 'd1', 'name': 'D1', 'code': 'D1', 'semester': 1, 'helpers_count': 1, 'seekers_count': 0}]
+    assert user_client.get(f'/courses/{saved_course}/disciplines').json() == expected
+    assert user_client.get('/disciplines/saved/helpers', params={'user_id': 'ana'}).json() == expected
+
+    # Um documento fora do formato do modelo não é devolvido como está
+    Db.batch_write([Write('set', f'courses/{saved_course}/disciplines', 'd2', {'name': 'D2', 'code': 'D2'})])
+    DisciplineRepository.invalidate_cache(saved_course)
+    assert user_client.get(f'/courses/{saved_course}/disciplines').status_code == 400
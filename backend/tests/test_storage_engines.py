@@ -0,0 +1,194 @@
+"""
+Paridade entre os engines de armazenamento: os engines locais (memória e SQLite) devem reproduzir a
+semântica do Firestore. O engine do Firestore só é testado com o emulador (FIRESTORE_EMULATOR_HOST).
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime
+
+import pytest
+import requests
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+from data.memory_engine import MemoryEngine
+from data.sqlite_engine import SQLiteEngine
+from data.storage import AsyncEngineAdapter, Write
+
+EMULATOR_HOST = os.environ.get('FIRESTORE_EMULATOR_HOST')
+
+
+def create_firestore_engine():
+    from data.firestore_engine import FirestoreEngine
+
+    return FirestoreEngine.from_settings()
+
+
+def clear_firestore(engine):
+    project = engine.client().project
+    requests.delete(f"http://{EMULATOR_HOST}/emulator/v1/projects/{project}/databases/(default)/documents",
+                    timeout=10).raise_for_status()
+
+
+@pytest.fixture(params=[
+    'memory',
+    'sqlite',
+    pytest.param('firestore', marks=pytest.mark.skipif(not EMULATOR_HOST, reason="FIRESTORE_EMULATOR_HOST não definido")),
+])
+def engine(request, tmp_path):
+    if request.param == 'memory':
+        engine = MemoryEngine()
+    elif request.param == 'sqlite':
+        engine = SQLiteEngine(str(tmp_path / 'documents.db'))
+    else:
+        engine = create_firestore_engine()
+        clear_firestore(engine)
+    yield engine
+    if request.param == 'firestore':
+        clear_firestore(engine)
+    engine.close()
+
+
+def test_set_replaces_and_merge_combines_nested_maps(engine):
+    engine.commit([Write('set', 'docs', 'a', {'name': 'A', 'meta': {'x': 1, 'y': 2}, 'tags': ['t']})])
+    engine.commit([Write('merge', 'docs', 'a', {'meta': {'y': 3, 'z': 4}, 'count': firestore.Increment(2)})])
+    assert engine.get_document('docs', 'a') == {'name': 'A', 'meta': {'x': 1, 'y': 3, 'z': 4}, 'tags': ['t'], 'count': 2}
+
+    engine.commit([Write('set', 'docs', 'a', {'name': 'B'})])
+    assert engine.get_document('docs', 'a') == {'name': 'B'}
+
+    # merge cria o documento, como no Firestore
+    engine.commit([Write('merge', 'docs', 'new', {'count': firestore.Increment(1)})])
+    assert engine.get_document('docs', 'new') == {'count': 1}
+
+
+def test_update_applies_field_paths_and_transforms(engine):
+    engine.commit([Write('set', 'docs', 'a', {'meta': {'x': 1, 'y': 2}, 'tags': ['a', 'b'], 'old': True, 'n': 5})])
+    engine.commit([Write('update', 'docs', 'a', {
+        'meta.x': 10,
+        'tags': firestore.ArrayUnion(['b', 'c']),
+        'old': firestore.DELETE_FIELD,
+        'n': firestore.Increment(-2),
+        'updated_at': firestore.SERVER_TIMESTAMP,
+    })])
+    engine.commit([Write('update', 'docs', 'a', {'tags': firestore.ArrayRemove(['a'])})])
+
+    data = engine.get_document('docs', 'a')
+    assert isinstance(data.pop('updated_at'), datetime)
+    assert data == {'meta': {'x': 10, 'y': 2}, 'tags': ['b', 'c'], 'n': 3}
+
+
+def test_update_of_missing_document_fails_atomically(engine):
+    with pytest.raises(NotFound):
+        engine.commit([Write('set', 'docs', 'a', {'n': 1}), Write('update', 'docs', 'missing', {'n': 1})])
+
+    assert engine.get_document('docs', 'a') == {}
+
+
+def test_delete_keeps_subcollections(engine):
+    engine.commit([Write('set', 'docs', 'a', {'n': 1}), Write('set', 'docs/a/children', 'c', {'n': 2})])
+    engine.commit([Write('delete', 'docs', 'a'), Write('delete', 'docs', 'never-existed')])
+
+    assert engine.get_document('docs', 'a') == {}
+    assert engine.get_all_documents('docs/a/children') == [{'id': 'c', 'n': 2}]
+
+
+def test_update_in_transaction_reads_then_writes(engine):
+    engine.commit([Write('set', 'users', 'ana', {'ids': ['d1']})])
+
+    engine.update_in_transaction('users', 'ana', lambda data: [
+        Write('update', 'users', 'ana', {'ids': data['ids'] + ['d2']}),
+        Write('merge', 'counters', 'd2', {'n': firestore.Increment(1)}),
+    ])
+
+    assert engine.get_document('users', 'ana') == {'ids': ['d1', 'd2']}
+    assert engine.get_document('counters', 'd2') == {'n': 1}
+
+
+def test_projection(engine):
+    engine.commit([
+        Write('set', 'docs', 'a', {'name': 'A', 'flag': False, 'on': True, 'meta': {'x': 1, 'y': 2}, 'big': list(range(50))}),
+        Write('set', 'docs', 'b', {'name': 'B'}),
+    ])
+
+    assert engine.get_document('docs', 'a', ['name', 'flag', 'on', 'missing']) == {'name': 'A', 'flag': False, 'on': True}
+    assert engine.get_document('docs', 'a', ['meta.y']) == {'meta': {'y': 2}}
+    assert engine.get_documents('docs', ['b', 'a', 'zzz'], ['name']) == [{'id': 'b', 'name': 'B'}, {'id': 'a', 'name': 'A'}]
+    assert engine.get_all_documents('docs', ['flag']) == [{'id': 'a', 'flag': False}, {'id': 'b'}]
+    page, _ = engine.get_documents_page('docs', 10, order_by='name', fields=['flag'])
+    assert page == [{'id': 'a', 'flag': False, 'name': 'A'}, {'id': 'b', 'name': 'B'}]
+
+
+def read_all_pages(engine, limit, order_by=None):
+    pages, cursor = [], None
+    while True:
+        page, cursor = engine.get_documents_page('docs', limit, cursor, order_by)
+        pages.append([doc['id'] for doc in page])
+        if not cursor:
+            return pages
+
+
+def test_pages_follow_order_and_cursors(engine):
+    semesters = {'a': 3, 'b': 1, 'c': 3, 'd': 2, 'e': 1, 'f': 2, 'g': 3}
+    engine.commit([Write('set', 'docs', document_id, {'semester': semester})
+                   for document_id, semester in semesters.items()]
+                  + [Write('set', 'docs', 'no-semester', {'name': 'sem campo'})])
+
+    # Empates no campo de ordenação são desfeitos pelo ID; documentos sem o campo ficam de fora
+    assert read_all_pages(engine, 3, 'semester') == [['b', 'e', 'd'], ['f', 'a', 'c'], ['g']]
+    assert read_all_pages(engine, 4) == [['a', 'b', 'c', 'd'], ['e', 'f', 'g', 'no-semester']]
+    # Última página cheia: a página seguinte não é anunciada
+    assert engine.get_documents_page('docs', 8)[1] is None
+
+
+def test_collection_group_queries(engine):
+    engine.commit([
+        Write('set', 'courses/c1/disciplines/d1/counters', '0', {'course_id': 'c1', 'helpers': 1}),
+        Write('set', 'courses/c1/disciplines/d2/counters', '3', {'course_id': 'c1', 'helpers': 2}),
+        Write('set', 'courses/c2/disciplines/d3/counters', '0', {'course_id': 'c2', 'helpers': 5}),
+        Write('set', 'disciplines/d4/counters', '0', {'course_id': None, 'helpers': 7}),
+        Write('set', 'counters_archive', 'x', {'course_id': 'c1'}),
+    ])
+
+    docs = engine.get_collection_group_documents('counters', 'course_id', 'c1', ['helpers'])
+    assert sorted((doc['parent_id'], doc['id'], doc['helpers']) for doc in docs) == [('d1', '0', 1), ('d2', '3', 2)]
+    assert [doc['parent_id'] for doc in engine.get_collection_group_documents('counters', 'course_id', None)] == ['d4']
+    assert len(engine.get_collection_group_documents('counters')) == 4
+
+
+def test_delete_recursive_and_dry_run(engine):
+    engine.commit([
+        Write('set', 'courses', 'c1', {'n': 1}),
+        Write('set', 'courses/c1/disciplines', 'd1', {'n': 1}),
+        Write('set', 'courses/c1/disciplines/d1/helpers', 'ana', {'n': 1}),
+        Write('set', 'courses', 'c2', {'n': 1}),
+    ])
+
+    assert engine.delete_recursive('courses', ['c1'], dry_run=True)['deleted'] == 3
+    assert engine.get_document('courses/c1/disciplines/d1/helpers', 'ana') == {'n': 1}
+
+    assert engine.delete_recursive('courses', ['c1'])['deleted'] == 3
+    assert engine.get_collection_group_documents('helpers') == []
+    assert engine.get_all_documents('courses') == [{'id': 'c2', 'n': 1}]
+
+
+def test_async_adapter_runs_blocking_engines_in_the_threadpool(engine):
+    if not isinstance(engine, (MemoryEngine, SQLiteEngine)):
+        pytest.skip("AsyncEngineAdapter adapta apenas os engines locais")
+    adapter = AsyncEngineAdapter(engine)
+    threads = []
+
+    def build_updates(data):
+        threads.append(threading.get_ident())
+        return [Write('set', 'docs', 'a', {'n': data.get('n', 0) + 1})]
+
+    async def run():
+        await adapter.update_in_transaction('docs', 'a', build_updates)
+        await adapter.update_in_transaction('docs', 'a', build_updates)
+        return threading.get_ident(), await adapter.get_document('docs', 'a')
+
+    loop_thread, data = asyncio.run(run())
+
+    assert data == {'n': 2}
+    assert all((thread != loop_thread) == engine.blocking for thread in threads)
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from src.auth import token_cache as token_cache_module
+from src.auth.token_cache import TokenCache, token_cache
+from src.controllers import auth_control
+from src.controllers.auth_control import AuthControl
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def cache_with_clock(monkeypatch, maxsize=10, ttl=300):
+    clock = Clock()
+    monkeypatch.setattr(token_cache_module, 'time', clock)
+    return TokenCache(maxsize=maxsize, ttl=ttl), clock
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch, ttl=300)
+    cache.put('t', {'uid': 'ana', 'exp': clock.now + 3600}, None)
+
+    clock.now += 299
+    assert cache.get('t').claims['uid'] == 'ana'
+    clock.now += 1
+    assert cache.get('t') is None
+
+
+def test_ttl_is_capped_at_token_exp(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch, ttl=300)
+    cache.put('t', {'uid': 'ana', 'exp': clock.now + 60}, None)
+    cache.put('expired', {'uid': 'bia', 'exp': clock.now - 1}, None)
+
+    assert cache.get('expired') is None
+    clock.now += 59
+    assert cache.get('t') is not None
+    clock.now += 1
+    assert cache.get('t') is None
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch, maxsize=2)
+    claims = {'uid': 'ana', 'exp': clock.now + 3600}
+    cache.put('a', claims, None)
+    cache.put('b', claims, None)
+    cache.get('a')
+
+    cache.put('c', claims, None)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_invalidate_user_removes_only_that_user(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch)
+    exp = clock.now + 3600
+    cache.put('ana-web', {'uid': 'ana', 'exp': exp}, None)
+    cache.put('ana-app', {'uid': 'ana', 'exp': exp}, None)
+    cache.put('bia', {'uid': 'bia', 'exp': exp}, None)
+
+    cache.invalidate_user('ana')
+
+    assert cache.get('ana-web') is None and cache.get('ana-app') is None
+    assert cache.get('bia') is not None
+
+
+def test_cached_token_skips_verification_and_user_read(monkeypatch):
+    calls = []
+    users = {'ana': {'name': 'Ana', 'role': 'student'}}
+
+    def verify_token(token, check_revoked=False):
+        calls.append('verify')
+        return {'uid': 'ana', 'exp': time.time() + 3600}
+
+    async def get_document(collection_name, document_id, *args):
+        calls.append('read')
+        return dict(users[document_id])
+
+    monkeypatch.setattr(AuthControl, 'verify_token', staticmethod(verify_token))
+    monkeypatch.setattr(auth_control.AsyncDb, 'get_document', staticmethod(get_document))
+    token_cache.clear()
+
+    assert asyncio.run(AuthControl.get_current_user('token')).role == 'student'
+    assert asyncio.run(AuthControl.get_current_user('token')).role == 'student'
+    assert calls == ['verify', 'read']
+
+    # Depois de uma mudança de papel, o usuário é lido de novo
+    users['ana']['role'] = 'admin'
+    AuthControl.invalidate_user('ana')
+    assert asyncio.run(AuthControl.get_current_user('token')).role == 'admin'
+    assert calls == ['verify', 'read', 'verify', 'read']
+    token_cache.clear()